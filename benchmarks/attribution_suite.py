@@ -0,0 +1,337 @@
+"""
+Throughput and scaling benchmarks, compared against a stored baseline.
+
+Measures, on a scratch database:
+
+- the per-request overhead and requests per second of
+  TrackingParameterMiddleware + AttributionMiddleware for untracked,
+  tracked, returning and login requests,
+- the cost of record_conversion(),
+- the cost of merging an anonymous identity on login, by number of
+  touchpoints moved,
+- with_attribution() latency over every valid conversion, as the
+  touchpoint table grows (synthetic data, see synthetic.py).
+
+Results are written as JSON with --output. With --baseline, they are
+compared to an earlier results file and the script exits with status 1
+when a metric got worse by more than --tolerance and by more than
+--noise-floor milliseconds. p95 latencies vary too much between runs to
+fail on, they are only compared with --check-p95. Baselines are only
+comparable on the machine and database backend they were recorded on.
+
+Usage:
+    python benchmarks/attribution_suite.py --output results.json
+    python benchmarks/attribution_suite.py --sizes 10000,100000 \\
+        --baseline benchmarks/baseline.json --output results.json
+
+Set PGDATABASE (and PGUSER, PGHOST, ...) to run on PostgreSQL, otherwise a
+temporary SQLite file is used. The database is flushed; do not point it at
+a database you care about.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+from django.conf import settings
+
+if os.environ.get("PGDATABASE"):
+    DATABASE = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ["PGDATABASE"],
+        "USER": os.environ.get("PGUSER", ""),
+        "PASSWORD": os.environ.get("PGPASSWORD", ""),
+        "HOST": os.environ.get("PGHOST", ""),
+        "PORT": os.environ.get("PGPORT", ""),
+    }
+else:
+    DATABASE = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": str(Path(tempfile.mkdtemp()) / "attribution_bench.sqlite3"),
+    }
+
+settings.configure(
+    SECRET_KEY="benchmark",
+    ALLOWED_HOSTS=["testserver"],
+    INSTALLED_APPS=[
+        "django.contrib.auth",
+        "django.contrib.contenttypes",
+        "django_attribution",
+    ],
+    DATABASES={"default": DATABASE},
+    USE_TZ=True,
+)
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from django_attribution.conf import attribution_settings  # noqa: E402
+from django_attribution.middlewares import (  # noqa: E402
+    AttributionMiddleware,
+    TrackingParameterMiddleware,
+)
+from django_attribution.models import Conversion, Identity, Touchpoint  # noqa: E402
+from django_attribution.reconciliation import reconcile_user_identity  # noqa: E402
+from django_attribution.shortcuts import record_conversion  # noqa: E402
+from django_attribution.synthetic import SyntheticDataGenerator  # noqa: E402
+from django_attribution.trackers import CookieIdentityTracker  # noqa: E402
+
+UNTIL = datetime(2024, 1, 1, tzinfo=timezone.utc)
+TRACKED_URL = "/landing/?utm_source=google&utm_medium=cpc&utm_campaign=spring"
+LOWER, HIGHER = "lower", "higher"
+
+factory = RequestFactory()
+users = iter(range(10**9))
+
+
+def timed(call, repeat, setup=lambda: None):
+    """Milliseconds per call of call(setup()), setup excluded."""
+
+    durations = []
+    for _ in range(repeat):
+        argument = setup()
+        # As timeit does, keep collection pauses out of the timings
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            call(argument)
+            durations.append((time.perf_counter() - started) * 1000)
+        finally:
+            gc.enable()
+    return durations
+
+
+def summarize(results, name, durations, throughput=False):
+    results[f"{name}.median_ms"] = (statistics.median(durations), "ms", LOWER)
+    results[f"{name}.p95_ms"] = (
+        statistics.quantiles(durations, n=20)[-1],
+        "ms",
+        LOWER,
+    )
+    if throughput:
+        results[f"{name}.requests_per_second"] = (
+            1000 / statistics.mean(durations),
+            "req/s",
+            HIGHER,
+        )
+
+
+def new_user():
+    return get_user_model().objects.create(username=f"bench-{next(users)}")
+
+
+def with_cookie(request, identity):
+    request.COOKIES[attribution_settings.COOKIE_NAME] = str(identity.uuid)
+    return request
+
+
+def bench_middleware(results, repeat):
+    stack = TrackingParameterMiddleware(
+        AttributionMiddleware(lambda request: HttpResponse("OK"))
+    )
+
+    def anonymous(request):
+        request.user = AnonymousUser()
+        return request
+
+    returning = Identity.objects.create()
+
+    def login():
+        user = new_user()
+        Identity.objects.create(linked_user=user)
+        request = with_cookie(factory.get("/account/"), Identity.objects.create())
+        request.user = user
+        return request
+
+    scenarios = {
+        "untracked": lambda: anonymous(factory.get("/about/")),
+        "tracked": lambda: anonymous(factory.get(TRACKED_URL)),
+        "returning": lambda: anonymous(
+            with_cookie(factory.get(TRACKED_URL), returning)
+        ),
+        "login": login,
+    }
+    for scenario, setup in scenarios.items():
+        durations = timed(stack, repeat, setup)
+        summarize(results, f"middleware.{scenario}", durations, throughput=True)
+
+
+def bench_record_conversion(results, repeat):
+    identity = Identity.objects.create()
+
+    def setup():
+        request = factory.post("/checkout/")
+        request.identity = identity
+        return request
+
+    durations = timed(
+        lambda request: record_conversion(request, "purchase", value=10), repeat, setup
+    )
+    summarize(results, "record_conversion", durations)
+
+
+def login_with_touchpoints(count):
+    user = new_user()
+    Identity.objects.create(linked_user=user)
+    anonymous = Identity.objects.create()
+    Touchpoint.objects.bulk_create(
+        Touchpoint(identity=anonymous, url="https://example.com/") for _ in range(count)
+    )
+    request = with_cookie(factory.get("/account/"), anonymous)
+    request.user = user
+    request.identity_tracker = CookieIdentityTracker()
+    return request
+
+
+def bench_merge(results, touch_counts, repeat):
+    for count in touch_counts:
+        durations = timed(
+            reconcile_user_identity,
+            repeat,
+            partial(login_with_touchpoints, count),
+        )
+        summarize(results, f"merge.{count}_touchpoints", durations)
+
+
+def attribute_all(_):
+    list(
+        Conversion.objects.valid()
+        .with_attribution(window_days=30)
+        .values_list("pk", "attribution_data")
+    )
+
+
+def bench_attribution(results, sizes, repeat):
+    generator = SyntheticDataGenerator(until=UNTIL, seed=0, batch_size=5000)
+    for size in sorted(sizes):
+        missing = size - Touchpoint.objects.count()
+        if missing > 0:
+            generator.generate(int(missing / generator.touches_per_identity) + 1)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        durations = timed(attribute_all, repeat)
+        summarize(results, f"with_attribution.{size}_touchpoints", durations)
+
+
+def milliseconds(result):
+    """Time per call of a result, in ms."""
+
+    if result["unit"] == "req/s":
+        return 1000 / result["value"]
+    return result["value"]
+
+
+def compare(results, baseline, tolerance, noise_floor, check_p95=False):
+    """
+    Metrics worse than the baseline by more than tolerance (relative) and
+    noise_floor (ms per call), so that sub-millisecond jitter is ignored.
+    """
+
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or (name.endswith(".p95_ms") and not check_p95):
+            continue
+        change = (current["value"] - previous["value"]) / previous["value"]
+        if current["better"] == HIGHER:
+            change = -change
+        slower_ms = milliseconds(current) - milliseconds(previous)
+        if change > tolerance and slower_ms > noise_floor:
+            regressions.append((name, previous["value"], current["value"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--merge-touchpoints", default="10,100,1000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--noise-floor", type=float, default=0.5)
+    parser.add_argument("--check-p95", action="store_true")
+    args = parser.parse_args()
+    # p95 needs at least two samples per metric
+    if args.repeat < 2 or args.requests < 2:
+        parser.error("--repeat and --requests must be at least 2")
+
+    call_command("migrate", verbosity=0)
+    call_command("flush", interactive=False, verbosity=0)
+
+    measured = {}
+    bench_middleware(measured, args.requests)
+    bench_record_conversion(measured, args.requests)
+    bench_merge(
+        measured,
+        [int(count) for count in args.merge_touchpoints.split(",")],
+        args.repeat * 4,
+    )
+    bench_attribution(
+        measured, [int(size) for size in args.sizes.split(",")], args.repeat
+    )
+
+    results = {
+        name: {"value": value, "unit": unit, "better": better}
+        for name, (value, unit, better) in measured.items()
+    }
+    report = {
+        "metadata": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "machine": platform.platform(),
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    baseline = {}
+    if args.baseline:
+        recorded = json.loads(args.baseline.read_text())
+        baseline = recorded["results"]
+        for key in ("database", "machine"):
+            if recorded["metadata"][key] != report["metadata"][key]:
+                print(
+                    f"WARNING the baseline was recorded on another {key} "
+                    f"({recorded['metadata'][key]}), timings are not comparable"
+                )
+
+    print(f"{'':45} {'baseline':>12} {'current':>12}")
+    for name, result in results.items():
+        previous = baseline.get(name, {}).get("value")
+        previous = f"{previous:12.2f}" if previous is not None else f"{'-':>12}"
+        print(f"{name:45} {previous} {result['value']:12.2f} {result['unit']}")
+
+    regressions = compare(
+        results, baseline, args.tolerance, args.noise_floor, args.check_p95
+    )
+    for name, previous, current, change in regressions:
+        print(f"REGRESSION {name}: {previous:.2f} -> {current:.2f} ({change:+.0%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
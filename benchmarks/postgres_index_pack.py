@@ -0,0 +1,187 @@
+"""
+Before/after benchmark of the PostgreSQL index pack.
+
+Loads synthetic append-only data into a scratch PostgreSQL database, then
+measures the write path (single-row touchpoint inserts, as done by the
+middleware), the read paths (last-touch attribution and valid conversion
+listings) and the index sizes, first with the default indexes and then
+with django_attribution.contrib.postgres_indexes installed.
+
+Usage:
+    PGDATABASE=attribution_bench python benchmarks/postgres_index_pack.py \\
+        --identities 20000 --touchpoints 200000 --conversions 20000
+
+The database is migrated and filled with data; do not point it at a
+database you care about.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+from django.conf import settings
+
+settings.configure(
+    INSTALLED_APPS=[
+        "django.contrib.auth",
+        "django.contrib.contenttypes",
+        "django_attribution",
+        "django_attribution.contrib.postgres_indexes",
+    ],
+    DATABASES={
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("PGDATABASE", "attribution_bench"),
+            "USER": os.environ.get("PGUSER", ""),
+            "PASSWORD": os.environ.get("PGPASSWORD", ""),
+            "HOST": os.environ.get("PGHOST", ""),
+            "PORT": os.environ.get("PGPORT", ""),
+        }
+    },
+    USE_TZ=True,
+)
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from django_attribution.attribution_models import last_touch  # noqa: E402
+from django_attribution.models import Conversion, Identity, Touchpoint  # noqa: E402
+
+SOURCES = ["google", "facebook", "newsletter", "bing", "partner", ""]
+TABLES = [Identity, Touchpoint, Conversion]
+
+
+def load(identities, touchpoints, conversions, days=90):
+    random.seed(0)
+    now = timezone.now()
+    start = now - timedelta(days=days)
+
+    Identity.objects.bulk_create(
+        [Identity(created_at=start) for _ in range(identities)], batch_size=5000
+    )
+    identity_ids = list(Identity.objects.values_list("pk", flat=True))
+
+    def timestamps(count):
+        step = (now - start) / count
+        return (start + step * index for index in range(count))
+
+    Touchpoint.objects.bulk_create(
+        (
+            Touchpoint(
+                identity_id=random.choice(identity_ids),
+                url="https://example.com/landing",
+                utm_source=random.choice(SOURCES),
+                utm_medium="cpc",
+                created_at=created_at,
+            )
+            for created_at in timestamps(touchpoints)
+        ),
+        batch_size=5000,
+    )
+    Conversion.objects.bulk_create(
+        (
+            Conversion(
+                identity_id=random.choice(identity_ids),
+                event="purchase",
+                conversion_value=random.randint(1, 200),
+                is_confirmed=random.random() > 0.1,
+                created_at=created_at,
+            )
+            for created_at in timestamps(conversions)
+        ),
+        batch_size=5000,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def timed(function, repeat):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def measure(repeat):
+    identity = Identity.objects.order_by("?").first()
+    since = timezone.now() - timedelta(days=1)
+
+    def write():
+        for _ in range(100):
+            Touchpoint.objects.create(
+                identity=identity,
+                url="https://example.com/landing",
+                utm_source="google",
+            )
+
+    def attribute():
+        list(
+            Conversion.objects.valid()
+            .filter(created_at__gte=since)
+            .with_attribution(last_touch, window_days=30)
+            .values("pk", "attribution_data")
+        )
+
+    def valid_conversions():
+        list(
+            Conversion.objects.valid()
+            .filter(created_at__gte=since)
+            .values("pk", "conversion_value")
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT sum(pg_indexes_size(to_regclass(t))) FROM unnest(%s::text[]) t",
+            [[model._meta.db_table for model in TABLES]],
+        )
+        index_bytes = cursor.fetchone()[0]
+
+    return {
+        "100 touchpoint inserts (ms)": timed(write, repeat),
+        "last-touch attribution, 1 day (ms)": timed(attribute, repeat),
+        "valid conversions, 1 day (ms)": timed(valid_conversions, repeat),
+        "index size (MB)": index_bytes / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--identities", type=int, default=20_000)
+    parser.add_argument("--touchpoints", type=int, default=200_000)
+    parser.add_argument("--conversions", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    call_command("migrate", "attribution_postgres_indexes", "zero", verbosity=0)
+    with connection.cursor() as cursor:
+        tables = ", ".join(model._meta.db_table for model in TABLES)
+        cursor.execute(f"TRUNCATE {tables} CASCADE")
+
+    load(args.identities, args.touchpoints, args.conversions)
+    before = measure(args.repeat)
+
+    call_command("migrate", "attribution_postgres_indexes", verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    after = measure(args.repeat)
+
+    print(f"{'':40} {'default':>12} {'index pack':>12}")
+    for label, value in before.items():
+        print(f"{label:40} {value:12.1f} {after[label]:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,12 @@ __all__ = [
     "Conversion",
     "LastTouchAttributionModel",
     "FirstTouchAttributionModel",
+    "MarkovAttributionModel",
+    "ShapleyAttributionModel",
     "last_touch",
     "first_touch",
+    "markov",
+    "shapley",
     "record_conversion",
     "attribution_settings",
     "conversion_events",
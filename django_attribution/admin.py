@@ -1,9 +1,341 @@
+import calendar
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Type, cast
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import PermissionDenied
+from django.db import models
+from django.forms.models import BaseInlineFormSet
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import formats, timezone
+from django.utils.functional import cached_property
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
+
+from .dimensions import utm_lookup
+from .exports import stream_csv
+from .facets import get_facet_values
+from .models import ClickIdentifier, Conversion, DailyRollup, Identity, Touchpoint
+from .paginators import EstimatedCountPaginator
+from .rollups import DASHBOARD_GROUPS, dashboard_report
+from .routers import get_read_database
+
+if TYPE_CHECKING:
+    _ModelAdminBase = admin.ModelAdmin
+else:
+    _ModelAdminBase = object
+
+
+class ReadDatabaseAdminMixin(_ModelAdminBase):
+    """
+    Serves changelist pages from READ_DATABASE_ALIAS.
+
+    Only plain GET requests of the changelist are affected: change forms and
+    bulk actions keep reading from the write database, so they never act on
+    stale replica rows.
+    """
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        match = request.resolver_match
+        if (
+            request.method == "GET"
+            and match is not None
+            and match.url_name.endswith("_changelist")
+        ):
+            return queryset.using(get_read_database())
+        return queryset
+
+
+class CalendarDrilldown:
+    """
+    Stands in for the changelist queryset in the date_hierarchy template tag.
+
+    The tag looks for the oldest and newest rows, then lists the distinct
+    years, months or days that have rows, each an aggregate over every
+    matching row. Instead, the drilldown offers the calendar: the last
+    `years` years, the months of the selected year and the days of the
+    selected month, without querying the database. Periods without rows
+    simply show an empty changelist.
+    """
+
+    def __init__(self, queryset, field_name: str, params, years: int):
+        self._queryset = queryset
+        self._field_name = field_name
+        self._params = params
+        self._years = years
+
+    def __getattr__(self, name):
+        return getattr(self._queryset, name)
+
+    def aggregate(self, *args, **kwargs):
+        return dict.fromkeys(kwargs)
+
+    def datetimes(self, field_name, kind, *args, **kwargs):
+        today = timezone.localdate()
+
+        if kind == "year":
+            first = today.year - self._years + 1
+            return [date(year, 1, 1) for year in range(first, today.year + 1)]
+
+        year = int(self._lookup("year"))
+        if kind == "month":
+            last = today.month if year == today.year else 12
+            return [date(year, month, 1) for month in range(1, last + 1)]
+
+        month = int(self._lookup("month"))
+        last = calendar.monthrange(year, month)[1]
+        if (year, month) == (today.year, today.month):
+            last = today.day
+        return [date(year, month, day) for day in range(1, last + 1)]
+
+    dates = datetimes
+
+    def _lookup(self, part: str):
+        value = self._params[f"{self._field_name}__{part}"]
+        # ChangeList.params holds lists of values since Django 5.0
+        return value[-1] if isinstance(value, list) else value
+
+
+class CalendarDrilldownChangeList(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        if self.paginator.count != self.result_count:
+            # EstimatedCountPaginator fell back to an exact count
+            self.result_count = self.paginator.count
+            self.multi_page = self.result_count > self.list_per_page
+            self.page_num = min(self.page_num, self.paginator.num_pages)
+        if self.date_hierarchy:
+            self.queryset = CalendarDrilldown(
+                self.queryset,
+                self.date_hierarchy,
+                self.params,
+                cast(LargeTableAdminMixin, self.model_admin).date_hierarchy_years,
+            )
+
+
+class CachedValuesListFilter(admin.FieldListFilter):
+    """
+    List filter whose options come from get_facet_values() instead of a
+    SELECT DISTINCT over the whole table on every changelist view.
+
+    Renders like admin.AllValuesFieldListFilter. Options are capped at
+    FACET_MAX_OPTIONS; rarer values can still be filtered on through the
+    URL. UTM filters follow the values to CampaignDimension when
+    NORMALIZE_UTM is enabled.
+    """
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.model = model
+        self.lookup_kwarg = field_path
+        self.lookup_kwarg_isnull = f"{field_path}__isnull"
+        self.lookup_val = params.get(self.lookup_kwarg)
+        self.lookup_val_isnull = params.get(self.lookup_kwarg_isnull)
+        self.empty_value_display = model_admin.get_empty_value_display()
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    @cached_property
+    def lookup_choices(self) -> List[Any]:
+        # Only when rendered: CSV exports apply the filter without options
+        return get_facet_values(self.model, self.field_path)
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg, self.lookup_kwarg_isnull]
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {
+            f"{index}__c": models.Count(
+                pk_attname,
+                filter=models.Q(
+                    (self.lookup_kwarg, value)
+                    if value is not None
+                    else (self.lookup_kwarg_isnull, True)
+                ),
+            )
+            for index, value in enumerate(self.lookup_choices)
+        }
+
+    def choices(self, changelist):
+        add_facets = getattr(changelist, "add_facets", False)
+        facet_counts = self.get_facet_queryset(changelist) if add_facets else {}
+        yield {
+            "selected": self.lookup_val is None and self.lookup_val_isnull is None,
+            "query_string": changelist.get_query_string(
+                remove=[self.lookup_kwarg, self.lookup_kwarg_isnull]
+            ),
+            "display": "All",
+        }
+        include_none = False
+        empty_title = self.empty_value_display
+        for index, value in enumerate(self.lookup_choices):
+            count = f" ({facet_counts[f'{index}__c']})" if add_facets else ""
+            if value is None:
+                include_none = True
+                empty_title = f"{empty_title}{count}"
+                continue
+            value = str(value)
+            yield {
+                "selected": self.lookup_val is not None and value in self.lookup_val,
+                "query_string": changelist.get_query_string(
+                    {self.lookup_kwarg: value}, [self.lookup_kwarg_isnull]
+                ),
+                "display": f"{value}{count}",
+            }
+        if include_none:
+            yield {
+                "selected": bool(self.lookup_val_isnull),
+                "query_string": changelist.get_query_string(
+                    {self.lookup_kwarg_isnull: "True"}, [self.lookup_kwarg]
+                ),
+                "display": empty_title,
+            }
+
+    def queryset(self, request, queryset):
+        lookup = utm_lookup(self.field_path)
+        if lookup != self.field_path:
+            self.used_parameters = {
+                lookup + name[len(self.field_path) :]: value
+                for name, value in self.used_parameters.items()
+            }
+        return super().queryset(request, queryset)
 
-from .models import Conversion, Identity, Touchpoint
 
+class LargeTableAdminMixin(_ModelAdminBase):
+    """
+    Keeps changelists of large tables away from full-table aggregates.
 
-class TouchpointInline(admin.TabularInline):
+    Totals come from planner estimates (see EstimatedCountPaginator), the
+    unfiltered total and per-option facet counts are not computed, and the
+    date hierarchy offers calendar periods instead of aggregating the table
+    (see CalendarDrilldown).
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    if hasattr(admin, "ShowFacets"):  # Django 5.0+
+        show_facets = admin.ShowFacets.NEVER
+    date_hierarchy_years: int = 5
+
+    def get_changelist(self, request, **kwargs):
+        return CalendarDrilldownChangeList
+
+
+class FilteredQuerysetChangeList:
+    """ChangeList mixin skipping get_results(), for views needing the queryset."""
+
+    def get_results(self, request):
+        pass
+
+
+class CsvExportAdminMixin(_ModelAdminBase):
+    """
+    Streams changelist rows as CSV.
+
+    The "Export selected as CSV" action exports the selected rows, and the
+    "Export CSV" button exports everything matching the current filters and
+    search. Rows are streamed from READ_DATABASE_ALIAS in chunks (see
+    exports.py), so large exports neither sit in worker memory nor wait for
+    the whole result before the first byte is sent. With export_attribution,
+    conversions can also be exported with their last-touch attribution.
+    """
+
+    change_list_template = "admin/django_attribution/export_change_list.html"
+    actions = ["export_csv", "export_csv_with_attribution"]
+    export_fields: Sequence[str] = ()
+    export_attribution = False
+    attribution_param = "_attribution"
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if not self.export_attribution:
+            actions.pop("export_csv_with_attribution", None)
+        return actions
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                "export/",
+                self.admin_site.admin_view(self.export_view),
+                name=f"{opts.app_label}_{opts.model_name}_export",
+            ),
+            *super().get_urls(),
+        ]
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        request.GET = request.GET.copy()
+        attribution = request.GET.pop(self.attribution_param, None) is not None
+        request.csv_export = True
+        changelist = self.get_changelist_instance(request)
+        return self._export(changelist.queryset, attribution)
+
+    def get_changelist(self, request, **kwargs):
+        changelist = super().get_changelist(request, **kwargs)
+        if getattr(request, "csv_export", False):
+            # Filters and search only: no count and no page of results
+            return type(
+                f"Export{changelist.__name__}",
+                (FilteredQuerysetChangeList, changelist),
+                {},
+            )
+        return changelist
+
+    @admin.action(description="Export selected as CSV")
+    def export_csv(self, request, queryset):
+        return self._export(queryset)
+
+    @admin.action(description="Export selected as CSV with attribution")
+    def export_csv_with_attribution(self, request, queryset):
+        return self._export(queryset, attribution=True)
+
+    def _export(self, queryset, attribution=False):
+        attribution = attribution and self.export_attribution
+        queryset = queryset.using(get_read_database())
+        if attribution:
+            queryset = queryset.with_attribution()
+
+        filename = f"{self.model._meta.model_name}s-{timezone.localdate()}.csv"
+        return stream_csv(queryset, self.export_fields, filename, attribution)
+
+
+class RecentRowsFormSet(BaseInlineFormSet):
+    max_rows: Optional[int] = None
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            queryset = super().get_queryset()
+            if self.max_rows is not None:
+                queryset = queryset[: self.max_rows]
+            self._queryset = queryset
+        return self._queryset
+
+
+class RecentRowsInline(admin.TabularInline):
+    """
+    Inline showing only the max_rows most recent related rows.
+
+    Identities of bots or long-lived visitors can have tens of thousands of
+    touchpoints; the parent admin links to the filtered changelist for the
+    rest.
+    """
+
+    formset = RecentRowsFormSet
+    max_rows = 20
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = cast(
+            Type[RecentRowsFormSet], super().get_formset(request, obj, **kwargs)
+        )
+        formset.max_rows = self.max_rows
+        return formset
+
+
+class TouchpointInline(RecentRowsInline):
     model = Touchpoint
     extra = 0
     readonly_fields = (
@@ -19,7 +351,16 @@ class TouchpointInline(admin.TabularInline):
     ordering = ("-created_at",)
 
 
-class ConversionInline(admin.TabularInline):
+class ClickIdentifierInline(admin.TabularInline):
+    model = ClickIdentifier
+    extra = 0
+    fields = (
+        "platform",
+        "value",
+    )
+
+
+class ConversionInline(RecentRowsInline):
     model = Conversion
     extra = 0
     readonly_fields = (
@@ -54,7 +395,7 @@ class IsCanonicalFilter(admin.SimpleListFilter):
 
 
 @admin.register(Identity)
-class IdentityAdmin(admin.ModelAdmin):
+class IdentityAdmin(LargeTableAdminMixin, ReadDatabaseAdminMixin, admin.ModelAdmin):
     list_display = (
         "linked_user",
         "created_at",
@@ -65,6 +406,7 @@ class IdentityAdmin(admin.ModelAdmin):
     readonly_fields = (
         "uuid",
         "created_at",
+        "activity_summary",
     )
 
     fieldsets = (
@@ -74,7 +416,7 @@ class IdentityAdmin(admin.ModelAdmin):
         ),
         (
             "Tracking",
-            {"fields": ("merged_into",)},
+            {"fields": ("merged_into", "activity_summary")},
         ),
         ("Timestamps", {"fields": ("created_at",)}),
     )
@@ -94,56 +436,156 @@ class IdentityAdmin(admin.ModelAdmin):
 
     is_canonical.boolean = True  # type: ignore
 
+    @admin.display(description="activity")
+    def activity_summary(self, obj: Identity) -> str:
+        if obj.pk is None:
+            return "-"
+
+        summary = (
+            Identity.objects.using(obj._state.db)
+            .with_activity_summary()
+            .values(
+                "touchpoint_count",
+                "first_touch_at",
+                "last_touch_at",
+                "conversion_count",
+                "conversion_value",
+                "first_conversion_at",
+                "last_conversion_at",
+            )
+            .get(pk=obj.pk)
+        )
+
+        rows = [
+            (
+                f"{summary['touchpoint_count']} touchpoints",
+                self._seen_between(summary["first_touch_at"], summary["last_touch_at"]),
+                self._changelist_url("touchpoint", obj),
+            ),
+            (
+                f"{summary['conversion_count']} conversions, valid value "
+                f"{formats.localize(summary['conversion_value'] or 0)}",
+                self._seen_between(
+                    summary["first_conversion_at"], summary["last_conversion_at"]
+                ),
+                self._changelist_url("conversion", obj),
+            ),
+        ]
+        return format_html_join(
+            mark_safe("<br>"),
+            '{} {} (<a href="{}">view all</a>)',
+            rows,
+        )
+
+    @staticmethod
+    def _seen_between(first, last) -> str:
+        if first is None:
+            return ""
+        return (
+            f"from {formats.localize(timezone.localtime(first))} "
+            f"to {formats.localize(timezone.localtime(last))}"
+        )
+
+    @staticmethod
+    def _changelist_url(model_name: str, obj: Identity) -> str:
+        url = reverse(f"admin:django_attribution_{model_name}_changelist")
+        return f"{url}?identity__id__exact={obj.pk}"
+
 
 @admin.register(Touchpoint)
-class TouchpointAdmin(admin.ModelAdmin):
+class TouchpointAdmin(
+    CsvExportAdminMixin,
+    LargeTableAdminMixin,
+    ReadDatabaseAdminMixin,
+    admin.ModelAdmin,
+):
     list_display = (
-        "utm_source",
-        "utm_medium",
-        "utm_campaign",
+        "source",
+        "medium",
+        "campaign",
+        "created_at",
+    )
+    list_select_related = ("campaign_dimension",)
+    list_filter = (
+        ("utm_source", CachedValuesListFilter),
+        ("utm_medium", CachedValuesListFilter),
+        ("channel", CachedValuesListFilter),
         "created_at",
     )
-    list_filter = ("utm_source", "utm_medium", "created_at")
     search_fields = ("url", "utm_source", "utm_campaign")
-    readonly_fields = ("uuid", "created_at")
+    readonly_fields = ("uuid", "created_at", "campaign_dimension", "referrer_host")
     autocomplete_fields = ["identity"]
 
     fieldsets = (
-        (None, {"fields": ("uuid", "identity", "created_at", "url", "referrer")}),
         (
-            "UTM Parameters",
+            None,
             {
                 "fields": (
-                    "utm_source",
-                    "utm_medium",
-                    "utm_campaign",
-                    "utm_term",
-                    "utm_content",
+                    "uuid",
+                    "identity",
+                    "created_at",
+                    "url",
+                    "referrer",
+                    "referrer_host",
                 )
             },
         ),
         (
-            "Click Tracking Parameters",
+            "UTM Parameters",
             {
                 "fields": (
-                    "fbclid",
-                    "gclid",
-                    "msclkid",
-                    "ttclid",
-                    "li_fat_id",
-                    "twclid",
-                    "igshid",
+                    "utm_source",
+                    "utm_medium",
+                    "utm_campaign",
+                    "utm_term",
+                    "utm_content",
+                    "campaign_dimension",
                 )
             },
         ),
     )
 
+    inlines = [ClickIdentifierInline]
     date_hierarchy = "created_at"
     ordering = ("-created_at",)
 
+    export_fields = (
+        "uuid",
+        "identity__uuid",
+        "created_at",
+        "url",
+        "referrer_host",
+        "utm_source",
+        "utm_medium",
+        "utm_campaign",
+        "utm_term",
+        "utm_content",
+        "channel",
+    )
+
+    def get_search_fields(self, request):
+        return tuple(utm_lookup(field) for field in self.search_fields)
+
+    @admin.display(description="source", ordering=utm_lookup("utm_source"))
+    def source(self, obj: Touchpoint) -> str:
+        return obj.get_utm("utm_source")
+
+    @admin.display(description="medium", ordering=utm_lookup("utm_medium"))
+    def medium(self, obj: Touchpoint) -> str:
+        return obj.get_utm("utm_medium")
+
+    @admin.display(description="campaign", ordering=utm_lookup("utm_campaign"))
+    def campaign(self, obj: Touchpoint) -> str:
+        return obj.get_utm("utm_campaign")
+
 
 @admin.register(Conversion)
-class ConversionAdmin(admin.ModelAdmin):
+class ConversionAdmin(
+    CsvExportAdminMixin,
+    LargeTableAdminMixin,
+    ReadDatabaseAdminMixin,
+    admin.ModelAdmin,
+):
     list_display = (
         "event",
         "conversion_value",
@@ -152,8 +594,8 @@ class ConversionAdmin(admin.ModelAdmin):
         "is_confirmed",
     )
     list_filter = (
-        "event",
-        "currency",
+        ("event", CachedValuesListFilter),
+        ("currency", CachedValuesListFilter),
         "created_at",
     )
     search_fields = (
@@ -187,3 +629,70 @@ class ConversionAdmin(admin.ModelAdmin):
 
     date_hierarchy = "created_at"
     ordering = ("-created_at",)
+
+    export_fields = (
+        "uuid",
+        "identity__uuid",
+        "event",
+        "created_at",
+        "conversion_value",
+        "currency",
+        "is_confirmed",
+        "is_active",
+    )
+    export_attribution = True
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    """
+    Attribution dashboard in place of the DailyRollup changelist.
+
+    Totals by source, medium or campaign over the selected range are summed
+    from the rollup table and cached (see dashboard_report), so a page view
+    never aggregates touchpoints or conversions. Rollups are written by the
+    rollup_attribution command only.
+    """
+
+    dashboard_template = "admin/django_attribution/dailyrollup/dashboard.html"
+    range_choices = (7, 30, 90, 365)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        days = request.GET.get("days", "")
+        days = int(days) if days.isdigit() else 0
+        if days not in self.range_choices:
+            days = self.range_choices[1]
+        group = request.GET.get("group")
+        if group not in DASHBOARD_GROUPS:
+            group = "source"
+
+        end = timezone.localdate()
+        start = end - timedelta(days=days - 1)
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Attribution dashboard",
+            "opts": self.model._meta,
+            "start": start,
+            "end": end,
+            "days": days,
+            "group": group,
+            "range_choices": self.range_choices,
+            "group_choices": list(DASHBOARD_GROUPS),
+            "report": dashboard_report(start, end, group),
+            **(extra_context or {}),
+        }
+        request.current_app = self.admin_site.name
+        return TemplateResponse(request, self.dashboard_template, context)
@@ -0,0 +1,352 @@
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .conf import attribution_settings
+from .models import (
+    AttributionChange,
+    ClickIdentifier,
+    Conversion,
+    Identity,
+    Touchpoint,
+)
+from .retention import orphaned_identities
+from .routers import get_write_database
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "ArchiveError",
+    "archive_before",
+    "restore_archive",
+]
+
+MANIFEST_NAME = "manifest.json"
+
+# Order matters: restoring loads kinds in this order so that foreign keys
+# resolve, deleting walks it backwards.
+ARCHIVED_KINDS = ("identities", "touchpoints", "click_identifiers", "conversions")
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archive_before(
+    cutoff: datetime,
+    directory: Union[str, Path],
+    delete: bool = True,
+    chunk_size: int = 2000,
+) -> Dict[str, Any]:
+    """
+    Archives identities, touchpoints and conversions created before cutoff.
+
+    Rows are streamed with server-side cursors into one gzip-compressed JSON
+    Lines file per kind and day (<directory>/<kind>/<YYYY-MM-DD>.jsonl.gz),
+    and a manifest with the row count and SHA-256 of every file is written
+    last. Once every file has been read back and matches the manifest, the
+    archived rows are deleted by primary key in chunks, so rows written after
+    the export started are never touched. Identities are only deleted if
+    they are anonymous and nothing refers to them anymore. Attribution
+    credits and change-log entries are derived data: they are not archived
+    and go away with their conversions.
+
+    Args:
+        cutoff: Rows created before this moment are archived
+        directory: Empty or missing directory to write the archive to
+        delete: Delete the archived rows once the archive is verified
+        chunk_size: Rows fetched, and deleted, per database round trip
+
+    Returns:
+        The manifest
+    """
+
+    directory = Path(directory)
+    if (directory / MANIFEST_NAME).exists():
+        raise ArchiveError(f"{directory} already contains an archive")
+
+    sources = {
+        "identities": Identity.objects.filter(created_at__lt=cutoff),
+        "touchpoints": Touchpoint.objects.filter(created_at__lt=cutoff),
+        "click_identifiers": ClickIdentifier.objects.filter(
+            touchpoint__created_at__lt=cutoff
+        ),
+        "conversions": Conversion.objects.filter(created_at__lt=cutoff),
+    }
+
+    files = []
+    for kind in ARCHIVED_KINDS:
+        files += _write_shards(sources[kind], kind, directory, chunk_size)
+
+    manifest = {
+        "cutoff": cutoff.isoformat(),
+        "created_at": timezone.now().isoformat(),
+        "counts": {
+            kind: sum(entry["rows"] for entry in files if entry["kind"] == kind)
+            for kind in ARCHIVED_KINDS
+        },
+        "files": files,
+    }
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+    logger.info(f"Archived {manifest['counts']} to {directory}")
+
+    if delete:
+        verify_archive(directory, manifest)
+        _delete_archived(directory, manifest, chunk_size)
+
+    return manifest
+
+
+def read_manifest(directory: Union[str, Path]) -> Dict[str, Any]:
+    path = Path(directory) / MANIFEST_NAME
+    if not path.exists():
+        raise ArchiveError(f"No archive manifest found in {directory}")
+    return json.loads(path.read_text())
+
+
+def verify_archive(
+    directory: Union[str, Path], manifest: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Checks every archive file against the row count and checksum recorded
+    in the manifest, raising ArchiveError on the first mismatch.
+    """
+
+    directory = Path(directory)
+    manifest = manifest or read_manifest(directory)
+
+    for entry in manifest["files"]:
+        path = directory / entry["path"]
+        if not path.exists():
+            raise ArchiveError(f"Missing archive file {entry['path']}")
+        if _checksum(path) != entry["sha256"]:
+            raise ArchiveError(f"Checksum mismatch for {entry['path']}")
+        if sum(1 for _ in _read_rows(path)) != entry["rows"]:
+            raise ArchiveError(f"Row count mismatch for {entry['path']}")
+
+
+def restore_archive(
+    directory: Union[str, Path], batch_size: int = 1000
+) -> Dict[str, int]:
+    """
+    Loads an archive written by archive_before() back into the database.
+
+    The archive is verified first, then each kind is bulk-inserted with its
+    original primary keys; rows that still exist are left as they are.
+    References to rows that no longer exist (a deleted user, a purged
+    identity) are cleared. With TRACK_CHANGES enabled, restored touchpoints
+    and conversions are recorded in the change log so that
+    refresh_attribution re-attributes the affected conversions.
+
+    Returns:
+        Number of rows read per kind
+    """
+
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    verify_archive(directory, manifest)
+
+    counts = {}
+    for kind in ARCHIVED_KINDS:
+        rows = _iter_rows(directory, manifest, kind)
+        if kind == "identities":
+            # Canonical identities first, so that merged ones can point at them
+            rows = itertools.chain(
+                (row for row in rows if row["merged_into_id"] is None),
+                (
+                    row
+                    for row in _iter_rows(directory, manifest, kind)
+                    if row["merged_into_id"] is not None
+                ),
+            )
+
+        counts[kind] = 0
+        for batch in _batches(rows, batch_size):
+            with transaction.atomic(using=get_write_database()):
+                RESTORERS[kind](batch)
+            counts[kind] += len(batch)
+
+    logger.info(f"Restored {counts} from {directory}")
+    return counts
+
+
+def _write_shards(
+    queryset: models.QuerySet, kind: str, directory: Path, chunk_size: int
+) -> List[Dict[str, Any]]:
+    model = queryset.model
+    fields = [field.attname for field in model._meta.concrete_fields]
+    date_field = "touchpoint__created_at" if model is ClickIdentifier else "created_at"
+
+    rows = (
+        queryset.order_by(date_field, "pk")
+        .values(*fields, shard_at=models.F(date_field))
+        .iterator(chunk_size=chunk_size)
+    )
+
+    files = []
+    for day, shard_rows in itertools.groupby(
+        rows, key=lambda row: row["shard_at"].date()
+    ):
+        path = directory / kind / f"{day.isoformat()}.jsonl.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        count = 0
+        with gzip.open(path, "wt", encoding="utf-8") as handle:
+            for row in shard_rows:
+                del row["shard_at"]
+                handle.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+                count += 1
+
+        files.append(
+            {
+                "kind": kind,
+                "path": path.relative_to(directory).as_posix(),
+                "rows": count,
+                "sha256": _checksum(path),
+            }
+        )
+
+    return files
+
+
+def _delete_archived(
+    directory: Path, manifest: Dict[str, Any], chunk_size: int
+) -> None:
+    cutoff = datetime.fromisoformat(manifest["cutoff"])
+    deletions = {
+        "conversions": Conversion.objects.filter(created_at__lt=cutoff),
+        # Click identifiers go away with their touchpoints
+        "touchpoints": Touchpoint.objects.filter(created_at__lt=cutoff),
+        "identities": orphaned_identities(Identity.objects.all()),
+    }
+
+    for kind, queryset in deletions.items():
+        pks = (row["id"] for row in _iter_rows(directory, manifest, kind))
+        deleted = 0
+        for batch in _batches(pks, chunk_size):
+            with transaction.atomic(using=get_write_database()):
+                _, per_model = queryset.filter(pk__in=batch).delete()
+            deleted += per_model.get(queryset.model._meta.label, 0)
+        logger.info(f"Deleted {deleted} archived {kind}")
+
+
+def _restore_identities(rows: List[Dict[str, Any]]) -> None:
+    from django.contrib.auth import get_user_model
+
+    _clear_missing(rows, "linked_user_id", get_user_model())
+    _clear_missing(rows, "merged_into_id", Identity)
+    _bulk_insert(Identity, rows)
+
+
+def _restore_touchpoints(rows: List[Dict[str, Any]]) -> None:
+    _clear_missing(rows, "identity_id", Identity)
+    _bulk_insert(Touchpoint, rows)
+
+    # Rows are in created_at order, so the first one of an identity is its
+    # earliest restored touchpoint
+    since: Dict[int, datetime] = {}
+    for row in rows:
+        identity_id = row["identity_id"]
+        created_at = parse_datetime(row["created_at"])
+        if identity_id is not None and identity_id not in since and created_at:
+            since[identity_id] = created_at
+    _log_changes(
+        AttributionChange(
+            kind=AttributionChange.Kind.TOUCHPOINTS_ADDED,
+            identity_id=identity_id,
+            since=created_at,
+        )
+        for identity_id, created_at in since.items()
+    )
+
+
+def _restore_click_identifiers(rows: List[Dict[str, Any]]) -> None:
+    _bulk_insert(ClickIdentifier, rows)
+
+
+def _restore_conversions(rows: List[Dict[str, Any]]) -> None:
+    _clear_missing(rows, "identity_id", Identity)
+    # Conversion.objects.bulk_create() logs the restored conversions
+    _bulk_insert(Conversion, rows)
+
+
+RESTORERS = {
+    "identities": _restore_identities,
+    "touchpoints": _restore_touchpoints,
+    "click_identifiers": _restore_click_identifiers,
+    "conversions": _restore_conversions,
+}
+
+
+def _bulk_insert(model, rows: List[Dict[str, Any]]) -> None:
+    opts = model._meta
+    model.objects.bulk_create(
+        [
+            model(
+                **{
+                    name: opts.get_field(name).to_python(value)
+                    for name, value in row.items()
+                }
+            )
+            for row in rows
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _clear_missing(rows: List[Dict[str, Any]], attname: str, model) -> None:
+    referenced = {row[attname] for row in rows if row[attname] is not None}
+    existing = set(
+        model._default_manager.filter(pk__in=referenced).values_list("pk", flat=True)
+    )
+    for row in rows:
+        if row[attname] not in existing:
+            row[attname] = None
+
+
+def _log_changes(changes: Iterator[AttributionChange]) -> None:
+    if attribution_settings.TRACK_CHANGES:
+        AttributionChange.objects.bulk_create(list(changes))
+
+
+def _iter_rows(
+    directory: Path, manifest: Dict[str, Any], kind: str
+) -> Iterator[Dict[str, Any]]:
+    for entry in manifest["files"]:
+        if entry["kind"] == kind:
+            yield from _read_rows(directory / entry["path"])
+
+
+def _read_rows(path: Path) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            yield json.loads(line)
+
+
+def _batches(items, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _checksum(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -1,10 +1,15 @@
+import logging
+from collections import Counter
 from datetime import timedelta
-from typing import Dict, Optional
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
 
-from django.db import models
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models, transaction
 from django.db.models import (
     JSONField,
     OuterRef,
+    Prefetch,
     Q,
     Subquery,
     Value,
@@ -13,15 +18,26 @@ from django.db.models.functions import (
     Coalesce,
     JSONObject,
 )
+from django.utils import timezone
 
 from django_attribution.conf import attribution_settings
+from django_attribution.dimensions import utm_lookup
+from django_attribution.journeys import Journey, iter_journeys, touchpoint_label
+from django_attribution.routers import get_write_database
+
+logger = logging.getLogger(__name__)
 
 __all__ = [
     "SingleTouchAttributionModel",
     "LastTouchAttributionModel",
     "FirstTouchAttributionModel",
+    "DataDrivenAttributionModel",
+    "MarkovAttributionModel",
+    "ShapleyAttributionModel",
     "last_touch",
     "first_touch",
+    "markov",
+    "shapley",
 ]
 
 
@@ -38,25 +54,80 @@ class SingleTouchAttributionModel:
     considered, with support for different window lengths per traffic source.
     """
 
+    name = ""
+
     def prepare_touchpoints(self, touchpoints_qs):
         raise NotImplementedError
 
-    def apply(
+    def materialize(
         self,
         conversions_qs: models.QuerySet,
         window_days: int = 30,
         source_windows: Optional[Dict[str, int]] = None,
-    ) -> models.QuerySet:
-        from django_attribution.models import Touchpoint
-
-        window_config = self._build_window_config(window_days, source_windows)
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Writes the attributed touchpoint of each conversion to AttributionCredit.
+
+        Each conversion gets a single credit of 1 for the source/medium of
+        its attributed touchpoint; conversions without one get no credit.
+        Existing credits of this model for the conversions are replaced.
+
+        Returns:
+            Number of credit rows written
+        """
+
+        from django_attribution.models import AttributionCredit
+
+        rows = (
+            self.apply(conversions_qs, window_days, source_windows)
+            .order_by()
+            .values_list("pk", "conversion_value", "attribution_data")
+            .iterator(chunk_size=batch_size)
+        )
 
-        touchpoints = Touchpoint.objects.filter(
-            identity=OuterRef("identity"),
-            created_at__lt=OuterRef("created_at"),
-        ).filter(self._build_window_conditions(window_config))
+        written = 0
+        conversion_ids: List[int] = []
+        credits: list = []
+        for pk, value, data in rows:
+            conversion_ids.append(pk)
+            if data:
+                credits.append(
+                    AttributionCredit(
+                        conversion_id=pk,
+                        model=self.name,
+                        channel=touchpoint_label(
+                            data.get("utm_source") or "",
+                            data.get("utm_medium") or "",
+                            data.get("utm_campaign") or "",
+                            "source_medium",
+                        ),
+                        utm_source=data.get("utm_source") or "",
+                        utm_medium=data.get("utm_medium") or "",
+                        utm_campaign=data.get("utm_campaign") or "",
+                        credit=1.0,
+                        attributed_value=value,
+                    )
+                )
+
+            if len(conversion_ids) >= batch_size:
+                written += _replace_credits(self.name, conversion_ids, credits)
+                conversion_ids, credits = [], []
+
+        if conversion_ids:
+            written += _replace_credits(self.name, conversion_ids, credits)
+
+        return written
 
-        touchpoints = self.prepare_touchpoints(touchpoints)
+    def apply(
+        self,
+        conversions_qs: models.QuerySet,
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> models.QuerySet:
+        touchpoints = self.prepare_touchpoints(
+            self.windowed_touchpoints(window_days, source_windows)
+        )
 
         attribution_data = Coalesce(
             Subquery(
@@ -80,8 +151,31 @@ class SingleTouchAttributionModel:
             ),
         )
 
+    def windowed_touchpoints(
+        self,
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> models.QuerySet:
+        """
+        Touchpoints eligible for the outer conversion, for use in subqueries.
+
+        Filters on OuterRef("identity") and OuterRef("created_at"), keeping
+        touchpoints before the conversion and within the window of their
+        source.
+        """
+
+        from django_attribution.models import Touchpoint
+
+        window_config = self._build_window_config(window_days, source_windows)
+
+        return Touchpoint.objects.filter(
+            identity=OuterRef("identity"),
+            created_at__lt=OuterRef("created_at"),
+        ).filter(self._build_window_conditions(window_config))
+
     def _build_window_conditions(self, window_config: Dict[str, int]) -> Q:
         conditions = Q()
+        source_lookup = utm_lookup("utm_source")
 
         for source, days in window_config.items():
             if source == "default":
@@ -89,7 +183,7 @@ class SingleTouchAttributionModel:
 
             window_start = OuterRef("created_at") - timedelta(days=days)
             conditions |= Q(
-                utm_source=source,
+                **{source_lookup: source},
                 created_at__gte=window_start,
             )
 
@@ -100,7 +194,7 @@ class SingleTouchAttributionModel:
         if explicit_sources:
             conditions |= Q(
                 created_at__gte=default_window_start,
-            ) & ~Q(utm_source__in=explicit_sources)
+            ) & ~Q(**{f"{source_lookup}__in": explicit_sources})
         else:
             conditions |= Q(created_at__gte=default_window_start)
 
@@ -116,9 +210,27 @@ class SingleTouchAttributionModel:
 
         return config
 
-    def _get_attribution_fields(self) -> Dict[str, str]:
-        fields = {param: param for param in attribution_settings.TRACKING_PARAMETERS}
+    def _get_attribution_fields(self) -> Dict[str, Any]:
+        from django_attribution.models import ClickIdentifier
+
+        platforms = {label: value for value, label in ClickIdentifier.Platform.choices}
+        fields: Dict[str, Any] = {}
+
+        for param in attribution_settings.TRACKING_PARAMETERS:
+            if param in platforms:
+                fields[param] = Coalesce(
+                    Subquery(
+                        ClickIdentifier.objects.filter(
+                            touchpoint=OuterRef("pk"), platform=platforms[param]
+                        ).values("value")[:1]
+                    ),
+                    Value(""),
+                )
+            else:
+                fields[param] = utm_lookup(param)
+
         fields["referrer"] = "referrer"
+        fields["channel"] = "channel"
         return fields
 
 
@@ -131,6 +243,8 @@ class LastTouchAttributionModel(SingleTouchAttributionModel):
     interaction that directly preceded the conversion action.
     """
 
+    name = "last_touch"
+
     def prepare_touchpoints(self, touchpoints_qs):
         return touchpoints_qs.newest_first()
 
@@ -144,9 +258,519 @@ class FirstTouchAttributionModel(SingleTouchAttributionModel):
     interaction that started the customer journey leading to conversion.
     """
 
+    name = "first_touch"
+
     def prepare_touchpoints(self, touchpoints_qs):
         return touchpoints_qs.oldest_first()
 
 
+class DataDrivenAttributionModel:
+    """
+    Base class for multi-touch models that learn channel weights from data.
+
+    Data-driven models fit one weight per channel over the touchpoint paths of
+    the analysed conversions (see iter_journeys), then split each conversion
+    between the distinct channels of its own path in proportion to those
+    weights. Fractional credits cannot be expressed as a single SQL
+    annotation, so they are computed ahead of time: fit() learns the weights
+    and write_credits() stores the split of each conversion in
+    AttributionCredit (refit() does both, as does the fit_attribution
+    command). apply() only reads the stored credits. Subclasses implement
+    fit().
+    """
+
+    name = ""
+
+    def __init__(
+        self,
+        granularity: str = "source_medium",
+        max_path_length: int = 10,
+        batch_size: int = 1000,
+    ):
+        self.granularity = granularity
+        self.max_path_length = max_path_length
+        self.batch_size = batch_size
+
+    def fit(
+        self,
+        conversions_qs: models.QuerySet,
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, float]:
+        raise NotImplementedError
+
+    def apply(
+        self,
+        conversions_qs: models.QuerySet,
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> models.QuerySet:
+        """
+        Annotates conversions with their stored credits, without writing.
+
+        attribution_data holds the channel with the largest credit, its share
+        and the UTM values of its latest touchpoint ({} for conversions
+        without credits), and every credit is
+        prefetched as `credits`. Credits are those of the last refit() or
+        refresh_attribution run; window_days and source_windows are only
+        reported in attribution_metadata.
+        """
+
+        from django_attribution.models import AttributionCredit
+
+        credits = AttributionCredit.objects.filter(model=self.name)
+        attribution_data = Coalesce(
+            Subquery(
+                credits.filter(conversion=OuterRef("pk"))
+                .order_by("-credit", "channel")
+                .annotate(
+                    attribution_json=JSONObject(
+                        channel="channel",
+                        credit="credit",
+                        utm_source="utm_source",
+                        utm_medium="utm_medium",
+                        utm_campaign="utm_campaign",
+                    )
+                )
+                .values("attribution_json")[:1],
+                output_field=JSONField(),
+            ),
+            Value({}, output_field=JSONField()),
+        )
+
+        return conversions_qs.annotate(
+            attribution_data=attribution_data,
+            attribution_metadata=Value(
+                {
+                    "model": self.__class__.__name__,
+                    "window_days": window_days,
+                    "source_windows": source_windows,
+                },
+                output_field=JSONField(),
+            ),
+        ).prefetch_related(
+            Prefetch("attribution_credits", queryset=credits, to_attr="credits")
+        )
+
+    def refit(
+        self,
+        conversions_qs: models.QuerySet,
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> int:
+        """
+        Fits the weights over conversions_qs, saves them and rewrites the
+        credits of conversions_qs.
+
+        Returns:
+            Number of credit rows written
+        """
+
+        weights = self.fit(conversions_qs, window_days, source_windows)
+        self.save_weights(weights, window_days, source_windows)
+        return self.write_credits(conversions_qs, weights, window_days, source_windows)
+
+    def materialize(
+        self,
+        conversions_qs: models.QuerySet,
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> int:
+        """
+        Writes credits for conversions_qs using already fitted weights.
+
+        Weights are the ones saved by the last refit() with the same window;
+        if the model was never fitted with it, they are fitted once over all
+        valid conversions and saved. Used to re-credit a few conversions
+        without refitting the model.
+        """
+
+        from django_attribution.models import Conversion
+
+        weights = self.load_weights(window_days, source_windows)
+        if weights is None:
+            weights = self.fit(Conversion.objects.valid(), window_days, source_windows)
+            self.save_weights(weights, window_days, source_windows)
+
+        return self.write_credits(conversions_qs, weights, window_days, source_windows)
+
+    def save_weights(
+        self,
+        weights: Dict[str, float],
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> None:
+        from django_attribution.models import AttributionWeights
+
+        AttributionWeights.objects.update_or_create(
+            model=self.name,
+            window=_window_key(window_days, source_windows),
+            defaults={"weights": weights, "fitted_at": timezone.now()},
+        )
+
+    def load_weights(
+        self,
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, float]]:
+        """Weights saved by the last refit() with this window, if any."""
+
+        from django_attribution.models import AttributionWeights
+
+        return (
+            AttributionWeights.objects.filter(
+                model=self.name, window=_window_key(window_days, source_windows)
+            )
+            .values_list("weights", flat=True)
+            .first()
+        )
+
+    def iter_journeys(
+        self,
+        conversions_qs: models.QuerySet,
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+        include_non_converting: bool = False,
+    ):
+        return iter_journeys(
+            conversions_qs,
+            window_days=window_days,
+            source_windows=source_windows,
+            max_path_length=self.max_path_length,
+            granularity=self.granularity,
+            include_non_converting=include_non_converting,
+        )
+
+    def write_credits(
+        self,
+        conversions_qs: models.QuerySet,
+        weights: Dict[str, float],
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> int:
+        """
+        Replaces this model's credits for the given conversions.
+
+        Conversions are processed in batches of batch_size; each batch
+        deletes and re-creates its credits in one transaction.
+
+        Returns:
+            Number of credit rows written
+        """
+
+        written = 0
+        conversion_ids: List[int] = []
+        credits: list = []
+
+        for journey in self.iter_journeys(conversions_qs, window_days, source_windows):
+            conversion_ids.append(journey.conversion_id)
+            credits.extend(self._build_credits(journey, weights))
+
+            if len(conversion_ids) >= self.batch_size:
+                written += self._save_credits(conversion_ids, credits)
+                conversion_ids, credits = [], []
+
+        if conversion_ids:
+            written += self._save_credits(conversion_ids, credits)
+
+        return written
+
+    def _build_credits(self, journey: Journey, weights: Dict[str, float]) -> list:
+        from django_attribution.models import AttributionCredit
+
+        conversion_id = journey.conversion_id
+        if conversion_id is None:
+            return []
+
+        # The latest step of a channel wins when it appears several times
+        dimensions = dict(zip(journey.path, journey.steps))
+        return [
+            AttributionCredit(
+                conversion_id=conversion_id,
+                model=self.name,
+                channel=channel,
+                **dict(
+                    zip(
+                        ("utm_source", "utm_medium", "utm_campaign"),
+                        dimensions.get(channel, ("", "", "")),
+                    )
+                ),
+                credit=share,
+                attributed_value=(journey.value * Decimal(share)).quantize(
+                    Decimal("0.01")
+                ),
+            )
+            for channel, share in self._split(journey.path, weights)
+        ]
+
+    def _split(
+        self, path: Tuple[str, ...], weights: Dict[str, float]
+    ) -> List[Tuple[str, float]]:
+        channels = list(dict.fromkeys(path))
+        if not channels:
+            return []
+
+        total = sum(weights.get(channel, 0.0) for channel in channels)
+        if total <= 0:
+            return [(channel, 1 / len(channels)) for channel in channels]
+
+        return [(channel, weights.get(channel, 0.0) / total) for channel in channels]
+
+    def _save_credits(self, conversion_ids: List[int], credits: list) -> int:
+        return _replace_credits(self.name, conversion_ids, credits)
+
+
+class MarkovAttributionModel(DataDrivenAttributionModel):
+    """
+    Data-driven attribution model based on Markov-chain removal effects.
+
+    Every path becomes a walk start -> channels -> conversion (or null, for
+    touchpoints that were not followed by a conversion). A channel's weight is
+    its removal effect: the relative drop in the probability of reaching
+    conversion from start when all transitions into the channel are sent to
+    null instead.
+
+    Paths are streamed from the database and reduced to distinct path counts;
+    the transition matrix is built with NumPy and all removal effects are
+    derived from two linear solves using rank-one (Sherman-Morrison) updates,
+    so fitting is cubic in the number of channels and linear in the number
+    of distinct paths.
+    """
+
+    name = "markov"
+
+    def fit(
+        self,
+        conversions_qs: models.QuerySet,
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, float]:
+        path_counts: Counter = Counter()
+        for journey in self.iter_journeys(
+            conversions_qs, window_days, source_windows, include_non_converting=True
+        ):
+            path_counts[(journey.path, journey.converted)] += 1
+
+        return self.removal_effects(path_counts)
+
+    def removal_effects(self, path_counts: Counter) -> Dict[str, float]:
+        """
+        Computes normalized removal effects from (path, converted) counts.
+        """
+
+        np = _import_numpy()
+
+        channels = sorted({channel for path, _ in path_counts for channel in path})
+        if not channels:
+            return {}
+
+        index = {channel: position for position, channel in enumerate(channels, 1)}
+        transient = len(channels) + 1
+        converted_state, null_state = transient, transient + 1
+        size = transient + 2
+
+        sources: List[int] = []
+        targets: List[int] = []
+        counts: List[int] = []
+        for (path, converted), count in path_counts.items():
+            states = [0, *(index[channel] for channel in path)]
+            states.append(converted_state if converted else null_state)
+            sources.extend(states[:-1])
+            targets.extend(states[1:])
+            counts.extend([count] * (len(states) - 1))
+
+        transitions = np.bincount(
+            np.asarray(sources) * size + np.asarray(targets),
+            weights=np.asarray(counts, dtype=float),
+            minlength=size * size,
+        ).reshape(size, size)[:transient]
+        totals = transitions.sum(axis=1, keepdims=True)
+        probabilities = np.divide(
+            transitions,
+            totals,
+            out=np.zeros_like(transitions),
+            where=totals > 0,
+        )
+
+        to_transient = probabilities[:, :transient]
+        to_conversion = probabilities[:, converted_state]
+        fundamental = np.eye(transient) - to_transient
+
+        absorbed = np.linalg.solve(fundamental, to_conversion)
+        base = absorbed[0]
+        if base <= 0:
+            return dict.fromkeys(channels, 0.0)
+
+        # Removing channel k zeroes column k of the transient matrix, a
+        # rank-one update of (I - Q); Sherman-Morrison gives every updated
+        # conversion probability from a single extra solve.
+        updates = np.linalg.solve(fundamental, to_transient)
+        removed = base - updates[0] * absorbed / (1 + np.diag(updates))
+
+        effects = np.clip(1 - removed[1:] / base, 0, None)
+        total = effects.sum()
+        if total <= 0:
+            return dict.fromkeys(channels, 0.0)
+
+        return dict(zip(channels, (effects / total).tolist()))
+
+
+class ShapleyAttributionModel(DataDrivenAttributionModel):
+    """
+    Data-driven attribution model based on sampled Shapley values.
+
+    Channels are players and the worth of a coalition is the number of
+    conversions (or their value, with use_value=True) whose path only uses
+    channels of that coalition. The max_channels most frequent channels are
+    kept and the rest are pooled as OTHER_CHANNEL, so coalition worths fit in
+    a compact array indexed by bitmask.
+
+    Exact Shapley values need every ordering of the channels, so they are
+    estimated by permutation sampling until the confidence interval of each
+    value is within error_bound of the total worth. Sampling batches are
+    spread over a process pool when processes > 1.
+    """
+
+    name = "shapley"
+
+    OTHER_CHANNEL = "(other)"
+
+    def __init__(
+        self,
+        granularity: str = "source_medium",
+        max_path_length: int = 10,
+        batch_size: int = 1000,
+        max_channels: int = 16,
+        use_value: bool = False,
+        error_bound: float = 0.01,
+        confidence: float = 0.95,
+        max_permutations: int = 200_000,
+        processes: int = 1,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(granularity, max_path_length, batch_size)
+        if not 1 <= max_channels <= 24:
+            raise ValueError("max_channels must be between 1 and 24")
+
+        self.max_channels = max_channels
+        self.use_value = use_value
+        self.error_bound = error_bound
+        self.confidence = confidence
+        self.max_permutations = max_permutations
+        self.processes = processes
+        self.seed = seed
+
+    def fit(
+        self,
+        conversions_qs: models.QuerySet,
+        window_days: int = 30,
+        source_windows: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, float]:
+        channel_sets: Counter = Counter()
+        for journey in self.iter_journeys(conversions_qs, window_days, source_windows):
+            if journey.path:
+                worth = journey.value if self.use_value else 1
+                channel_sets[frozenset(journey.path)] += worth
+
+        return self.shapley_values(channel_sets)
+
+    def shapley_values(self, channel_sets: Counter) -> Dict[str, float]:
+        """
+        Estimates normalized Shapley values from channel-set worths.
+        """
+
+        np = _import_numpy()
+        from django_attribution.shapley import (
+            coalition_values,
+            estimate_shapley_values,
+        )
+
+        frequency: Counter = Counter()
+        for channels, worth in channel_sets.items():
+            for channel in channels:
+                frequency[channel] += worth
+        if not frequency:
+            return {}
+
+        players = [channel for channel, _ in frequency.most_common()]
+        if len(players) > self.max_channels:
+            players = players[: self.max_channels - 1] + [self.OTHER_CHANNEL]
+        bit = {channel: 1 << position for position, channel in enumerate(players)}
+        other_bit = bit.get(self.OTHER_CHANNEL, 0)
+
+        masks = np.fromiter(
+            (
+                sum({bit.get(channel, other_bit) for channel in channels})
+                for channels in channel_sets
+            ),
+            dtype=np.int64,
+            count=len(channel_sets),
+        )
+        worths = np.fromiter(
+            (float(worth) for worth in channel_sets.values()),
+            dtype=float,
+            count=len(channel_sets),
+        )
+
+        values = coalition_values(masks, worths, len(players))
+        estimates, error = estimate_shapley_values(
+            values,
+            len(players),
+            error_bound=self.error_bound,
+            confidence=self.confidence,
+            max_permutations=self.max_permutations,
+            processes=self.processes,
+            seed=self.seed,
+        )
+        logger.info(
+            f"Estimated Shapley values for {len(players)} channels "
+            f"within {error:.2%} of total worth"
+        )
+
+        total = estimates.sum()
+        if total <= 0:
+            return dict.fromkeys(players, 0.0)
+        return dict(zip(players, (estimates / total).tolist()))
+
+    def _split(
+        self, path: Tuple[str, ...], weights: Dict[str, float]
+    ) -> List[Tuple[str, float]]:
+        if self.OTHER_CHANNEL in weights:
+            path = tuple(
+                channel if channel in weights else self.OTHER_CHANNEL
+                for channel in path
+            )
+        return super()._split(path, weights)
+
+
+def _window_key(window_days: int, source_windows: Optional[Dict[str, int]]) -> str:
+    overrides = sorted((source_windows or {}).items())
+    return ";".join([str(window_days), *(f"{s}={days}" for s, days in overrides)])
+
+
+def _replace_credits(model_name: str, conversion_ids: List[int], credits: list) -> int:
+    from django_attribution.models import AttributionCredit
+
+    with transaction.atomic(using=get_write_database()):
+        AttributionCredit.objects.filter(
+            model=model_name, conversion_id__in=conversion_ids
+        ).delete()
+        AttributionCredit.objects.bulk_create(credits)
+    return len(credits)
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImproperlyConfigured(
+            "Data-driven attribution models require numpy. "
+            "Install it with: pip install django-attribution[data-driven]"
+        ) from e
+    return numpy
+
+
 last_touch = LastTouchAttributionModel()
 first_touch = FirstTouchAttributionModel()
+markov = MarkovAttributionModel()
+shapley = ShapleyAttributionModel()
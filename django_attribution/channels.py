@@ -0,0 +1,131 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .conf import attribution_settings
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "ChannelClassifier",
+    "classify_channel",
+    "get_channel_classifier",
+]
+
+PATTERN_CONDITIONS = ("utm_source", "utm_medium", "utm_campaign", "referrer_host")
+
+MAX_CACHED_CLASSIFICATIONS = 10_000
+
+
+class ChannelClassifier:
+    """
+    Channel grouping rules compiled into a matcher.
+
+    Each rule is a dict with a "channel" and one or more conditions, all of
+    which must match:
+
+    - utm_source, utm_medium, utm_campaign, referrer_host: regular
+      expressions searched case-insensitively in the value
+    - click_ids: click ID parameters, one of which must be present
+
+    Rules are tried in order and the first match wins; visits no rule
+    matches get default_channel. Results are memoized, since most visits
+    repeat a few thousand combinations of values.
+    """
+
+    def __init__(self, rules: Iterable[Mapping[str, Any]], default_channel: str):
+        self.default_channel = default_channel
+        self._rules = [self._compile(rule) for rule in rules]
+        self._classify = lru_cache(maxsize=MAX_CACHED_CLASSIFICATIONS)(self._match)
+
+    def classify(
+        self,
+        values: Mapping[str, str],
+        referrer_host: str = "",
+        click_ids: Iterable[str] = (),
+    ) -> str:
+        """
+        Args:
+            values: Tracking parameter values of the visit
+            referrer_host: Host name of the referrer
+            click_ids: Click ID parameters present on the visit
+
+        Returns:
+            The channel of the first matching rule
+        """
+
+        return self._classify(
+            tuple(values.get(param) or "" for param in PATTERN_CONDITIONS[:3])
+            + (referrer_host or "",),
+            frozenset(click_ids),
+        )
+
+    def _match(self, texts: Tuple[str, ...], click_ids: FrozenSet[str]) -> str:
+        for channel, patterns, required_click_ids in self._rules:
+            if required_click_ids is not None and not (required_click_ids & click_ids):
+                continue
+            if all(pattern.search(texts[index]) for index, pattern in patterns):
+                return channel
+        return self.default_channel
+
+    @staticmethod
+    def _compile(
+        rule: Mapping[str, Any],
+    ) -> Tuple[str, List[Tuple[int, re.Pattern]], Optional[FrozenSet[str]]]:
+        unknown = set(rule) - {"channel", "click_ids", *PATTERN_CONDITIONS}
+        if "channel" not in rule or unknown:
+            raise ImproperlyConfigured(
+                f"Invalid channel rule {dict(rule)}: expected a 'channel' and "
+                f"conditions among: click_ids, {', '.join(PATTERN_CONDITIONS)}"
+            )
+
+        patterns = [
+            (index, re.compile(rule[condition], re.IGNORECASE))
+            for index, condition in enumerate(PATTERN_CONDITIONS)
+            if condition in rule
+        ]
+        click_ids = frozenset(rule["click_ids"]) if "click_ids" in rule else None
+        return rule["channel"], patterns, click_ids
+
+
+_classifier: Dict[str, Any] = {}
+
+
+def get_channel_classifier() -> ChannelClassifier:
+    """
+    Classifier for the CHANNEL_RULES setting, compiled on first use.
+    """
+
+    # Compared by value, so rules changed in place or replaced by a new
+    # list at the same address are recompiled
+    source = (
+        _rules_key(attribution_settings.CHANNEL_RULES),
+        attribution_settings.DEFAULT_CHANNEL,
+    )
+    if _classifier.get("source") != source:
+        _classifier["instance"] = ChannelClassifier(
+            attribution_settings.CHANNEL_RULES, attribution_settings.DEFAULT_CHANNEL
+        )
+        _classifier["source"] = source
+    return _classifier["instance"]
+
+
+def _rules_key(rules: Iterable[Mapping[str, Any]]) -> Tuple:
+    return tuple(
+        tuple(
+            (condition, tuple(value) if condition == "click_ids" else value)
+            for condition, value in sorted(rule.items())
+        )
+        for rule in rules
+    )
+
+
+def classify_channel(
+    values: Mapping[str, str],
+    referrer_host: str = "",
+    click_ids: Iterable[str] = (),
+) -> str:
+    return get_channel_classifier().classify(values, referrer_host, click_ids)
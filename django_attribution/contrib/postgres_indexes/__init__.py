@@ -0,0 +1,7 @@
+"""
+PostgreSQL index pack for the append-only attribution tables.
+
+Add "django_attribution.contrib.postgres_indexes" to INSTALLED_APPS after
+"django_attribution" and run migrate. The migrations only touch PostgreSQL
+databases and are no-ops on other backends.
+"""
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class PostgresIndexesConfig(AppConfig):
+    name = "django_attribution.contrib.postgres_indexes"
+    label = "attribution_postgres_indexes"
+    verbose_name = "Django Attribution PostgreSQL indexes"
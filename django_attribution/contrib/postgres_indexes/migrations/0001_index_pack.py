@@ -0,0 +1,144 @@
+from django.db import migrations
+
+APPEND_ONLY_MODELS = ("identity", "touchpoint", "conversion")
+
+# Single-column btree indexes created by the db_index=True fields of
+# BaseModel. Time-ordered inserts make BRIN a much smaller replacement for
+# created_at, and is_active/updated_at are never searched on their own.
+REPLACED_COLUMNS = ("created_at", "updated_at", "is_active")
+
+# Meta indexes turned into a covering index of the same name, so that later
+# django_attribution migrations (RemoveIndex, RenameIndex) still find them
+COVERED_META_INDEXES = [
+    ("touchpoint", ["identity", "created_at"], ["utm_source", "campaign_dimension_id"]),
+]
+
+INDEXES = [
+    *(
+        (
+            f"attribution_{model}_created_brin",
+            model,
+            "USING brin (created_at)",
+        )
+        for model in APPEND_ONLY_MODELS
+    ),
+    (
+        "attribution_conversion_valid_idx",
+        "conversion",
+        "(identity_id, created_at) WHERE is_active AND is_confirmed",
+    ),
+    (
+        "attribution_conversion_valid_event_idx",
+        "conversion",
+        "(event, created_at) WHERE is_active AND is_confirmed",
+    ),
+]
+
+
+def _is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+        [table],
+    )
+    return cursor.fetchone() is not None
+
+
+def _meta_index(model, fields):
+    return next(index for index in model._meta.indexes if index.fields == fields)
+
+
+def _replaced_indexes(connection, model):
+    meta_index_names = {index.name for index in model._meta.indexes}
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+
+    return [
+        name
+        for name, info in constraints.items()
+        if info["index"]
+        and not info["unique"]
+        and not info["primary_key"]
+        and info["type"] == "btree"
+        and len(info["columns"]) == 1
+        and info["columns"][0] in REPLACED_COLUMNS
+        and name not in meta_index_names
+    ]
+
+
+def install_index_pack(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+
+    quote = schema_editor.quote_name
+    with connection.cursor() as cursor:
+        for name, model_name, definition in INDEXES:
+            table = apps.get_model("django_attribution", model_name)._meta.db_table
+            # Partitioned tables cannot be indexed concurrently
+            concurrently = "" if _is_partitioned(cursor, table) else "CONCURRENTLY "
+            cursor.execute(
+                f"CREATE INDEX {concurrently}IF NOT EXISTS {quote(name)} "
+                f"ON {quote(table)} {definition}"
+            )
+
+        for model_name, fields, include in COVERED_META_INDEXES:
+            model = apps.get_model("django_attribution", model_name)
+            table = model._meta.db_table
+            name = _meta_index(model, fields).name
+            covering = f"{name}_covering"
+            columns = [model._meta.get_field(field).column for field in fields]
+            concurrently = "" if _is_partitioned(cursor, table) else "CONCURRENTLY "
+            cursor.execute(
+                f"CREATE INDEX {concurrently}IF NOT EXISTS {quote(covering)} "
+                f"ON {quote(table)} ({', '.join(map(quote, columns))}) "
+                f"INCLUDE ({', '.join(map(quote, include))})"
+            )
+            cursor.execute(f"DROP INDEX IF EXISTS {quote(name)}")
+            cursor.execute(f"ALTER INDEX {quote(covering)} RENAME TO {quote(name)}")
+
+        for model_name in APPEND_ONLY_MODELS:
+            model = apps.get_model("django_attribution", model_name)
+            for name in _replaced_indexes(connection, model):
+                cursor.execute(f"DROP INDEX IF EXISTS {quote(name)}")
+
+
+def remove_index_pack(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+
+    for model_name in APPEND_ONLY_MODELS:
+        model = apps.get_model("django_attribution", model_name)
+        for column in REPLACED_COLUMNS:
+            schema_editor.execute(
+                schema_editor._create_index_sql(
+                    model, fields=[model._meta.get_field(column)]
+                )
+            )
+
+    for model_name, fields, _ in COVERED_META_INDEXES:
+        model = apps.get_model("django_attribution", model_name)
+        index = _meta_index(model, fields)
+        schema_editor.execute(
+            f"DROP INDEX IF EXISTS {schema_editor.quote_name(index.name)}"
+        )
+        schema_editor.add_index(model, index)
+
+    with connection.cursor() as cursor:
+        for name, _, _ in INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("django_attribution", "0005_clickidentifier"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_index_pack, remove_index_pack, atomic=False),
+    ]
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+from typing import Dict, Mapping, Optional
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .conf import attribution_settings
+from .routers import get_write_database
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "UTM_PARAMETERS",
+    "clear_dimension_cache",
+    "intern_campaign_dimension",
+    "utm_lookup",
+]
+
+UTM_PARAMETERS = (
+    "utm_source",
+    "utm_medium",
+    "utm_campaign",
+    "utm_term",
+    "utm_content",
+)
+
+CACHE_KEY_PREFIX = "django_attribution:campaign_dimension:"
+
+MAX_LOCAL_ENTRIES = 10_000
+
+_local_cache: Dict[str, int] = {}
+
+
+def utm_lookup(param: str) -> str:
+    """
+    ORM lookup path for a tracking parameter of Touchpoint.
+
+    UTM parameters live on CampaignDimension when NORMALIZE_UTM is enabled;
+    any other parameter is returned unchanged.
+    """
+
+    if param in UTM_PARAMETERS and attribution_settings.NORMALIZE_UTM:
+        return f"campaign_dimension__{param}"
+    return param
+
+
+def dimension_key(values: Mapping[str, str]) -> str:
+    joined = "\x1f".join(values.get(param, "") for param in UTM_PARAMETERS)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+
+def intern_campaign_dimension(
+    values: Mapping[str, str], using: Optional[str] = None
+) -> int:
+    """
+    Returns the CampaignDimension id for a combination of UTM values.
+
+    Looks the combination up in an in-process map, then in the
+    DIMENSION_CACHE cache, and only then falls back to get_or_create, so a
+    known combination costs no query. Newly created ids are cached once the
+    surrounding transaction commits, so a rollback cannot leave a dangling id
+    in the caches.
+
+    Ids are per database: pass the alias the touchpoint is written to when
+    attribution tables are sharded.
+    """
+
+    from .models import CampaignDimension
+
+    using = using or get_write_database()
+    key = f"{using}:{dimension_key(values)}"
+
+    pk = _local_cache.get(key)
+    if pk is not None:
+        return pk
+
+    cache = caches[attribution_settings.DIMENSION_CACHE]
+    cache_key = CACHE_KEY_PREFIX + key
+    pk = cache.get(cache_key)
+    if pk is not None:
+        _remember(key, pk)
+        return pk
+
+    dimension, created = CampaignDimension.objects.using(using).get_or_create(
+        key=dimension_key(values),
+        defaults={param: values.get(param, "") for param in UTM_PARAMETERS},
+    )
+
+    def remember():
+        cache.set(cache_key, dimension.pk, timeout=None)
+        _remember(key, dimension.pk)
+
+    if created:
+        logger.debug(f"Created campaign dimension {dimension.pk}")
+        transaction.on_commit(remember, using=using)
+    else:
+        remember()
+
+    return dimension.pk
+
+
+def clear_dimension_cache() -> None:
+    _local_cache.clear()
+
+
+def _remember(key: str, pk: int) -> None:
+    if len(_local_cache) >= MAX_LOCAL_ENTRIES:
+        _local_cache.clear()
+    _local_cache[key] = pk
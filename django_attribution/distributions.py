@@ -0,0 +1,213 @@
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.db import models
+from django.db.models import (
+    Case,
+    Count,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from .dimensions import utm_lookup
+
+__all__ = [
+    "GROUP_FIELDS",
+    "lag_histogram",
+    "touches_histogram",
+]
+
+GROUP_FIELDS = ("utm_source", "utm_medium", "utm_campaign", "channel")
+
+DEFAULT_LAG_EDGES = (1, 3, 7, 14, 30)
+DEFAULT_TOUCHES_EDGES = (1, 2, 3, 5, 10)
+
+
+def lag_histogram(
+    conversions_qs: models.QuerySet,
+    bucket_edges: Sequence[int] = DEFAULT_LAG_EDGES,
+    group_by: Optional[str] = "utm_campaign",
+    model=None,
+    window_days: int = 30,
+    source_windows: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Histogram of days from the first windowed touchpoint to conversion.
+
+    Computed in a single grouped query: each conversion is bucketed by a
+    correlated subquery over its windowed touchpoints (same rules as
+    SingleTouchAttributionModel) and counted per bucket and per attributed
+    group. Conversions without touchpoints in the window are left out.
+
+    Args:
+        conversions_qs: Conversions to analyse
+        bucket_edges: Increasing bucket boundaries in days; bucket i covers
+            [edge i-1, edge i), the last bucket is open-ended
+        group_by: Attributed touchpoint field to group by (one of
+            GROUP_FIELDS), or None for a single distribution
+        model: Single-touch model choosing the attributed touchpoint
+            (defaults to last_touch)
+        window_days: Default attribution window in days
+        source_windows: Per-utm_source window overrides in days
+
+    Returns:
+        Rows with 'group', 'bucket', 'lower', 'upper', 'conversions' and
+        'value' keys, ordered by group and bucket
+    """
+
+    model = _get_model(model)
+    earliest_first = model.windowed_touchpoints(window_days, source_windows).order_by(
+        "created_at"
+    )
+
+    bucket = Subquery(
+        earliest_first.annotate(
+            bucket=_bucket_case(
+                bucket_edges,
+                lambda edge: {
+                    "created_at__gt": OuterRef("created_at") - timedelta(days=edge)
+                },
+            )
+        ).values("bucket")[:1],
+        output_field=IntegerField(),
+    )
+
+    conversions_qs = conversions_qs.annotate(lag_bucket=bucket).filter(
+        lag_bucket__isnull=False
+    )
+    return _histogram(
+        conversions_qs,
+        "lag_bucket",
+        bucket_edges,
+        group_by,
+        model,
+        window_days,
+        source_windows,
+    )
+
+
+def touches_histogram(
+    conversions_qs: models.QuerySet,
+    bucket_edges: Sequence[int] = DEFAULT_TOUCHES_EDGES,
+    group_by: Optional[str] = "utm_campaign",
+    model=None,
+    window_days: int = 30,
+    source_windows: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Histogram of the number of windowed touchpoints before each conversion.
+
+    Same shape and arguments as lag_histogram(); bucket edges are touchpoint
+    counts and conversions without touchpoints fall in the first bucket.
+    """
+
+    model = _get_model(model)
+    windowed = model.windowed_touchpoints(window_days, source_windows)
+    touch_counts = windowed.order_by().values("identity").annotate(touches=Count("pk"))
+
+    bucket = Coalesce(
+        Subquery(
+            touch_counts.annotate(
+                bucket=_bucket_case(bucket_edges, lambda edge: {"touches__lt": edge})
+            ).values("bucket"),
+            output_field=IntegerField(),
+        ),
+        Value(_bucket_for_zero(bucket_edges)),
+    )
+
+    conversions_qs = conversions_qs.annotate(touches_bucket=bucket)
+    return _histogram(
+        conversions_qs,
+        "touches_bucket",
+        bucket_edges,
+        group_by,
+        model,
+        window_days,
+        source_windows,
+    )
+
+
+def _get_model(model):
+    from django_attribution.attribution_models import last_touch
+
+    return last_touch if model is None else model
+
+
+def _validate_edges(bucket_edges: Sequence[int]) -> None:
+    if not bucket_edges or list(bucket_edges) != sorted(set(bucket_edges)):
+        raise ValueError("bucket_edges must be a non-empty increasing sequence")
+
+
+def _bucket_case(bucket_edges: Sequence[int], condition) -> Case:
+    _validate_edges(bucket_edges)
+
+    return Case(
+        *(
+            When(**condition(edge), then=Value(index))
+            for index, edge in enumerate(bucket_edges)
+        ),
+        default=Value(len(bucket_edges)),
+        output_field=IntegerField(),
+    )
+
+
+def _bucket_for_zero(bucket_edges: Sequence[int]) -> int:
+    return next(
+        (index for index, edge in enumerate(bucket_edges) if edge > 0),
+        len(bucket_edges),
+    )
+
+
+def _histogram(
+    conversions_qs: models.QuerySet,
+    bucket_field: str,
+    bucket_edges: Sequence[int],
+    group_by: Optional[str],
+    model,
+    window_days: int,
+    source_windows: Optional[Dict[str, int]],
+) -> List[Dict[str, Any]]:
+    _validate_edges(bucket_edges)
+
+    group_fields = [bucket_field]
+    if group_by is not None:
+        if group_by not in GROUP_FIELDS:
+            raise ValueError(
+                f"Unknown group_by '{group_by}'. "
+                f"Expected one of: {', '.join(GROUP_FIELDS)}"
+            )
+        attributed = model.prepare_touchpoints(
+            model.windowed_touchpoints(window_days, source_windows)
+        )
+        conversions_qs = conversions_qs.annotate(
+            attributed_group=Coalesce(
+                Subquery(attributed.values(utm_lookup(group_by))[:1]), Value("")
+            )
+        )
+        group_fields.insert(0, "attributed_group")
+
+    rows = (
+        conversions_qs.order_by()
+        .values(*group_fields)
+        .annotate(conversions=Count("pk"), value=Sum("conversion_value"))
+        .order_by(*group_fields)
+    )
+
+    lowers = [0, *bucket_edges]
+    uppers = [*bucket_edges, None]
+    return [
+        {
+            "group": row.get("attributed_group"),
+            "bucket": row[bucket_field],
+            "lower": lowers[row[bucket_field]],
+            "upper": uppers[row[bucket_field]],
+            "conversions": row["conversions"],
+            "value": row["value"],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,91 @@
+import csv
+import logging
+from typing import Any, Iterable, Iterator, List, Sequence
+
+from django.http import StreamingHttpResponse
+
+from .conf import attribution_settings
+from .dimensions import utm_lookup
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "attribution_columns",
+    "iter_csv",
+    "stream_csv",
+]
+
+
+# Leading characters that make spreadsheet applications evaluate a cell
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def attribution_columns() -> List[str]:
+    """Keys of the attribution_data annotated by with_attribution()."""
+
+    return [*attribution_settings.TRACKING_PARAMETERS, "referrer", "channel"]
+
+
+def iter_csv(
+    queryset, fields: Sequence[str], attribution: bool = False
+) -> Iterator[str]:
+    """
+    Yields queryset as CSV lines, header first.
+
+    Rows are read with iterator() in EXPORT_CHUNK_SIZE chunks (a server-side
+    cursor on PostgreSQL), so memory use does not grow with the export.
+    Touchpoint UTM fields follow NORMALIZE_UTM. With attribution, queryset
+    must come from with_attribution() and one attributed_<key> column is
+    added per attribution_columns() key. Text cells starting like a formula
+    are prefixed with a quote, since UTM values and URLs come from visitors.
+    """
+
+    lookups = [utm_lookup(field) for field in fields]
+    header = list(fields)
+    extra = attribution_columns() if attribution else []
+    if attribution:
+        lookups.append("attribution_data")
+        header.extend(f"attributed_{key}" for key in extra)
+
+    writer = csv.writer(_Echo())
+    yield writer.writerow(_escape_formulas(header))
+
+    rows = queryset.values_list(*lookups).iterator(
+        chunk_size=attribution_settings.EXPORT_CHUNK_SIZE
+    )
+    for row in rows:
+        yield writer.writerow(
+            _escape_formulas(_flatten(row, extra) if attribution else row)
+        )
+
+
+def stream_csv(
+    queryset, fields: Sequence[str], filename: str, attribution: bool = False
+) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(
+        iter_csv(queryset, fields, attribution), content_type="text/csv"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _flatten(row: Sequence[Any], keys: Iterable[str]) -> List[Any]:
+    *values, data = row
+    data = data or {}
+    return [*values, *(data.get(key, "") for key in keys)]
+
+
+def _escape_formulas(row: Iterable[Any]) -> List[Any]:
+    return [
+        f"'{value}"
+        if isinstance(value, str) and value.startswith(FORMULA_PREFIXES)
+        else value
+        for value in row
+    ]
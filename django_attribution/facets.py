@@ -0,0 +1,128 @@
+import logging
+import time
+from datetime import timedelta
+from typing import Iterator, List, Optional, Tuple, Type
+
+from django.core.cache import caches
+from django.db.models import Count, Model
+from django.utils import timezone
+
+from .conf import attribution_settings
+from .dimensions import UTM_PARAMETERS
+from .routers import get_read_database
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "clear_facet_cache",
+    "get_facet_values",
+    "iter_admin_facets",
+    "refresh_facet_values",
+]
+
+CACHE_KEY_PREFIX = "django_attribution:facets:"
+# Longest a request may spend recomputing options before another may retry
+REFRESH_LOCK_TIMEOUT = 60
+
+
+def get_facet_values(model, field_name: str, using: Optional[str] = None) -> List:
+    """
+    Values of field_name worth offering as filter options, cached.
+
+    Returns the FACET_MAX_OPTIONS most frequent non-empty values among rows
+    created in the last FACET_WINDOW_DAYS days, sorted. The lookup only
+    scans that recent range through the created_at index, and its result is
+    kept in the FACET_CACHE cache. With NORMALIZE_UTM, UTM values come from
+    the small CampaignDimension table instead.
+
+    Values older than FACET_CACHE_TIMEOUT seconds are recomputed by a single
+    request, which holds a lock in the cache; concurrent requests keep
+    serving the stale values meanwhile (no options at all when nothing was
+    cached yet). The refresh_facets command recomputes every admin facet
+    out of band, so that requests find fresh values.
+    """
+
+    using = using or get_read_database()
+    cache = caches[attribution_settings.FACET_CACHE]
+    key = _cache_key(model, field_name, using)
+
+    cached: Optional[Tuple[List, float]] = cache.get(key)
+    if (
+        cached is not None
+        and time.time() - cached[1] < attribution_settings.FACET_CACHE_TIMEOUT
+    ):
+        return cached[0]
+
+    if not cache.add(f"{key}:lock", True, REFRESH_LOCK_TIMEOUT):
+        return cached[0] if cached is not None else []
+    try:
+        return refresh_facet_values(model, field_name, using)
+    finally:
+        cache.delete(f"{key}:lock")
+
+
+def refresh_facet_values(model, field_name: str, using: Optional[str] = None) -> List:
+    """Recomputes and caches the values of get_facet_values()."""
+
+    using = using or get_read_database()
+    key = _cache_key(model, field_name, using)
+    values = _load_values(model, field_name, using)
+    # Kept until replaced, so stale values can be served during a refresh
+    caches[attribution_settings.FACET_CACHE].set(key, (values, time.time()), None)
+    logger.debug(f"Cached {len(values)} facet values for {key}")
+    return values
+
+
+def iter_admin_facets(site=None) -> Iterator[Tuple[Type[Model], str]]:
+    """
+    (model, field name) pairs of the CachedValuesListFilter list filters of
+    the models registered on site (the default admin site).
+    """
+
+    from django.contrib import admin
+
+    from .admin import CachedValuesListFilter
+
+    site = site or admin.site
+    for model, model_admin in site._registry.items():
+        for list_filter in model_admin.list_filter:
+            if (
+                isinstance(list_filter, (list, tuple))
+                and isinstance(list_filter[1], type)
+                and issubclass(list_filter[1], CachedValuesListFilter)
+            ):
+                yield model, list_filter[0]
+
+
+def clear_facet_cache(model, field_name: str, using: Optional[str] = None) -> None:
+    using = using or get_read_database()
+    caches[attribution_settings.FACET_CACHE].delete(
+        _cache_key(model, field_name, using)
+    )
+
+
+def _cache_key(model, field_name: str, using: str) -> str:
+    return f"{CACHE_KEY_PREFIX}{using}:{model._meta.label_lower}:{field_name}"
+
+
+def _load_values(model, field_name: str, using: str) -> List:
+    from .models import CampaignDimension, Touchpoint
+
+    if (
+        model is Touchpoint
+        and field_name in UTM_PARAMETERS
+        and attribution_settings.NORMALIZE_UTM
+    ):
+        queryset = CampaignDimension.objects.using(using)
+    else:
+        since = timezone.now() - timedelta(days=attribution_settings.FACET_WINDOW_DAYS)
+        queryset = model._default_manager.using(using).filter(created_at__gte=since)
+
+    rows = (
+        queryset.exclude(**{field_name: ""})
+        .exclude(**{f"{field_name}__isnull": True})
+        .values(field_name)
+        .annotate(rows=Count("pk"))
+        .order_by("-rows", field_name)[: attribution_settings.FACET_MAX_OPTIONS]
+    )
+    return sorted(row[field_name] for row in rows)
@@ -0,0 +1,172 @@
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from django.db import connections
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+from .conf import attribution_settings
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "PhaseTiming",
+    "RequestProfile",
+    "finish_profile",
+    "log_sink",
+    "phase",
+    "request_profiled",
+    "signal_sink",
+    "start_profile",
+]
+
+# Sent by signal_sink with the profile of a sampled request
+request_profiled = Signal()
+
+_NO_PHASE = nullcontext()
+
+_sinks: Tuple[Tuple[str, ...], List[Callable]] = ((), [])
+
+
+@dataclass
+class PhaseTiming:
+    """
+    Duration and query count of one middleware phase.
+
+    Attributes:
+        name: Phase name (e.g. 'cookie_lookup')
+        duration: Wall-clock seconds spent in the phase
+        queries: Database queries run during the phase, on any alias
+        parent: Name of the enclosing phase, None for top-level phases
+    """
+
+    name: str
+    duration: float = 0.0
+    queries: int = 0
+    parent: Optional[str] = None
+
+
+@dataclass
+class RequestProfile:
+    """
+    Phase timings collected for one sampled request.
+
+    Phases nest: a phase opened inside another (e.g. reconciliation within
+    identity_resolution) is included in its parent's duration and query
+    count. overhead only sums top-level phases.
+    """
+
+    method: str
+    path: str
+    phases: List[PhaseTiming] = field(default_factory=list)
+    _open: List[PhaseTiming] = field(default_factory=list, repr=False)
+    _emitted: bool = field(default=False, repr=False)
+
+    @property
+    def overhead(self) -> float:
+        return sum(timing.duration for timing in self.phases if timing.parent is None)
+
+    @property
+    def queries(self) -> int:
+        return sum(timing.queries for timing in self.phases if timing.parent is None)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[PhaseTiming]:
+        parent = self._open[-1] if self._open else None
+        timing = PhaseTiming(name, parent=parent.name if parent else None)
+        self.phases.append(timing)
+        self._open.append(timing)
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                # Top-level phases count queries for every open phase
+                if (
+                    parent is None
+                    and attribution_settings.INSTRUMENTATION_COUNT_QUERIES
+                ):
+                    for alias in connections:
+                        stack.enter_context(
+                            connections[alias].execute_wrapper(self._count_query)
+                        )
+                yield timing
+        finally:
+            timing.duration += time.perf_counter() - started
+            self._open.pop()
+
+    def _count_query(self, execute, sql, params, many, context):
+        for timing in self._open:
+            timing.queries += 1
+        return execute(sql, params, many, context)
+
+
+def start_profile(request) -> Optional[RequestProfile]:
+    """
+    Profile of request, started on first call if the request is sampled.
+
+    INSTRUMENTATION_SAMPLE_RATE is the share of requests profiled; with the
+    default 0 nothing is recorded and the middlewares pay one attribute
+    lookup per phase.
+    """
+
+    if hasattr(request, "attribution_profile"):
+        return request.attribution_profile
+
+    rate = attribution_settings.INSTRUMENTATION_SAMPLE_RATE
+    profile = None
+    if rate and (rate >= 1 or random.random() < rate):
+        profile = RequestProfile(request.method, request.path)
+    request.attribution_profile = profile
+    return profile
+
+
+def phase(request, name: str):
+    """Context manager timing phase name of request, a no-op if unsampled."""
+
+    profile = getattr(request, "attribution_profile", None)
+    if profile is None:
+        return _NO_PHASE
+    return profile.phase(name)
+
+
+def finish_profile(request) -> None:
+    """Hands the profile of request to every INSTRUMENTATION_SINKS sink, once."""
+
+    profile = getattr(request, "attribution_profile", None)
+    if profile is None or profile._emitted:
+        return
+
+    profile._emitted = True
+    for sink in _get_sinks():
+        try:
+            sink(profile)
+        except Exception:
+            logger.exception(f"Instrumentation sink {sink!r} failed")
+
+
+def log_sink(profile: RequestProfile) -> None:
+    phases = ", ".join(
+        f"{timing.name}={timing.duration * 1000:.2f}ms/{timing.queries}q"
+        for timing in profile.phases
+    )
+    logger.info(
+        f"Attribution {profile.method} {profile.path}: "
+        f"{profile.overhead * 1000:.2f}ms, {profile.queries} queries ({phases})"
+    )
+
+
+def signal_sink(profile: RequestProfile) -> None:
+    request_profiled.send(sender=RequestProfile, profile=profile)
+
+
+def _get_sinks() -> List[Callable]:
+    global _sinks
+
+    paths = tuple(attribution_settings.INSTRUMENTATION_SINKS)
+    if _sinks[0] != paths:
+        _sinks = (paths, [import_string(path) for path in paths])
+    return _sinks[1]
@@ -0,0 +1,274 @@
+import logging
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from django.db import models
+from django.db.models import Max, Min
+
+from .dimensions import utm_lookup
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "Journey",
+    "GRANULARITIES",
+    "iter_journeys",
+    "touchpoint_label",
+]
+
+GRANULARITIES = ("source_medium", "source", "campaign")
+
+DIRECT_LABEL = "direct"
+
+
+class Journey(NamedTuple):
+    """
+    Ordered channel path of one identity, ending in a conversion or not.
+
+    Attributes:
+        identity_id: Identity the path belongs to
+        conversion_id: Conversion the path led to, None for non-converting paths
+        value: Conversion value (zero for non-converting paths)
+        path: Collapsed channel labels, oldest first
+        steps: UTM source, medium and campaign of the latest touchpoint of
+            each path step (empty for non-converting paths)
+    """
+
+    identity_id: int
+    conversion_id: Optional[int]
+    value: Decimal
+    path: Tuple[str, ...]
+    steps: Tuple[Tuple[str, str, str], ...] = ()
+
+    @property
+    def converted(self) -> bool:
+        return self.conversion_id is not None
+
+
+def touchpoint_label(
+    utm_source: str, utm_medium: str, utm_campaign: str, granularity: str
+) -> str:
+    if not utm_source:
+        return DIRECT_LABEL
+
+    if granularity == "source":
+        return utm_source
+    if granularity == "campaign":
+        return utm_campaign or utm_source
+    return f"{utm_source}/{utm_medium}" if utm_medium else utm_source
+
+
+def iter_journeys(
+    conversions_qs: models.QuerySet,
+    window_days: int = 30,
+    source_windows: Optional[Dict[str, int]] = None,
+    max_path_length: int = 10,
+    granularity: str = "source_medium",
+    include_non_converting: bool = False,
+    until: Optional[datetime] = None,
+    chunk_size: int = 2000,
+) -> Iterator[Journey]:
+    """
+    Streams per-conversion touchpoint paths, one identity at a time.
+
+    Conversions and touchpoints are read with two server-side cursors, both
+    ordered by identity and time, and merge-joined in Python, so memory is
+    bounded by the touchpoints of a single identity. A touchpoint belongs to
+    a conversion's path under the same rules as SingleTouchAttributionModel:
+    it happened before the conversion and within the window of its source.
+
+    Paths are collapsed (repeated consecutive labels count once) and capped to
+    the max_path_length steps closest to the conversion.
+
+    Args:
+        conversions_qs: Conversions to build paths for
+        window_days: Default attribution window in days
+        source_windows: Per-utm_source window overrides in days
+        max_path_length: Maximum number of steps kept per path
+        granularity: One of GRANULARITIES, controls the step labels
+        include_non_converting: Also yield paths of touchpoints that were not
+            followed by a conversion (needed by data-driven models)
+        until: End of the reporting period for non-converting paths (at
+            least the last conversion), which otherwise keep every
+            touchpoint up to now. Paths start with the window before the
+            first conversion.
+        chunk_size: Rows fetched per database round trip
+    """
+
+    from django_attribution.models import Touchpoint
+
+    if granularity not in GRANULARITIES:
+        raise ValueError(
+            f"Unknown granularity '{granularity}'. "
+            f"Expected one of: {', '.join(GRANULARITIES)}"
+        )
+    if max_path_length < 1:
+        raise ValueError("max_path_length must be at least 1")
+
+    conversions_qs = conversions_qs.filter(identity__isnull=False)
+    window_for = _build_window_lookup(window_days, source_windows)
+    max_window = timedelta(days=max([window_days, *(source_windows or {}).values()]))
+
+    bounds = conversions_qs.order_by().aggregate(
+        first=Min("created_at"), last=Max("created_at")
+    )
+    if bounds["first"] is None:
+        return
+
+    touchpoints_qs = Touchpoint.objects.using(conversions_qs.db).filter(
+        identity__isnull=False, created_at__gte=bounds["first"] - max_window
+    )
+    if include_non_converting:
+        # Not cut at the last conversion: non-converting paths run on after it
+        if until is not None:
+            touchpoints_qs = touchpoints_qs.filter(
+                created_at__lt=max(until, bounds["last"])
+            )
+    else:
+        touchpoints_qs = touchpoints_qs.filter(
+            identity__in=conversions_qs.values("identity_id"),
+            created_at__lt=bounds["last"],
+        )
+
+    conversion_rows = (
+        conversions_qs.order_by("identity_id", "created_at")
+        .values_list("pk", "identity_id", "created_at", "conversion_value")
+        .iterator(chunk_size=chunk_size)
+    )
+    touchpoint_rows = (
+        touchpoints_qs.order_by("identity_id", "created_at")
+        .values_list(
+            "identity_id",
+            "created_at",
+            utm_lookup("utm_source"),
+            utm_lookup("utm_medium"),
+            utm_lookup("utm_campaign"),
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+    for identity_id, conversions, touches in _group_by_identity(
+        conversion_rows, touchpoint_rows
+    ):
+        touch_times = [touch[0] for touch in touches]
+        labels = [
+            touchpoint_label(source, medium, campaign, granularity)
+            for _, source, medium, campaign in touches
+        ]
+        dimensions = [
+            (source or "", medium or "", campaign or "")
+            for _, source, medium, campaign in touches
+        ]
+        windows = [window_for(touch[1]) for touch in touches]
+
+        end = 0
+        for conversion_id, converted_at, value in conversions:
+            end = bisect_left(touch_times, converted_at, lo=end)
+            steps = _windowed_steps(
+                touch_times,
+                labels,
+                windows,
+                end,
+                converted_at,
+                converted_at - max_window,
+                max_path_length,
+            )
+            yield Journey(
+                identity_id,
+                conversion_id,
+                value or Decimal(0),
+                tuple(labels[index] for index in steps),
+                tuple(dimensions[index] for index in steps),
+            )
+
+        if include_non_converting and end < len(touches):
+            path = tuple(_collapse(labels[end:])[-max_path_length:])
+            yield Journey(identity_id, None, Decimal(0), path)
+
+
+def _build_window_lookup(
+    window_days: int, source_windows: Optional[Dict[str, int]]
+) -> Callable[[str], timedelta]:
+    default = timedelta(days=window_days)
+    overrides = {
+        source: timedelta(days=days) for source, days in (source_windows or {}).items()
+    }
+
+    def window_for(utm_source: str) -> timedelta:
+        return overrides.get(utm_source, default)
+
+    return window_for
+
+
+def _group_by_identity(
+    conversion_rows: Iterator[tuple], touchpoint_rows: Iterator[tuple]
+) -> Iterator[Tuple[int, List[tuple], List[tuple]]]:
+    pending_touch = next(touchpoint_rows, None)
+    pending_conversion = next(conversion_rows, None)
+
+    while pending_touch is not None or pending_conversion is not None:
+        candidates = []
+        if pending_conversion is not None:
+            candidates.append(pending_conversion[1])
+        if pending_touch is not None:
+            candidates.append(pending_touch[0])
+        identity_id = min(candidates)
+
+        conversions = []
+        while pending_conversion is not None and pending_conversion[1] == identity_id:
+            pk, _, created_at, value = pending_conversion
+            conversions.append((pk, created_at, value))
+            pending_conversion = next(conversion_rows, None)
+
+        touches = []
+        while pending_touch is not None and pending_touch[0] == identity_id:
+            touches.append(pending_touch[1:])
+            pending_touch = next(touchpoint_rows, None)
+
+        yield identity_id, conversions, touches
+
+
+def _windowed_steps(
+    touch_times: list,
+    labels: List[str],
+    windows: List[timedelta],
+    end: int,
+    converted_at,
+    earliest,
+    max_path_length: int,
+) -> List[int]:
+    """Indexes of the latest touch of each collapsed path step, oldest first."""
+
+    steps: List[int] = []
+    index = end - 1
+
+    while index >= 0 and len(steps) < max_path_length:
+        touched_at = touch_times[index]
+        if touched_at < earliest:
+            break
+        if touched_at >= converted_at - windows[index] and (
+            not steps or labels[steps[-1]] != labels[index]
+        ):
+            steps.append(index)
+        index -= 1
+
+    steps.reverse()
+    return steps
+
+
+def _collapse(labels: List[str]) -> List[str]:
+    collapsed: List[str] = []
+    for label in labels:
+        if not collapsed or collapsed[-1] != label:
+            collapsed.append(label)
+    return collapsed
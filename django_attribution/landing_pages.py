@@ -0,0 +1,81 @@
+import hashlib
+import logging
+from typing import Dict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .conf import attribution_settings
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "compact_referrer",
+    "landing_page_hash",
+    "landing_path",
+    "referrer_host",
+    "url_fields",
+]
+
+
+def landing_path(url: str) -> str:
+    """
+    Path and query string of a URL, without the tracking parameters.
+
+    Scheme, host and fragment are dropped, and the remaining query
+    parameters keep their order, so every visit of a landing page maps to
+    the same value whatever campaign brought it.
+    """
+
+    parts = urlsplit(url)
+    tracking = set(attribution_settings.TRACKING_PARAMETERS)
+    query = urlencode(
+        [
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if key not in tracking
+        ]
+    )
+    return urlunsplit(("", "", parts.path or "/", query, ""))
+
+
+def landing_page_hash(url: str) -> int:
+    """
+    Signed 64-bit hash of landing_path(url), stored in Touchpoint.url_hash.
+    """
+
+    digest = hashlib.blake2b(landing_path(url).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def referrer_host(referrer: str) -> str:
+    return (urlsplit(referrer).hostname or "")[:255]
+
+
+def compact_referrer(referrer: str) -> str:
+    """
+    Referrer without its query string and fragment, which mostly hold
+    search terms and session ids.
+    """
+
+    parts = urlsplit(referrer)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+def url_fields(url: str, referrer: str) -> Dict[str, object]:
+    """
+    Touchpoint url, referrer, url_hash and referrer_host values for a visit.
+
+    With COMPACT_URLS enabled, url only keeps the landing path and referrer
+    loses its query string.
+    """
+
+    if attribution_settings.COMPACT_URLS:
+        stored_url, stored_referrer = landing_path(url), compact_referrer(referrer)
+    else:
+        stored_url, stored_referrer = url, referrer
+
+    return {
+        "url": stored_url[:2048],
+        "referrer": stored_referrer[:2048],
+        "url_hash": landing_page_hash(url),
+        "referrer_host": referrer_host(referrer),
+    }
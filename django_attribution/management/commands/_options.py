@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def add_window_arguments(parser) -> None:
+    parser.add_argument(
+        "--window-days",
+        type=int,
+        default=30,
+        help="Default attribution window in days (default: 30).",
+    )
+    parser.add_argument(
+        "--source-window",
+        action="append",
+        default=[],
+        metavar="SOURCE=DAYS",
+        help="Per-utm_source window override, may be repeated.",
+    )
+
+
+def add_conversion_filter_arguments(parser) -> None:
+    parser.add_argument(
+        "--event",
+        action="append",
+        default=[],
+        help="Only include conversions of this event, may be repeated.",
+    )
+    parser.add_argument(
+        "--since", help="Only include conversions at or after this date."
+    )
+    parser.add_argument("--until", help="Only include conversions before this date.")
+
+
+def parse_source_windows(values: List[str]) -> Optional[Dict[str, int]]:
+    source_windows = {}
+    for value in values:
+        source, _, days = value.partition("=")
+        if not source or not days.isdigit():
+            raise CommandError(f"Invalid --source-window '{value}', use SOURCE=DAYS")
+        source_windows[source] = int(days)
+    return source_windows or None
+
+
+def parse_moment(value: str) -> datetime:
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date '{value}'")
+        moment = datetime(day.year, day.month, day.day)
+
+    if settings.USE_TZ and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_conversions(queryset, options):
+    if options["event"]:
+        queryset = queryset.filter(event__in=options["event"])
+    if options["since"]:
+        queryset = queryset.filter(created_at__gte=parse_moment(options["since"]))
+    if options["until"]:
+        queryset = queryset.filter(created_at__lt=parse_moment(options["until"]))
+    return queryset
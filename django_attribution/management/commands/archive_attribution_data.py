@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_attribution.archive import ArchiveError, archive_before
+
+from ._options import parse_moment
+
+
+class Command(BaseCommand):
+    help = (
+        "Export identities, touchpoints and conversions created before a date "
+        "to compressed JSON Lines files, then delete the archived rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before", required=True, help="Archive rows created before this date."
+        )
+        parser.add_argument(
+            "--output", required=True, help="Directory to write the archive to."
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Only export, keep the archived rows in the database.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched and deleted per database round trip.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            manifest = archive_before(
+                parse_moment(options["before"]),
+                options["output"],
+                delete=not options["keep"],
+                chunk_size=options["chunk_size"],
+            )
+        except ArchiveError as e:
+            raise CommandError(str(e)) from e
+
+        for kind, count in manifest["counts"].items():
+            self.stdout.write(f"Archived {count} {kind}.")
@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from django_attribution.partitioning import (
+    PARTITIONED_MODELS,
+    detach_partitions,
+    ensure_future_partitions,
+    get_partitioned_model,
+    is_partitioned,
+    partition_table,
+)
+from django_attribution.routers import get_write_database
+
+from ._options import parse_moment
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage monthly PostgreSQL partitions of the touchpoint and conversion "
+        "tables: convert existing tables, create upcoming partitions, or "
+        "detach old months."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "action",
+            choices=["convert", "create", "detach"],
+            help=(
+                "convert: partition the existing tables (one-off, locks them "
+                "while rows are copied); create: add partitions for the coming "
+                "months, run it periodically; detach: remove old months."
+            ),
+        )
+        parser.add_argument(
+            "--model",
+            action="append",
+            choices=PARTITIONED_MODELS,
+            help="Table to act on, may be repeated (default: both).",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Future months to keep partitions for (default: 3).",
+        )
+        parser.add_argument(
+            "--before",
+            help="detach: remove the months that end on or before this date.",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="detach: drop the detached partitions instead of keeping them.",
+        )
+        parser.add_argument(
+            "--database",
+            default=get_write_database(),
+            help="Database to act on (default: the attribution database).",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if connections[using].vendor != "postgresql":
+            raise CommandError("Partitioning requires PostgreSQL.")
+
+        models = [
+            get_partitioned_model(name)
+            for name in options["model"] or PARTITIONED_MODELS
+        ]
+        action = options["action"]
+
+        if action == "convert":
+            for model in models:
+                if is_partitioned(model, using):
+                    self.stdout.write(f"{model._meta.db_table} is already partitioned.")
+                    continue
+                partition_table(model, options["months_ahead"], using)
+                self.stdout.write(
+                    f"Partitioned {model._meta.db_table}, the original rows are "
+                    f"kept in {model._meta.db_table}_legacy."
+                )
+
+        elif action == "create":
+            created = ensure_future_partitions(options["months_ahead"], using)
+            self.stdout.write(f"Created {len(created)} partitions.")
+
+        else:
+            if not options["before"]:
+                raise CommandError("detach requires --before.")
+            before = parse_moment(options["before"]).date()
+            for model in models:
+                if not is_partitioned(model, using):
+                    raise CommandError(f"{model._meta.db_table} is not partitioned.")
+                for name in detach_partitions(model, before, options["drop"], using):
+                    self.stdout.write(
+                        f"{'Dropped' if options['drop'] else 'Detached'} {name}."
+                    )
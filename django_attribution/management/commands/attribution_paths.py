@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from django_attribution.journeys import GRANULARITIES
+from django_attribution.models import Conversion
+from django_attribution.paths import top_conversion_paths
+
+from ._options import (
+    add_conversion_filter_arguments,
+    add_window_arguments,
+    filter_conversions,
+    parse_source_windows,
+)
+
+
+class Command(BaseCommand):
+    help = "Show the most common touchpoint paths leading to valid conversions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=10, help="Number of paths to show."
+        )
+        parser.add_argument(
+            "--max-length",
+            type=int,
+            default=10,
+            help="Maximum number of steps kept per path.",
+        )
+        parser.add_argument(
+            "--granularity",
+            choices=GRANULARITIES,
+            default="source_medium",
+            help="Label touchpoints by source/medium, source or campaign.",
+        )
+        add_window_arguments(parser)
+        add_conversion_filter_arguments(parser)
+
+    def handle(self, *args, **options):
+        conversions = filter_conversions(Conversion.objects.valid(), options)
+
+        paths = top_conversion_paths(
+            conversions,
+            limit=options["limit"],
+            window_days=options["window_days"],
+            source_windows=parse_source_windows(options["source_window"]),
+            max_path_length=options["max_length"],
+            granularity=options["granularity"],
+        )
+
+        if not paths:
+            self.stdout.write("No conversions found.")
+            return
+
+        self.stdout.write(f"{'conversions':>12}  {'value':>14}  path")
+        for stat in paths:
+            count = f"{stat.conversions}" + (f"±{stat.error}" if stat.error else "")
+            self.stdout.write(f"{count:>12}  {stat.value:>14}  {stat}")
@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from django_attribution.channels import get_channel_classifier
+from django_attribution.dimensions import UTM_PARAMETERS
+from django_attribution.landing_pages import referrer_host
+from django_attribution.models import Touchpoint
+from django_attribution.routers import get_write_database
+from django_attribution.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Assign a channel to existing touchpoints with the CHANNEL_RULES "
+        "setting, in primary-key batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Touchpoints updated per transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to pause between batches.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Reclassify every touchpoint, e.g. after changing the rules.",
+        )
+
+    def handle(self, *args, **options):
+        classifier = get_channel_classifier()
+        pending = Touchpoint.objects.all()
+        if not options["all"]:
+            pending = pending.filter(channel="")
+
+        updated = 0
+        for _ in each_shard():
+            last_pk = 0
+            while True:
+                batch = list(
+                    pending.filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .select_related("campaign_dimension")
+                    .prefetch_related("click_identifiers")
+                    .only(
+                        "pk",
+                        "referrer",
+                        "referrer_host",
+                        "campaign_dimension",
+                        *UTM_PARAMETERS,
+                    )[: options["batch_size"]]
+                )
+                if not batch:
+                    break
+
+                for touchpoint in batch:
+                    touchpoint.channel = classifier.classify(
+                        {param: touchpoint.get_utm(param) for param in UTM_PARAMETERS},
+                        touchpoint.referrer_host or referrer_host(touchpoint.referrer),
+                        [
+                            click_id.get_platform_display()
+                            for click_id in touchpoint.click_identifiers.all()
+                        ],
+                    )
+
+                with transaction.atomic(using=get_write_database()):
+                    Touchpoint.objects.bulk_update(batch, ["channel"])
+
+                last_pk = batch[-1].pk
+                updated += len(batch)
+                self.stdout.write(f"Classified {updated} touchpoints...")
+
+                if options["sleep"]:
+                    time.sleep(options["sleep"])
+
+        self.stdout.write(f"Done, classified {updated} touchpoints.")
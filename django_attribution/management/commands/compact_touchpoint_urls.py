@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from django_attribution.conf import attribution_settings
+from django_attribution.landing_pages import url_fields
+from django_attribution.models import Touchpoint
+from django_attribution.routers import get_write_database
+from django_attribution.sharding import each_shard
+
+URL_FIELDS = ("url", "referrer", "url_hash", "referrer_host")
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill url_hash and referrer_host of existing touchpoints, in "
+        "primary-key batches. With COMPACT_URLS, also shorten url and referrer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Touchpoints updated per transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to pause between batches.",
+        )
+
+    def handle(self, *args, **options):
+        pending = Q(url_hash__isnull=True)
+        if attribution_settings.COMPACT_URLS:
+            # Compacted URLs start with the path
+            pending |= ~Q(url__startswith="/")
+
+        updated = 0
+        for _ in each_shard():
+            last_pk = 0
+            while True:
+                batch = list(
+                    Touchpoint.objects.filter(pending, pk__gt=last_pk)
+                    .order_by("pk")
+                    .only("pk", "url", "referrer")[: options["batch_size"]]
+                )
+                if not batch:
+                    break
+
+                for touchpoint in batch:
+                    for field, value in url_fields(
+                        touchpoint.url, touchpoint.referrer
+                    ).items():
+                        setattr(touchpoint, field, value)
+
+                with transaction.atomic(using=get_write_database()):
+                    Touchpoint.objects.bulk_update(batch, URL_FIELDS)
+
+                last_pk = batch[-1].pk
+                updated += len(batch)
+                self.stdout.write(f"Updated {updated} touchpoints...")
+
+                if options["sleep"]:
+                    time.sleep(options["sleep"])
+
+        self.stdout.write(f"Done, updated {updated} touchpoints.")
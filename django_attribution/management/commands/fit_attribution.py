@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from django_attribution.attribution_models import DataDrivenAttributionModel
+from django_attribution.models import Conversion
+from django_attribution.refresh import get_materialized_models
+from django_attribution.sharding import each_shard
+
+from ._options import (
+    add_conversion_filter_arguments,
+    add_window_arguments,
+    filter_conversions,
+    parse_source_windows,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit data-driven attribution models over valid conversions and rewrite "
+        "their AttributionCredit rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            metavar="MODEL",
+            help=(
+                "Dotted path of a model instance, e.g. "
+                "django_attribution.attribution_models.markov (default: the "
+                "data-driven MATERIALIZED_MODELS)."
+            ),
+        )
+        add_window_arguments(parser)
+        add_conversion_filter_arguments(parser)
+
+    def handle(self, *args, **options):
+        models = []
+        for path in options["models"]:
+            model = import_string(path)
+            if not isinstance(model, DataDrivenAttributionModel):
+                raise CommandError(f"{path} is not a data-driven attribution model.")
+            models.append(model)
+        if not options["models"]:
+            models = [
+                model
+                for model in get_materialized_models()
+                if isinstance(model, DataDrivenAttributionModel)
+            ]
+        if not models:
+            raise CommandError("No data-driven attribution model to fit.")
+
+        source_windows = parse_source_windows(options["source_window"])
+        for shard in each_shard():
+            conversions = filter_conversions(Conversion.objects.valid(), options)
+            for model in models:
+                written = model.refit(
+                    conversions,
+                    window_days=options["window_days"],
+                    source_windows=source_windows,
+                )
+                on_shard = f" on {shard}" if shard else ""
+                self.stdout.write(
+                    f"Wrote {written} {model.name} credit rows{on_shard}."
+                )
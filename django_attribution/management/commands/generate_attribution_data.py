@@ -0,0 +1,113 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_attribution.synthetic import DEFAULT_SOURCE_MIX, SyntheticDataGenerator
+
+from ._options import parse_moment
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate synthetic identities, touchpoints and conversions for "
+        "load testing. Do not run against production data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--identities",
+            type=int,
+            default=10_000,
+            help="Identities to generate (default: 10000).",
+        )
+        parser.add_argument(
+            "--touches-per-identity",
+            type=float,
+            default=3.0,
+            help="Mean touchpoints per canonical identity (default: 3).",
+        )
+        parser.add_argument(
+            "--source",
+            action="append",
+            default=[],
+            metavar="SOURCE/MEDIUM=WEIGHT",
+            help="Source mix entry, may be repeated (default: a built-in mix).",
+        )
+        parser.add_argument(
+            "--conversion-rate",
+            type=float,
+            default=0.05,
+            help="Share of canonical identities that convert (default: 0.05).",
+        )
+        parser.add_argument(
+            "--merge-rate",
+            type=float,
+            default=0.1,
+            help="Share of identities created merged (default: 0.1).",
+        )
+        parser.add_argument(
+            "--mean-value",
+            type=float,
+            default=50.0,
+            help="Mean conversion value (default: 50).",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Spread identities over this many days (default: 90).",
+        )
+        parser.add_argument(
+            "--until",
+            help="End of the generated period (default: start of today).",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed, the same seed yields the same rows (default: 0).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Identities written per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            generator = SyntheticDataGenerator(
+                touches_per_identity=options["touches_per_identity"],
+                source_mix=self._parse_source_mix(options["source"]),
+                conversion_rate=options["conversion_rate"],
+                merge_rate=options["merge_rate"],
+                days=options["days"],
+                until=parse_moment(options["until"]) if options["until"] else None,
+                mean_value=options["mean_value"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+
+        totals = generator.generate(options["identities"])
+        self.stdout.write(
+            f"Generated {totals['identities']} identities, {totals['users']} users, "
+            f"{totals['touchpoints']} touchpoints and "
+            f"{totals['conversions']} conversions."
+        )
+
+    def _parse_source_mix(self, values):
+        if not values:
+            return DEFAULT_SOURCE_MIX
+
+        mix = {}
+        for value in values:
+            pair, _, weight = value.rpartition("=")
+            try:
+                mix[pair] = float(weight)
+            except ValueError:
+                pair = ""
+            if "/" not in pair:
+                raise CommandError(
+                    f"Invalid --source '{value}', use SOURCE/MEDIUM=WEIGHT"
+                )
+        return mix
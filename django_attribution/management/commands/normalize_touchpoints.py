@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from django_attribution.conf import attribution_settings
+from django_attribution.dimensions import UTM_PARAMETERS, intern_campaign_dimension
+from django_attribution.models import Touchpoint
+from django_attribution.routers import get_write_database
+from django_attribution.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the UTM values of existing touchpoints to CampaignDimension rows, "
+        "in primary-key batches. Run it before enabling NORMALIZE_UTM, which "
+        "keeps the UTM columns filled, then once more after to clear them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Touchpoints updated per transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to pause between batches.",
+        )
+
+    def handle(self, *args, **options):
+        # Reports read the UTM columns until NORMALIZE_UTM is enabled, so
+        # they are only cleared once it is
+        clear_columns = attribution_settings.NORMALIZE_UTM
+        pending = Q(campaign_dimension__isnull=True)
+        if clear_columns:
+            pending |= ~Q(**dict.fromkeys(UTM_PARAMETERS, ""))
+
+        updated = 0
+        for _ in each_shard():
+            last_pk = 0
+            while True:
+                batch = list(
+                    Touchpoint.objects.filter(pending, pk__gt=last_pk)
+                    .order_by("pk")
+                    .only("pk", "campaign_dimension", *UTM_PARAMETERS)[
+                        : options["batch_size"]
+                    ]
+                )
+                if not batch:
+                    break
+
+                with transaction.atomic(using=get_write_database()):
+                    for touchpoint in batch:
+                        self.normalize(touchpoint, clear_columns)
+                    Touchpoint.objects.bulk_update(
+                        batch, ["campaign_dimension", *UTM_PARAMETERS]
+                    )
+
+                last_pk = batch[-1].pk
+                updated += len(batch)
+                self.stdout.write(f"Normalized {updated} touchpoints...")
+
+                if options["sleep"]:
+                    time.sleep(options["sleep"])
+
+        self.stdout.write(f"Done, normalized {updated} touchpoints.")
+
+    def normalize(self, touchpoint: Touchpoint, clear_columns: bool) -> None:
+        if touchpoint.campaign_dimension_id is None:
+            touchpoint.campaign_dimension_id = intern_campaign_dimension(
+                {param: getattr(touchpoint, param) for param in UTM_PARAMETERS}
+            )
+        if clear_columns:
+            for param in UTM_PARAMETERS:
+                setattr(touchpoint, param, "")
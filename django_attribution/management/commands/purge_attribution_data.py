@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from django_attribution.retention import purge_expired
+from django_attribution.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete touchpoints, conversions and orphaned anonymous identities "
+        "older than the *_RETENTION_DAYS settings, in small batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to pause between batches.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the expired rows.",
+        )
+
+    def handle(self, *args, **options):
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        for shard in each_shard():
+            counts = purge_expired(
+                batch_size=options["batch_size"],
+                sleep=options["sleep"],
+                dry_run=options["dry_run"],
+            )
+            if not counts:
+                self.stdout.write("No retention period is configured.")
+                return
+
+            on_shard = f" on {shard}" if shard else ""
+            for kind, count in counts.items():
+                self.stdout.write(f"{verb} {count} {kind}{on_shard}.")
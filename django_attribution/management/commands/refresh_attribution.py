@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from django_attribution.refresh import refresh_attribution
+from django_attribution.sharding import each_shard
+
+from ._options import add_window_arguments, parse_source_windows
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-attribute conversions affected by merges, late touchpoints and "
+        "conversion status changes, for every MATERIALIZED_MODELS model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Change-log entries consumed per transaction.",
+        )
+        add_window_arguments(parser)
+
+    def handle(self, *args, **options):
+        source_windows = parse_source_windows(options["source_window"])
+        for shard in each_shard():
+            consumed = refresh_attribution(
+                window_days=options["window_days"],
+                source_windows=source_windows,
+                batch_size=options["batch_size"],
+            )
+            on_shard = f" on {shard}" if shard else ""
+            self.stdout.write(f"Consumed {consumed} change-log entries{on_shard}.")
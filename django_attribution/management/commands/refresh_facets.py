@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from django_attribution.facets import iter_admin_facets, refresh_facet_values
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the cached options of the admin list filters, so that "
+        "changelist views never compute them. Run it more often than "
+        "FACET_CACHE_TIMEOUT, e.g. from cron."
+    )
+
+    def handle(self, *args, **options):
+        for model, field_name in iter_admin_facets():
+            values = refresh_facet_values(model, field_name)
+            self.stdout.write(
+                f"Cached {len(values)} {model._meta.label_lower}.{field_name} options."
+            )
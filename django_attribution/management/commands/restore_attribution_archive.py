@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_attribution.archive import ArchiveError, restore_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Load an archive written by archive_attribution_data back into the "
+        "database, e.g. to re-attribute historical conversions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Archive directory.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows inserted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            counts = restore_archive(
+                options["directory"], batch_size=options["batch_size"]
+            )
+        except ArchiveError as e:
+            raise CommandError(str(e)) from e
+
+        for kind, count in counts.items():
+            self.stdout.write(f"Restored {count} {kind}.")
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from django_attribution.rollups import rebuild_rollups
+from django_attribution.sharding import each_shard
+
+from ._options import add_window_arguments, parse_moment, parse_source_windows
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily rollups read by the admin dashboard, by default "
+        "for yesterday and today."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=2,
+            help="Rebuild this many days, ending today (default: 2).",
+        )
+        parser.add_argument("--since", help="First day to rebuild.")
+        parser.add_argument("--until", help="Last day to rebuild (inclusive).")
+        add_window_arguments(parser)
+
+    def handle(self, *args, **options):
+        end = timezone.localdate()
+        if options["until"]:
+            end = timezone.localdate(parse_moment(options["until"]))
+        start = end - timedelta(days=options["days"] - 1)
+        if options["since"]:
+            start = timezone.localdate(parse_moment(options["since"]))
+        if start > end:
+            raise CommandError("--since must not be after --until")
+
+        source_windows = parse_source_windows(options["source_window"])
+        for shard in each_shard():
+            written = rebuild_rollups(
+                start,
+                end,
+                window_days=options["window_days"],
+                source_windows=source_windows,
+            )
+            on_shard = f" on {shard}" if shard else ""
+            self.stdout.write(
+                f"Wrote {written} rollup rows for {start} to {end}{on_shard}."
+            )
@@ -0,0 +1,377 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .conf import attribution_settings
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "BOT_REQUESTS_SKIPPED",
+    "CONVERSIONS_RECORDED",
+    "Counter",
+    "Histogram",
+    "IDENTITIES_CREATED",
+    "IDENTITY_MERGES",
+    "MetricsRegistry",
+    "PHASE_SECONDS",
+    "TOUCHPOINTS_DROPPED",
+    "TOUCHPOINTS_RECORDED",
+    "mark_process_dead",
+    "metrics_sink",
+    "registry",
+]
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+# Values of the processes marked dead, see mark_process_dead()
+ARCHIVE_FILENAME = "archive.json"
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self, registry: "MetricsRegistry", name: str, documentation: str, labelnames
+    ):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            values = [[list(key), value] for key, value in self._values.items()]
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "values": values,
+        }
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.registry.maybe_flush()
+
+
+class Histogram(_Metric):
+    """
+    Bucketed observations. Each label set holds per-bucket counts (the last
+    one for +Inf, not cumulative), then the sum and the count.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(*args)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+        self.registry.maybe_flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            values = [[list(key), list(state)] for key, state in self._values.items()]
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "buckets": list(self.buckets),
+            "values": values,
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms, rendered in Prometheus text format.
+
+    Every metric has its own lock, held only to update one dict entry. With
+    METRICS_MULTIPROCESS_DIR set, each process also writes its values to
+    <pid>-<start time>.json in that directory at most every
+    METRICS_FLUSH_INTERVAL seconds (and at exit), and render() adds up the
+    files of all processes. The start time keeps a process that reuses the
+    pid of a dead one from overwriting its file.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._next_flush = 0.0
+        self._process: Tuple[int, int] = (0, 0)
+        atexit.register(self.flush)
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(
+                    self, name, documentation, labelnames, **kwargs
+                )
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already a {metric.kind}")
+        return metric
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            with metric._lock:
+                metric._values.clear()
+
+    def maybe_flush(self) -> None:
+        if (
+            attribution_settings.METRICS_MULTIPROCESS_DIR
+            and time.monotonic() >= self._next_flush
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        directory = attribution_settings.METRICS_MULTIPROCESS_DIR
+        if not directory:
+            return
+
+        self._next_flush = (
+            time.monotonic() + attribution_settings.METRICS_FLUSH_INTERVAL
+        )
+        path = Path(directory) / f"{self._process_key()}.json"
+        temporary = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            temporary.write_text(json.dumps(self.snapshot()))
+            os.replace(temporary, path)
+        except OSError:
+            logger.exception(f"Could not write metrics to {path}")
+
+    def _process_key(self) -> str:
+        # Recomputed in forked workers, which inherit the registry
+        pid = os.getpid()
+        if self._process[0] != pid:
+            self._process = (pid, time.time_ns() // 1000)
+        return f"{pid}-{self._process[1]}"
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of this process, or of all processes in multiprocess mode."""
+
+        directory = attribution_settings.METRICS_MULTIPROCESS_DIR
+        if not directory:
+            return self.snapshot()
+
+        self.flush()
+        snapshots = []
+        for path in sorted(Path(directory).glob("*.json")):
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                logger.warning(f"Skipping unreadable metrics file {path}")
+        return _merge_snapshots(snapshots)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {_escape_help(metric['help'])}")
+            lines.append(f"# TYPE {name} {metric['kind']}")
+            labelnames = metric["labelnames"]
+            values = sorted(metric["values"])
+            if not values and not labelnames and metric["kind"] == "counter":
+                values = [[[], 0]]
+
+            for label_values, value in values:
+                labels = list(zip(labelnames, label_values))
+                if metric["kind"] == "counter":
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+
+                cumulative = 0
+                for bound, count in zip([*metric["buckets"], "+Inf"], value):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(
+                        f"{name}_bucket{_labels([*labels, ('le', le)])} {cumulative}"
+                    )
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None) -> None:
+    """
+    Folds the metrics files of a dead process into the archive file.
+
+    Call it from the process manager once a worker has exited, e.g. in the
+    gunicorn child_exit hook. The counters of the worker keep being reported
+    through the archive, so totals do not go down, and the directory does
+    not grow with every worker ever started. Calls must not run concurrently.
+    """
+
+    directory = directory or attribution_settings.METRICS_MULTIPROCESS_DIR
+    if not directory:
+        return
+
+    paths = list(Path(directory).glob(f"{pid}-*.json"))
+    if not paths:
+        return
+
+    archive = Path(directory) / ARCHIVE_FILENAME
+    snapshots = []
+    for path in [archive, *paths]:
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError):
+            logger.warning(f"Skipping unreadable metrics file {path}")
+
+    temporary = archive.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        temporary.write_text(json.dumps(_merge_snapshots(snapshots)))
+        os.replace(temporary, archive)
+        for path in paths:
+            path.unlink()
+    except OSError:
+        logger.exception(f"Could not archive the metrics of process {pid}")
+
+
+def _merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "values": {}})
+            for label_values, value in metric["values"]:
+                key = tuple(label_values)
+                current = target["values"].get(key)
+                if current is None:
+                    target["values"][key] = value
+                elif metric["kind"] == "counter":
+                    target["values"][key] = current + value
+                else:
+                    target["values"][key] = [a + b for a, b in zip(current, value)]
+
+    for metric in merged.values():
+        metric["values"] = [
+            [list(key), value] for key, value in metric["values"].items()
+        ]
+    return merged
+
+
+def _labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels)
+    return f"{{{pairs}}}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def _number(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+IDENTITIES_CREATED = registry.counter(
+    "attribution_identities_created_total",
+    "Identities created, by kind (anonymous or user).",
+    ["kind"],
+)
+TOUCHPOINTS_RECORDED = registry.counter(
+    "attribution_touchpoints_recorded_total",
+    "Touchpoints recorded by the middleware.",
+)
+TOUCHPOINTS_DROPPED = registry.counter(
+    "attribution_touchpoints_dropped_total",
+    "Requests with tracking parameters that recorded no touchpoint, by reason.",
+    ["reason"],
+)
+BOT_REQUESTS_SKIPPED = registry.counter(
+    "attribution_bot_requests_skipped_total",
+    "Requests skipped because the user agent matched BOT_PATTERNS.",
+)
+IDENTITY_MERGES = registry.counter(
+    "attribution_identity_merges_total",
+    "Identities merged into a canonical identity, by kind (local or cross_shard).",
+    ["kind"],
+)
+CONVERSIONS_RECORDED = registry.counter(
+    "attribution_conversions_recorded_total",
+    "Conversions recorded through Conversion.objects.record(), by event.",
+    ["event"],
+)
+PHASE_SECONDS = registry.histogram(
+    "attribution_middleware_phase_seconds",
+    "Duration of the attribution middleware phases of sampled requests.",
+    ["phase"],
+)
+
+
+def metrics_sink(profile) -> None:
+    """Instrumentation sink observing phase durations in PHASE_SECONDS."""
+
+    for timing in profile.phases:
+        PHASE_SECONDS.observe(timing.duration, phase=timing.name)
@@ -4,9 +4,14 @@ from urllib.parse import unquote_plus
 
 from django.http import HttpResponse
 
+from .channels import classify_channel
 from .conf import attribution_settings
+from .dimensions import UTM_PARAMETERS, intern_campaign_dimension
+from .instrumentation import finish_profile, phase, start_profile
+from .landing_pages import url_fields
+from .metrics import IDENTITIES_CREATED, TOUCHPOINTS_DROPPED, TOUCHPOINTS_RECORDED
 from .mixins import RequestExclusionMixin
-from .models import Identity, Touchpoint
+from .models import ClickIdentifier, Identity, Touchpoint
 from .trackers import CookieIdentityTracker
 from .types import AttributionHttpRequest
 
@@ -36,7 +41,9 @@ class TrackingParameterMiddleware(RequestExclusionMixin):
         if self._should_skip_tracking_params_recording(request):
             return self.get_response(request)
 
-        request.META["tracking_params"] = self._extract_tracking_parameters(request)
+        start_profile(request)
+        with phase(request, "tracking_params"):
+            request.META["tracking_params"] = self._extract_tracking_parameters(request)
 
         response = self.get_response(request)
 
@@ -94,23 +101,30 @@ class AttributionMiddleware:
         self.tracker = CookieIdentityTracker()
 
     def __call__(self, request: AttributionHttpRequest) -> HttpResponse:
+        start_profile(request)
         request.identity_tracker = self.tracker
-        current_identity = self._get_current_identity_from_cookie(request)
-
-        request.identity = (
-            self._resolve_identity(request, current_identity)
-            if self._should_resolve_identity(request, current_identity)
-            else None
-        )
+        with phase(request, "cookie_lookup"):
+            current_identity = self._get_current_identity_from_cookie(request)
+
+        with phase(request, "identity_resolution"):
+            request.identity = (
+                self._resolve_identity(request, current_identity)
+                if self._should_resolve_identity(request, current_identity)
+                else None
+            )
         response = self.get_response(request)
 
         if request.identity:
-            if self._has_tracking_data(request) and self._is_successful_response(
-                response
-            ):
-                self._record_touchpoint(request.identity, request)
-            self.tracker.apply_to_response(request, response)
-
+            if self._has_tracking_data(request):
+                if self._is_successful_response(response):
+                    with phase(request, "touchpoint_insert"):
+                        self._record_touchpoint(request.identity, request)
+                else:
+                    TOUCHPOINTS_DROPPED.inc(reason="error_response")
+            with phase(request, "cookie_write"):
+                self.tracker.apply_to_response(request, response)
+
+        finish_profile(request)
         return response
 
     def _resolve_identity(
@@ -129,9 +143,13 @@ class AttributionMiddleware:
         current_identity: Optional[Identity],
     ) -> Identity:
         if not current_identity:
-            new_identity = Identity.objects.create(
+            # Saved through the instance so that the router can place it on
+            # the shard of its UUID
+            new_identity = Identity(
                 first_visit_user_agent=request.META.get("HTTP_USER_AGENT", ""),
             )
+            new_identity.save()
+            IDENTITIES_CREATED.inc(kind="anonymous")
             self.tracker.set_identity(new_identity)
             logger.info(f"Created new anonymous identity {new_identity.uuid}")
             return new_identity
@@ -149,9 +167,10 @@ class AttributionMiddleware:
         request: AttributionHttpRequest,
         current_identity: Optional[Identity],
     ) -> Identity:
-        if not current_identity or current_identity.linked_user != request.user:
+        if not current_identity or current_identity.linked_user_id != request.user.pk:
             logger.info(f"Reconciling identity for user {request.user.pk}")
-            return self._reconcile_user_identity(request)
+            with phase(request, "reconciliation"):
+                return self._reconcile_user_identity(request, current_identity)
 
         canonical = current_identity.get_canonical_identity()
         if canonical != current_identity:
@@ -166,19 +185,22 @@ class AttributionMiddleware:
     def _get_current_identity_from_cookie(
         self, request: AttributionHttpRequest
     ) -> Optional[Identity]:
+        from .reconciliation import get_identity_by_reference
+
         identity_ref = self.tracker.get_identity_reference(request)
         if not identity_ref:
             return None
 
-        try:
-            return Identity.objects.get(uuid=identity_ref)
-        except Identity.DoesNotExist:
-            return None
+        return get_identity_by_reference(identity_ref)
 
-    def _reconcile_user_identity(self, request: AttributionHttpRequest) -> Identity:
+    def _reconcile_user_identity(
+        self,
+        request: AttributionHttpRequest,
+        current_identity: Optional[Identity],
+    ) -> Identity:
         from .reconciliation import reconcile_user_identity
 
-        return reconcile_user_identity(request)
+        return reconcile_user_identity(request, current_identity)
 
     def _has_tracking_data(self, request: AttributionHttpRequest) -> bool:
         tracking_params = request.META.get("tracking_params", {})
@@ -202,20 +224,49 @@ class AttributionMiddleware:
     ) -> Touchpoint:
         tracking_params = request.META.get("tracking_params", {})
 
-        return Touchpoint.objects.create(
+        if attribution_settings.NORMALIZE_UTM:
+            utm_fields = {
+                "campaign_dimension_id": intern_campaign_dimension(
+                    tracking_params, using=identity._state.db
+                )
+            }
+        else:
+            utm_fields = {
+                param: tracking_params.get(param, "") for param in UTM_PARAMETERS
+            }
+
+        visit_fields = url_fields(
+            request.build_absolute_uri(), request.META.get("HTTP_REFERER", "")
+        )
+        touchpoint = Touchpoint(
             identity=identity,
-            url=request.build_absolute_uri(),
-            referrer=request.META.get("HTTP_REFERER", ""),
-            utm_source=tracking_params.get("utm_source", ""),
-            utm_medium=tracking_params.get("utm_medium", ""),
-            utm_campaign=tracking_params.get("utm_campaign", ""),
-            utm_term=tracking_params.get("utm_term", ""),
-            utm_content=tracking_params.get("utm_content", ""),
-            fbclid=tracking_params.get("fbclid", ""),
-            gclid=tracking_params.get("gclid", ""),
-            msclkid=tracking_params.get("msclkid", ""),
-            ttclid=tracking_params.get("ttclid", ""),
-            li_fat_id=tracking_params.get("li_fat_id", ""),
-            twclid=tracking_params.get("twclid", ""),
-            igshid=tracking_params.get("igshid", ""),
+            channel=classify_channel(
+                tracking_params,
+                str(visit_fields["referrer_host"] or ""),
+                [
+                    label
+                    for label in ClickIdentifier.Platform.labels
+                    if tracking_params.get(label)
+                ],
+            ),
+            **visit_fields,
+            **utm_fields,
         )
+        touchpoint.save()
+
+        click_identifiers = [
+            ClickIdentifier(
+                touchpoint=touchpoint,
+                platform=platform,
+                value=tracking_params[label],
+            )
+            for platform, label in ClickIdentifier.Platform.choices
+            if tracking_params.get(label)
+        ]
+        if click_identifiers:
+            ClickIdentifier.objects.using(touchpoint._state.db).bulk_create(
+                click_identifiers
+            )
+
+        TOUCHPOINTS_RECORDED.inc()
+        return touchpoint
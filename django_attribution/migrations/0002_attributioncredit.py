@@ -0,0 +1,59 @@
+# Generated by Django 5.1.15 on 2026-10-19 02:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_attribution", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttributionCredit",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(max_length=50)),
+                ("channel", models.CharField(max_length=255)),
+                ("credit", models.FloatField()),
+                (
+                    "attributed_value",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=12, null=True
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "conversion",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attribution_credits",
+                        to="django_attribution.conversion",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["model", "channel"], name="django_attr_model_5a19c9_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("conversion", "model", "channel"),
+                        name="unique_attribution_credit",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.15 on 2026-10-19 02:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_attribution", "0002_attributioncredit"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttributionChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("touchpoints_added", "Touchpoints added"),
+                            ("identity_merged", "Identity merged"),
+                            ("conversion_recorded", "Conversion recorded"),
+                            ("conversion_changed", "Conversion changed"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                ("since", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "conversion",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="django_attribution.conversion",
+                    ),
+                ),
+                (
+                    "identity",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="django_attribution.identity",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.15 on 2026-10-19 03:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_attribution", "0003_attributionchange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CampaignDimension",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(editable=False, max_length=64, unique=True)),
+                (
+                    "utm_source",
+                    models.CharField(blank=True, db_index=True, max_length=255),
+                ),
+                (
+                    "utm_medium",
+                    models.CharField(blank=True, db_index=True, max_length=255),
+                ),
+                (
+                    "utm_campaign",
+                    models.CharField(blank=True, db_index=True, max_length=255),
+                ),
+                ("utm_term", models.CharField(blank=True, max_length=255)),
+                ("utm_content", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="touchpoint",
+            name="campaign_dimension",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="touchpoints",
+                to="django_attribution.campaigndimension",
+            ),
+        ),
+    ]
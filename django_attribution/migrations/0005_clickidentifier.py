@@ -0,0 +1,169 @@
+# Generated by Django 5.1.15 on 2026-10-19 03:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CLICK_ID_PLATFORMS = {
+    "fbclid": 1,
+    "gclid": 2,
+    "msclkid": 3,
+    "ttclid": 4,
+    "li_fat_id": 5,
+    "twclid": 6,
+    "igshid": 7,
+}
+
+BATCH_SIZE = 2000
+
+
+def copy_click_ids(apps, schema_editor):
+    """Copies the click-id columns to ClickIdentifier rows, in pk batches."""
+
+    Touchpoint = apps.get_model("django_attribution", "Touchpoint")
+    ClickIdentifier = apps.get_model("django_attribution", "ClickIdentifier")
+    db_alias = schema_editor.connection.alias
+
+    last_pk = 0
+    while True:
+        rows = list(
+            Touchpoint.objects.using(db_alias)
+            .filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", *CLICK_ID_PLATFORMS)[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+
+        # Conflicts are rows copied by an interrupted earlier run
+        ClickIdentifier.objects.using(db_alias).bulk_create(
+            [
+                ClickIdentifier(touchpoint_id=pk, platform=platform, value=value)
+                for pk, *values in rows
+                for platform, value in zip(CLICK_ID_PLATFORMS.values(), values)
+                if value
+            ],
+            ignore_conflicts=True,
+        )
+        last_pk = rows[-1][0]
+
+
+def restore_click_ids(apps, schema_editor):
+    """Copies ClickIdentifier rows back to the re-added columns, in batches."""
+
+    Touchpoint = apps.get_model("django_attribution", "Touchpoint")
+    ClickIdentifier = apps.get_model("django_attribution", "ClickIdentifier")
+    db_alias = schema_editor.connection.alias
+
+    for param, platform in CLICK_ID_PLATFORMS.items():
+        last_pk = 0
+        while True:
+            rows = list(
+                ClickIdentifier.objects.using(db_alias)
+                .filter(platform=platform, pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "touchpoint_id", "value")[:BATCH_SIZE]
+            )
+            if not rows:
+                break
+
+            Touchpoint.objects.using(db_alias).bulk_update(
+                [
+                    Touchpoint(pk=touchpoint_id, **{param: value})
+                    for _, touchpoint_id, value in rows
+                ],
+                [param],
+            )
+            last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    # Copying click ids is batched; a single transaction would hold locks on
+    # the whole touchpoint table until it is done
+    atomic = False
+
+    dependencies = [
+        ("django_attribution", "0004_campaigndimension"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClickIdentifier",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "platform",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (1, "fbclid"),
+                            (2, "gclid"),
+                            (3, "msclkid"),
+                            (4, "ttclid"),
+                            (5, "li_fat_id"),
+                            (6, "twclid"),
+                            (7, "igshid"),
+                        ]
+                    ),
+                ),
+                ("value", models.CharField(max_length=255)),
+                (
+                    "touchpoint",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="click_identifiers",
+                        to="django_attribution.touchpoint",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["platform", "value"],
+                        name="django_attr_platfor_d8ac5f_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("touchpoint", "platform"),
+                        name="unique_click_identifier_per_platform",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(copy_click_ids, restore_click_ids),
+        migrations.RemoveField(
+            model_name="touchpoint",
+            name="fbclid",
+        ),
+        migrations.RemoveField(
+            model_name="touchpoint",
+            name="gclid",
+        ),
+        migrations.RemoveField(
+            model_name="touchpoint",
+            name="igshid",
+        ),
+        migrations.RemoveField(
+            model_name="touchpoint",
+            name="li_fat_id",
+        ),
+        migrations.RemoveField(
+            model_name="touchpoint",
+            name="msclkid",
+        ),
+        migrations.RemoveField(
+            model_name="touchpoint",
+            name="ttclid",
+        ),
+        migrations.RemoveField(
+            model_name="touchpoint",
+            name="twclid",
+        ),
+    ]
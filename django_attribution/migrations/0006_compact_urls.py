@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-19 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_attribution", "0005_clickidentifier"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="touchpoint",
+            name="referrer_host",
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="touchpoint",
+            name="url_hash",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name="touchpoint",
+            name="referrer",
+            field=models.CharField(blank=True, max_length=2048),
+        ),
+        migrations.AlterField(
+            model_name="touchpoint",
+            name="url",
+            field=models.CharField(max_length=2048),
+        ),
+        migrations.AddIndex(
+            model_name="touchpoint",
+            index=models.Index(
+                fields=["url_hash", "created_at"], name="django_attr_url_has_6853a1_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_attribution", "0006_compact_urls"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="touchpoint",
+            name="channel",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name="touchpoint",
+            index=models.Index(
+                fields=["channel", "created_at"], name="django_attr_channel_9aa918_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-19 03:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_attribution", "0008_daily_rollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttributionWeights",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(max_length=50)),
+                ("window", models.CharField(max_length=255)),
+                ("weights", models.JSONField(default=dict)),
+                ("fitted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "verbose_name_plural": "Attribution weights",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("model", "window"), name="unique_attribution_weights"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-19 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_attribution", "0009_attributionweights"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attributioncredit",
+            name="utm_campaign",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="attributioncredit",
+            name="utm_medium",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="attributioncredit",
+            name="utm_source",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
@@ -3,6 +3,7 @@ from typing import Iterable, Optional
 from django.http import HttpResponse
 
 from .conf import attribution_settings
+from .metrics import BOT_REQUESTS_SKIPPED
 from .types import AttributionHttpRequest
 
 __all__ = [
@@ -68,6 +69,7 @@ class RequestExclusionMixin:
             return True
 
         if attribution_settings.FILTER_BOTS and self._is_bot_request(request):
+            BOT_REQUESTS_SKIPPED.inc()
             return True
 
         return False
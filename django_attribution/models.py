@@ -1,5 +1,6 @@
 import logging
 import uuid
+from typing import Dict
 
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -8,6 +9,7 @@ from django.db import models
 from django.utils import timezone
 
 from .querysets import (
+    AttributionChangeQuerySet,
     ConversionQuerySet,
     IdentityQuerySet,
     TouchpointQuerySet,
@@ -18,8 +20,14 @@ logger = logging.getLogger(__name__)
 
 __all__ = [
     "Identity",
+    "CampaignDimension",
     "Touchpoint",
+    "ClickIdentifier",
     "Conversion",
+    "AttributionCredit",
+    "AttributionChange",
+    "AttributionWeights",
+    "DailyRollup",
 ]
 
 
@@ -108,6 +116,41 @@ class Identity(BaseModel):
         return self.merged_into is None
 
 
+class CampaignDimension(models.Model):
+    """
+    Distinct combination of UTM values shared by many touchpoints.
+
+    Used when the NORMALIZE_UTM setting is enabled: touchpoints then
+    reference one of these rows instead of repeating the five UTM strings.
+    Rows are interned by a hash of their values (see
+    django_attribution.dimensions) and are never deleted.
+
+    Attributes:
+        key: SHA-256 of the UTM values, used for interning
+        utm_source, utm_medium, utm_campaign, utm_term, utm_content: UTM values
+    """
+
+    key = models.CharField(max_length=64, unique=True, editable=False)
+
+    utm_source = models.CharField(max_length=255, blank=True, db_index=True)
+    utm_medium = models.CharField(max_length=255, blank=True, db_index=True)
+    utm_campaign = models.CharField(max_length=255, blank=True, db_index=True)
+    utm_term = models.CharField(max_length=255, blank=True)
+    utm_content = models.CharField(max_length=255, blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return (
+            " / ".join(
+                value
+                for value in (self.utm_source, self.utm_medium, self.utm_campaign)
+                if value
+            )
+            or "direct"
+        )
+
+
 class Touchpoint(BaseModel):
     """
     Records a single marketing touch when a visitor arrives with tracking data.
@@ -119,14 +162,23 @@ class Touchpoint(BaseModel):
 
     Attributes:
         identity: The Identity this touchpoint belongs to
-        url: Full URL the visitor landed on
-        referrer: HTTP referrer header value
+        url: Full URL the visitor landed on, or only its path without the
+            tracking parameters when COMPACT_URLS is enabled
+        referrer: HTTP referrer header value (without its query string when
+            COMPACT_URLS is enabled)
+        url_hash: 64-bit hash of the landing path, for grouping by page
+        referrer_host: Host name of the referrer
+        channel: Channel grouping (e.g. 'paid_search', 'email') assigned by
+            the CHANNEL_RULES setting when the touchpoint was recorded
         utm_source: Marketing source (e.g., 'google', 'facebook')
         utm_medium: Marketing medium (e.g., 'cpc', 'email', 'social')
         utm_campaign: Campaign identifier
         utm_term: Keywords/search terms (typically for paid search)
         utm_content: Ad content identifier for A/B testing
-        fbclid, gclid, etc.: Platform-specific click tracking IDs
+        campaign_dimension: Interned UTM values, used instead of the utm_*
+            columns when NORMALIZE_UTM is enabled
+        click_identifiers: Platform-specific click tracking IDs (fbclid,
+            gclid, etc.), stored in ClickIdentifier only when present
     """
 
     identity = models.ForeignKey(
@@ -137,8 +189,11 @@ class Touchpoint(BaseModel):
         blank=True,
     )
 
-    url = models.URLField(max_length=2048)
-    referrer = models.URLField(max_length=2048, blank=True)
+    url = models.CharField(max_length=2048)
+    referrer = models.CharField(max_length=2048, blank=True)
+    url_hash = models.BigIntegerField(null=True, blank=True, editable=False)
+    referrer_host = models.CharField(max_length=255, blank=True, db_index=True)
+    channel = models.CharField(max_length=50, blank=True)
 
     utm_source = models.CharField(max_length=255, blank=True, db_index=True)
     utm_medium = models.CharField(max_length=255, blank=True, db_index=True)
@@ -146,13 +201,13 @@ class Touchpoint(BaseModel):
     utm_term = models.CharField(max_length=255, blank=True)
     utm_content = models.CharField(max_length=255, blank=True)
 
-    fbclid = models.CharField(max_length=255, blank=True)
-    gclid = models.CharField(max_length=255, blank=True)
-    msclkid = models.CharField(max_length=255, blank=True)
-    ttclid = models.CharField(max_length=255, blank=True)
-    li_fat_id = models.CharField(max_length=255, blank=True)
-    twclid = models.CharField(max_length=255, blank=True)
-    igshid = models.CharField(max_length=255, blank=True)
+    campaign_dimension = models.ForeignKey(
+        CampaignDimension,
+        on_delete=models.PROTECT,
+        related_name="touchpoints",
+        null=True,
+        blank=True,
+    )
 
     objects = models.Manager.from_queryset(TouchpointQuerySet)()
 
@@ -161,11 +216,71 @@ class Touchpoint(BaseModel):
             models.Index(fields=["identity", "created_at"]),
             models.Index(fields=["utm_source", "utm_medium"]),
             models.Index(fields=["utm_campaign", "utm_source", "created_at"]),
+            models.Index(fields=["url_hash", "created_at"]),
+            models.Index(fields=["channel", "created_at"]),
         ]
         ordering = ["-created_at"]
 
     def __str__(self):
-        return f"{self.utm_source or 'direct'} ({self.created_at})"
+        return f"{self.get_utm('utm_source') or 'direct'} ({self.created_at})"
+
+    def get_utm(self, param: str) -> str:
+        if self.campaign_dimension_id is not None:
+            return getattr(self.campaign_dimension, param)
+        return getattr(self, param)
+
+    @property
+    def click_ids(self) -> Dict[str, str]:
+        return {
+            click_id.get_platform_display(): click_id.value
+            for click_id in self.click_identifiers.all()
+        }
+
+
+class ClickIdentifier(models.Model):
+    """
+    Platform click ID carried by a touchpoint (gclid, fbclid, etc.).
+
+    Click IDs are rare and a touchpoint carries at most one per platform,
+    so they are kept out of the Touchpoint table and stored here only when
+    present, keyed by a small integer platform code.
+
+    Attributes:
+        touchpoint: The Touchpoint the click ID arrived with
+        platform: Click ID parameter, stored as a small integer
+        value: The click ID
+    """
+
+    class Platform(models.IntegerChoices):
+        FBCLID = 1, "fbclid"
+        GCLID = 2, "gclid"
+        MSCLKID = 3, "msclkid"
+        TTCLID = 4, "ttclid"
+        LI_FAT_ID = 5, "li_fat_id"
+        TWCLID = 6, "twclid"
+        IGSHID = 7, "igshid"
+
+    touchpoint = models.ForeignKey(
+        Touchpoint,
+        on_delete=models.CASCADE,
+        related_name="click_identifiers",
+    )
+    platform = models.PositiveSmallIntegerField(choices=Platform.choices)
+    value = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["platform", "value"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["touchpoint", "platform"],
+                name="unique_click_identifier_per_platform",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_platform_display()}={self.value}"
 
 
 class Conversion(BaseModel):
@@ -232,3 +347,203 @@ class Conversion(BaseModel):
         else:
             value_str = ""
         return f"{self.event}{value_str} - {self.created_at}"
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        previous = getattr(self, "_loaded_validity", None)
+
+        super().save(*args, **kwargs)
+
+        current = self._get_validity()
+        if adding:
+            AttributionChange.objects.log(
+                AttributionChange.Kind.CONVERSION_RECORDED, conversion=self
+            )
+        elif previous is not None and current is not None and previous != current:
+            AttributionChange.objects.log(
+                AttributionChange.Kind.CONVERSION_CHANGED, conversion=self
+            )
+        self._loaded_validity = current
+
+    @classmethod
+    def from_db(cls, db, field_names, values, **kwargs):
+        instance = super().from_db(db, field_names, values, **kwargs)
+        instance._loaded_validity = instance._get_validity()
+        return instance
+
+    def _get_validity(self):
+        loaded = self.__dict__
+        if "is_active" not in loaded or "is_confirmed" not in loaded:
+            return None
+        return (loaded["is_active"], loaded["is_confirmed"])
+
+
+class AttributionCredit(models.Model):
+    """
+    Fractional conversion credit computed by a multi-touch attribution model.
+
+    Data-driven models cannot be expressed as a single SQL annotation, so
+    their results are materialized here, one row per conversion and channel.
+    The credits of a conversion for a given model sum to 1.
+
+    Attributes:
+        conversion: The credited Conversion
+        model: Name of the attribution model that produced the credit
+        channel: Channel label the credit is assigned to (e.g. 'google/cpc')
+        utm_source: UTM source of the latest credited touchpoint ('' when absent)
+        utm_medium: UTM medium of the latest credited touchpoint ('' when absent)
+        utm_campaign: UTM campaign of the latest credited touchpoint ('' when
+            absent)
+        credit: Share of the conversion assigned to the channel
+        attributed_value: Share of the conversion value assigned to the channel
+    """
+
+    conversion = models.ForeignKey(
+        Conversion,
+        on_delete=models.CASCADE,
+        related_name="attribution_credits",
+    )
+    model = models.CharField(max_length=50)
+    channel = models.CharField(max_length=255)
+    utm_source = models.CharField(max_length=255, blank=True, default="")
+    utm_medium = models.CharField(max_length=255, blank=True, default="")
+    utm_campaign = models.CharField(max_length=255, blank=True, default="")
+    credit = models.FloatField()
+    attributed_value = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["model", "channel"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["conversion", "model", "channel"],
+                name="unique_attribution_credit",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.model}: {self.channel} ({self.credit:.2%})"
+
+
+class AttributionChange(models.Model):
+    """
+    Change-log entry for events that invalidate materialized attribution.
+
+    Entries are written when identities are merged, when touchpoints are
+    added to an identity after the fact, and when conversions are recorded
+    or their confirmed/active state changes (through Conversion.save()).
+    refresh_attribution() consumes them and re-credits only the affected
+    conversions. Logging is enabled with the TRACK_CHANGES setting.
+
+    Attributes:
+        kind: What happened
+        identity: Identity whose conversions may need re-attribution
+        conversion: Conversion that needs re-attribution
+        since: Only conversions after this moment are affected (optional)
+    """
+
+    class Kind(models.TextChoices):
+        TOUCHPOINTS_ADDED = "touchpoints_added", "Touchpoints added"
+        IDENTITY_MERGED = "identity_merged", "Identity merged"
+        CONVERSION_RECORDED = "conversion_recorded", "Conversion recorded"
+        CONVERSION_CHANGED = "conversion_changed", "Conversion changed"
+
+    kind = models.CharField(max_length=32, choices=Kind.choices)
+    identity = models.ForeignKey(
+        Identity,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    conversion = models.ForeignKey(
+        Conversion,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+    since = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = models.Manager.from_queryset(AttributionChangeQuerySet)()
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.created_at})"
+
+
+class AttributionWeights(models.Model):
+    """
+    Channel weights learned by a data-driven attribution model.
+
+    Saved by refit() and loaded by materialize(), so that refresh_attribution
+    re-credits a few conversions in a fresh process without refitting the
+    model over every conversion.
+
+    Attributes:
+        model: Name of the attribution model
+        window: Attribution window of the fit (e.g. '30' or '30;email=7')
+        weights: Weight of each channel label
+        fitted_at: When the weights were fitted
+    """
+
+    model = models.CharField(max_length=50)
+    window = models.CharField(max_length=255)
+    weights = models.JSONField(default=dict)
+    fitted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = "Attribution weights"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["model", "window"], name="unique_attribution_weights"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.model} (window {self.window})"
+
+
+class DailyRollup(models.Model):
+    """
+    Pre-aggregated daily totals per UTM source, medium and campaign.
+
+    Rows are rebuilt by the rollup_attribution command (see rollups.py) and
+    read by the admin dashboard, so reports never scan the raw tables.
+
+    Attributes:
+        day: Local date the totals belong to
+        utm_source: UTM source ('' when absent)
+        utm_medium: UTM medium ('' when absent)
+        utm_campaign: UTM campaign ('' when absent)
+        touchpoints: Touchpoints recorded that day
+        conversions: Valid conversions attributed to the combination
+        revenue: Value of those conversions
+        attributed_revenue: Value credited by the materialized model
+        updated_at: When the row was last rebuilt
+    """
+
+    day = models.DateField()
+    utm_source = models.CharField(max_length=255, blank=True)
+    utm_medium = models.CharField(max_length=255, blank=True)
+    utm_campaign = models.CharField(max_length=255, blank=True)
+    touchpoints = models.PositiveIntegerField(default=0)
+    conversions = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    attributed_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "utm_source", "utm_medium", "utm_campaign"],
+                name="unique_daily_rollup",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.utm_source}/{self.utm_medium}/{self.utm_campaign}"
@@ -0,0 +1,71 @@
+import json
+import logging
+from typing import Optional
+
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.utils.functional import cached_property
+
+from .conf import attribution_settings
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "EstimatedCountPaginator",
+    "estimate_count",
+]
+
+
+def estimate_count(queryset) -> Optional[int]:
+    """
+    Row count of queryset estimated by the query planner, without running it.
+
+    Returns None when the backend keeps no usable statistics (only
+    PostgreSQL is supported) or queryset is not a QuerySet.
+    """
+
+    if not isinstance(queryset, models.QuerySet):
+        return None
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that trusts planner estimates for large result sets.
+
+    An exact COUNT(*) scans every matching row. When the planner expects at
+    least ESTIMATED_COUNT_THRESHOLD rows, its estimate is used as the count
+    instead; smaller result sets are counted exactly. is_estimated tells
+    which one count holds. When an estimate is too high and the requested
+    page comes back empty, the rows are counted exactly and the last page
+    is served instead.
+    """
+
+    is_estimated = False
+
+    @cached_property
+    def count(self) -> int:
+        estimate = estimate_count(self.object_list)
+        if (
+            estimate is None
+            or estimate < attribution_settings.ESTIMATED_COUNT_THRESHOLD
+        ):
+            return super().count
+
+        self.is_estimated = True
+        return estimate
+
+    def page(self, number):
+        page = super().page(number)
+        if self.is_estimated and page.number > 1 and not page.object_list:
+            # Paginator.count runs the exact COUNT(*)
+            self.__dict__["count"] = super().count
+            self.is_estimated = False
+            for name in ("num_pages", "page_range"):
+                self.__dict__.pop(name, None)
+            return super().page(self.num_pages)
+        return page
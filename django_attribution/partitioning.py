@@ -0,0 +1,375 @@
+import logging
+from datetime import date
+from typing import List, Tuple
+
+from django.db import NotSupportedError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "PARTITIONED_MODELS",
+    "create_partitions",
+    "detach_partitions",
+    "ensure_future_partitions",
+    "is_partitioned",
+    "list_partitions",
+    "partition_name",
+    "partition_table",
+]
+
+PARTITIONED_MODELS = ("touchpoint", "conversion")
+
+PARTITION_KEY = "created_at"
+
+
+def get_partitioned_model(name: str):
+    from django.apps import apps
+
+    if name not in PARTITIONED_MODELS:
+        raise ValueError(
+            f"Unknown partitioned model '{name}'. "
+            f"Expected one of: {', '.join(PARTITIONED_MODELS)}"
+        )
+    return apps.get_model("django_attribution", name)
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def is_partitioned(model, using: str = "default") -> bool:
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [model._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(model, using: str = "default") -> List[Tuple[str, date]]:
+    """
+    Monthly partitions attached to the model's table, oldest first.
+
+    Returns (partition name, first day of month) pairs; the default
+    partition is left out.
+    """
+
+    table = model._meta.db_table
+    prefix = f"{table}_p"
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s) "
+            "ORDER BY child.relname",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        suffix = name[len(prefix) :]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions.append((name, date(int(suffix[:4]), int(suffix[4:]), 1)))
+    return partitions
+
+
+def create_partitions(
+    model,
+    start: date,
+    end: date,
+    using: str = "default",
+) -> List[str]:
+    """
+    Creates the monthly partitions covering [start, end] that are missing.
+
+    PostgreSQL refuses to add a partition while the default partition holds
+    rows of its range, e.g. after ensure_future_partitions() missed a run.
+    Those rows are moved to the new partition before it is attached, in the
+    same transaction.
+
+    Returns the names of the partitions created.
+    """
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    default = default_partition_name(table)
+    created = []
+
+    month = month_start(start)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [default])
+        has_default = cursor.fetchone()[0]
+
+        while month <= end:
+            name = partition_name(table, month)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                bounds = [
+                    f"{month.isoformat()} 00:00:00+00",
+                    f"{add_months(month, 1).isoformat()} 00:00:00+00",
+                ]
+                with transaction.atomic(using=using):
+                    moved = 0
+                    if has_default:
+                        moved = _move_out_of_default(
+                            cursor, table, default, name, bounds, quote
+                        )
+                    if moved:
+                        cursor.execute(
+                            f"ALTER TABLE {quote(table)} ATTACH PARTITION "
+                            f"{quote(name)} FOR VALUES FROM (%s) TO (%s)",
+                            bounds,
+                        )
+                    else:
+                        cursor.execute(
+                            f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} "
+                            f"FOR VALUES FROM (%s) TO (%s)",
+                            bounds,
+                        )
+                logger.info(f"Created partition {name} ({moved} rows moved)")
+                created.append(name)
+            month = add_months(month, 1)
+
+    return created
+
+
+def detach_partitions(
+    model,
+    before: date,
+    drop: bool = False,
+    using: str = "default",
+) -> List[str]:
+    """
+    Detaches the monthly partitions that end on or before `before`.
+
+    Detaching is a catalog update, so old months leave the table instantly
+    instead of through a long DELETE. Detached partitions are kept as plain
+    tables unless drop is set.
+
+    Returns the names of the partitions detached.
+    """
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    detached = []
+
+    for name, month in list_partitions(model, using):
+        if add_months(month, 1) > before:
+            continue
+
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+            if drop:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+        logger.info(f"{'Dropped' if drop else 'Detached'} partition {name}")
+        detached.append(name)
+
+    return detached
+
+
+def ensure_future_partitions(
+    months_ahead: int = 3, using: str = "default"
+) -> List[str]:
+    """
+    Creates the next months_ahead monthly partitions of every partitioned model.
+
+    Meant to be run periodically (e.g. daily from cron). Rows falling outside
+    the existing partitions land in the default partition, so a missed run
+    never rejects inserts.
+    """
+
+    today = date.today()
+    created = []
+    for name in PARTITIONED_MODELS:
+        model = get_partitioned_model(name)
+        if is_partitioned(model, using):
+            created += create_partitions(
+                model, today, add_months(today, months_ahead), using
+            )
+    return created
+
+
+def partition_table(model, months_ahead: int = 3, using: str = "default") -> None:
+    """
+    Converts the model's table to a table range-partitioned by month.
+
+    The table is renamed to <table>_legacy, replaced by a partitioned copy
+    with one partition per month of existing data plus months_ahead future
+    months and a default partition, and its rows are copied over, all in one
+    transaction. The legacy table is kept for verification and can be dropped
+    afterwards.
+
+    PostgreSQL requires unique constraints of a partitioned table to include
+    the partition key, so the primary key becomes (id, created_at), the uuid
+    unique constraint becomes a plain index and foreign keys pointing at the
+    table (click identifiers, credits, change log) lose their database
+    constraint. Django still enforces on_delete in Python.
+    """
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    legacy = f"{table}_legacy"
+
+    if connection.vendor != "postgresql":
+        raise NotSupportedError("Partitioning requires PostgreSQL")
+    if is_partitioned(model, using):
+        raise ValueError(f"{table} is already partitioned")
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+        _drop_referencing_foreign_keys(cursor, table, quote)
+
+        index_definitions = _index_definitions(cursor, table)
+        foreign_keys = _foreign_key_definitions(cursor, table)
+        cursor.execute(
+            "SELECT column_name, is_identity = 'YES' FROM information_schema.columns "
+            "WHERE table_name = %s AND column_name = 'id'",
+            [table],
+        )
+        _, is_identity = cursor.fetchone()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        serial_sequence = cursor.fetchone()[0]
+
+        cursor.execute(
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u', 'f')",
+            [table],
+        )
+        for (constraint,) in cursor.fetchall():
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(constraint)}"
+            )
+        # Names come from regclass and are already quoted and qualified
+        for name, _ in index_definitions:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(legacy)} "
+            f"INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS "
+            f"INCLUDING STORAGE) "
+            f"PARTITION BY RANGE ({quote(PARTITION_KEY)})"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_pkey')} "
+            f"PRIMARY KEY ({quote('id')}, {quote(PARTITION_KEY)})"
+        )
+        for _, definition in index_definitions:
+            cursor.execute(definition.replace("CREATE UNIQUE INDEX", "CREATE INDEX"))
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}"
+            )
+
+        cursor.execute(
+            f"SELECT min({quote(PARTITION_KEY)}), max({quote(PARTITION_KEY)}) "
+            f"FROM {quote(legacy)}"
+        )
+        first, last = cursor.fetchone()
+        today = date.today()
+        create_partitions(
+            model,
+            start=first.date() if first else today,
+            end=add_months(max(last.date() if last else today, today), months_ahead),
+            using=using,
+        )
+        cursor.execute(
+            f"CREATE TABLE {quote(default_partition_name(table))} "
+            f"PARTITION OF {quote(table)} DEFAULT"
+        )
+
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)}")
+
+        if is_identity:
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                f"COALESCE((SELECT max(id) FROM {quote(table)}), 0) + 1, false)",
+                [table],
+            )
+        elif serial_sequence:
+            cursor.execute(
+                f"ALTER SEQUENCE {serial_sequence} OWNED BY {quote(table)}.id"
+            )
+
+    logger.info(f"Partitioned {table}, rows kept in {legacy} for verification")
+
+
+def _move_out_of_default(
+    cursor, table: str, default: str, name: str, bounds: List[str], quote
+) -> int:
+    """
+    Moves the rows of the default partition within bounds to a new table
+    name, ready to be attached. Returns the number of rows moved, 0 when
+    the table was not created.
+    """
+
+    condition = f"{quote(PARTITION_KEY)} >= %s AND {quote(PARTITION_KEY)} < %s"
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {quote(default)} WHERE {condition})", bounds
+    )
+    if not cursor.fetchone()[0]:
+        return 0
+
+    cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(
+        f"CREATE TABLE {quote(name)} (LIKE {quote(table)} "
+        f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)"
+    )
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {quote(default)} WHERE {condition} "
+        f"RETURNING *) INSERT INTO {quote(name)} SELECT * FROM moved",
+        bounds,
+    )
+    return cursor.rowcount
+
+
+def _drop_referencing_foreign_keys(cursor, table: str, quote) -> None:
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+        [table],
+    )
+    for referencing_table, constraint in cursor.fetchall():
+        cursor.execute(
+            f"ALTER TABLE {referencing_table} DROP CONSTRAINT {quote(constraint)}"
+        )
+
+
+def _index_definitions(cursor, table: str) -> List[Tuple[str, str]]:
+    cursor.execute(
+        "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) "
+        "FROM pg_index WHERE indrelid = to_regclass(%s) AND NOT indisprimary",
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _foreign_key_definitions(cursor, table: str) -> List[Tuple[str, str]]:
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [table],
+    )
+    return cursor.fetchall()
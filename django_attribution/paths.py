@@ -0,0 +1,128 @@
+import heapq
+from decimal import Decimal
+from typing import Dict, Hashable, List, NamedTuple, Optional, Tuple, cast
+
+from django.db import models
+
+from .journeys import iter_journeys
+
+__all__ = [
+    "PathStat",
+    "TopK",
+    "top_conversion_paths",
+]
+
+PATH_SEPARATOR = " → "
+
+
+class PathStat(NamedTuple):
+    """
+    Aggregated statistics for one conversion path.
+
+    Attributes:
+        path: Channel labels, oldest first
+        conversions: Number of conversions that followed this path
+        value: Sum of the conversion values of those conversions
+        error: Upper bound on conversions missed while the path was evicted
+    """
+
+    path: Tuple[str, ...]
+    conversions: int
+    value: Decimal
+    error: int
+
+    def __str__(self):
+        return PATH_SEPARATOR.join(self.path) or "(no touchpoints)"
+
+
+class TopK:
+    """
+    Bounded-memory heavy-hitter counter.
+
+    Keeps at most 2 * capacity keys. When full, the table is pruned back to
+    the capacity keys with the highest counts and the largest evicted count
+    becomes the error bound of keys seen afterwards, as in Space-Saving.
+    Pruning runs at most once per capacity insertions, so the amortized cost
+    per key is O(log capacity).
+    """
+
+    def __init__(self, capacity: int = 1000):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.capacity = capacity
+        self._entries: Dict[Hashable, list] = {}
+        self._floor = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key: Hashable, value: Decimal = Decimal(0)) -> None:
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= 2 * self.capacity:
+                self._prune()
+            entry = self._entries[key] = [0, Decimal(0), self._floor]
+
+        entry[0] += 1
+        entry[1] += value
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[Hashable, list]]:
+        n = self.capacity if n is None else n
+        return heapq.nlargest(
+            n, self._entries.items(), key=lambda item: (item[1][0], item[1][1])
+        )
+
+    def _prune(self) -> None:
+        kept = dict(self.most_common(self.capacity))
+        for key, (count, _, error) in self._entries.items():
+            if key not in kept:
+                self._floor = max(self._floor, count + error)
+        self._entries = kept
+
+
+def top_conversion_paths(
+    conversions_qs: models.QuerySet,
+    limit: int = 10,
+    window_days: int = 30,
+    source_windows: Optional[Dict[str, int]] = None,
+    max_path_length: int = 10,
+    granularity: str = "source_medium",
+    capacity: Optional[int] = None,
+) -> List[PathStat]:
+    """
+    Returns the most common touchpoint paths leading to conversions.
+
+    Paths are streamed per identity (see iter_journeys) and aggregated in a
+    TopK table, so neither the touchpoints nor the full set of distinct paths
+    are ever held in memory.
+
+    Args:
+        conversions_qs: Conversions to analyse
+        limit: Number of paths to return
+        window_days: Default attribution window in days
+        source_windows: Per-utm_source window overrides in days
+        max_path_length: Maximum number of steps kept per path
+        granularity: Step labels, 'source_medium', 'source' or 'campaign'
+        capacity: Distinct paths tracked at once (defaults to 100 * limit,
+            at least 1000)
+
+    Returns:
+        PathStat entries ordered by conversion count, most common first
+    """
+
+    counter = TopK(capacity or max(100 * limit, 1000))
+
+    for journey in iter_journeys(
+        conversions_qs,
+        window_days=window_days,
+        source_windows=source_windows,
+        max_path_length=max_path_length,
+        granularity=granularity,
+    ):
+        counter.add(journey.path, journey.value)
+
+    return [
+        PathStat(cast(Tuple[str, ...], path), count, value, error)
+        for path, (count, value, error) in counter.most_common(limit)
+    ]
@@ -1,12 +1,43 @@
 import logging
 from typing import Any, Dict, Optional
 
-from django.db import models
+from django.db import models, transaction
 
 logger = logging.getLogger(__name__)
 
 
+def _chosen_database(queryset: models.QuerySet) -> Optional[str]:
+    """Alias picked with using(), None when left to the routers."""
+
+    return getattr(queryset, "_db", None)
+
+
 class BaseQuerySet(models.QuerySet):
+    def _for_reporting(self):
+        """
+        Sends an analytic read to READ_DATABASE_ALIAS, unless a database
+        was chosen explicitly with using().
+        """
+
+        from django_attribution.routers import get_read_database
+
+        if _chosen_database(self) is not None:
+            return self
+        return self.using(get_read_database())
+
+    def _fans_out(self) -> bool:
+        """
+        Whether a report has to be computed on every shard and merged,
+        i.e. attribution tables are sharded and neither using() nor
+        use_shard() picked one.
+        """
+
+        from django_attribution.sharding import current_shard, is_sharded
+
+        return (
+            is_sharded() and _chosen_database(self) is None and current_shard() is None
+        )
+
     def active(self):
         return self.filter(is_active=True)
 
@@ -21,11 +52,130 @@ class BaseQuerySet(models.QuerySet):
 
 
 class IdentityQuerySet(BaseQuerySet):
-    pass
+    def with_activity_summary(self):
+        """
+        Annotates each identity with totals of its touchpoints and conversions.
+
+        Adds touchpoint_count, first_touch_at, last_touch_at,
+        conversion_count, conversion_value (of valid conversions),
+        first_conversion_at and last_conversion_at. Every value is a
+        correlated subquery over the (identity, created_at) indexes, so the
+        summary of an identity is fetched in a single query.
+        """
+
+        from django.db.models.functions import Coalesce
+
+        from django_attribution.models import Conversion, Touchpoint
+
+        touchpoints = Touchpoint.objects.filter(identity=models.OuterRef("pk"))
+        conversions = Conversion.objects.filter(identity=models.OuterRef("pk"))
+
+        return self.annotate(
+            touchpoint_count=Coalesce(
+                _identity_aggregate(touchpoints, models.Count("pk")), 0
+            ),
+            first_touch_at=_identity_aggregate(touchpoints, models.Min("created_at")),
+            last_touch_at=_identity_aggregate(touchpoints, models.Max("created_at")),
+            conversion_count=Coalesce(
+                _identity_aggregate(conversions, models.Count("pk")), 0
+            ),
+            conversion_value=_identity_aggregate(
+                conversions.valid(), models.Sum("conversion_value")
+            ),
+            first_conversion_at=_identity_aggregate(
+                conversions, models.Min("created_at")
+            ),
+            last_conversion_at=_identity_aggregate(
+                conversions, models.Max("created_at")
+            ),
+        )
+
+
+def _identity_aggregate(queryset, aggregate):
+    return models.Subquery(
+        queryset.order_by()
+        .values("identity")
+        .annotate(result=aggregate)
+        .values("result")
+    )
 
 
 class TouchpointQuerySet(BaseQuerySet):
-    pass
+    def with_click_id(self, value, platform=None):
+        """
+        Touchpoints that arrived with the given click ID.
+
+        Args:
+            value: The click ID
+            platform: Click ID parameter name (e.g. "gclid"); any platform
+                if omitted
+        """
+
+        from django_attribution.models import ClickIdentifier
+
+        lookup = {"click_identifiers__value": value}
+        if platform is not None:
+            lookup["click_identifiers__platform"] = ClickIdentifier.Platform[
+                platform.upper()
+            ]
+        return self.filter(**lookup).distinct()
+
+    def for_landing_page(self, url):
+        """
+        Touchpoints that landed on the page of url, whatever their tracking
+        parameters. url may be absolute or just a path.
+        """
+
+        from django_attribution.landing_pages import landing_page_hash
+
+        return self.filter(url_hash=landing_page_hash(url))
+
+    def landing_page_counts(self):
+        """
+        Touchpoints per landing page, most visited first.
+
+        Groups on the indexed url_hash column. Returns dicts with 'url_hash',
+        'touchpoints' and 'url', one of the page's stored URLs.
+        """
+
+        return (
+            self._for_reporting()
+            .exclude(url_hash__isnull=True)
+            .order_by()
+            .values("url_hash")
+            .annotate(touchpoints=models.Count("pk"), url=models.Min("url"))
+            .order_by("-touchpoints", "url_hash")
+        )
+
+
+class AttributionChangeQuerySet(models.QuerySet):
+    def log(self, kind, identity=None, conversion=None, since=None):
+        from django_attribution.conf import attribution_settings
+
+        if not attribution_settings.TRACK_CHANGES:
+            return None
+
+        # Saved through the instance so that the entry follows its identity
+        # or conversion to the same database
+        change = self.model(
+            kind=kind, identity=identity, conversion=conversion, since=since
+        )
+        change.save(using=_chosen_database(self))
+        return change
+
+    def touchpoints_added(self, identity, since):
+        """
+        Records that touchpoints dated `since` or later were added to identity.
+
+        Call this after importing or backdating touchpoints so that
+        conversions that happened after them get re-attributed.
+        """
+
+        from django_attribution.models import AttributionChange
+
+        return self.log(
+            AttributionChange.Kind.TOUCHPOINTS_ADDED, identity=identity, since=since
+        )
 
 
 class ConversionQuerySet(BaseQuerySet):
@@ -41,6 +191,67 @@ class ConversionQuerySet(BaseQuerySet):
     def valid(self):
         return self.active().confirmed()
 
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Inserts conversions and, with TRACK_CHANGES, logs them as recorded
+        like Conversion.save() does.
+
+        Conversions whose primary key the database does not return (e.g.
+        MySQL) are logged against their identity instead.
+        """
+
+        from django_attribution.models import AttributionChange
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self._log_changes(
+            AttributionChange.Kind.CONVERSION_RECORDED,
+            [obj.pk for obj in objs if obj.pk is not None],
+            {obj.identity_id for obj in objs if obj.pk is None} - {None},
+        )
+        return objs
+
+    def update(self, **kwargs):
+        """
+        Updates the conversions and, with TRACK_CHANGES, logs the ones whose
+        is_active or is_confirmed changed, like Conversion.save() does.
+        """
+
+        from django_attribution.conf import attribution_settings
+        from django_attribution.models import AttributionChange
+
+        validity = {
+            field: value
+            for field, value in kwargs.items()
+            if field in ("is_active", "is_confirmed")
+        }
+        if not attribution_settings.TRACK_CHANGES or not validity:
+            return super().update(**kwargs)
+
+        changed = self
+        if not any(hasattr(value, "resolve_expression") for value in validity.values()):
+            changed = self.exclude(**validity)
+
+        with transaction.atomic(using=self.db):
+            pks = list(changed.order_by().values_list("pk", flat=True))
+            updated = super().update(**kwargs)
+            self._log_changes(AttributionChange.Kind.CONVERSION_CHANGED, pks)
+        return updated
+
+    def _log_changes(self, kind, pks, identity_ids=()):
+        from django_attribution.conf import attribution_settings
+        from django_attribution.models import AttributionChange
+
+        if not attribution_settings.TRACK_CHANGES:
+            return
+
+        AttributionChange.objects.using(self.db).bulk_create(
+            [AttributionChange(kind=kind, conversion_id=pk) for pk in pks]
+            + [
+                AttributionChange(kind=kind, identity_id=identity_id)
+                for identity_id in identity_ids
+            ]
+        )
+
     def record(
         self,
         request,
@@ -119,6 +330,10 @@ class ConversionQuerySet(BaseQuerySet):
         conversion = self.model(**conversion_data)
         conversion.save()
 
+        from django_attribution.metrics import CONVERSIONS_RECORDED
+
+        CONVERSIONS_RECORDED.inc(event=event)
+
         logger.info(
             f"Recorded conversion '{event}' "
             f"for identity {current_identity.uuid if current_identity else 'anonymous'}"
@@ -137,7 +352,90 @@ class ConversionQuerySet(BaseQuerySet):
             model = last_touch
 
         return model.apply(
-            self,
+            self._for_reporting(),
             window_days=window_days,
             source_windows=source_windows,
         )
+
+    def top_paths(
+        self,
+        limit=10,
+        window_days=30,
+        source_windows=None,
+        max_path_length=10,
+        granularity="source_medium",
+    ):
+        from django_attribution.paths import top_conversion_paths
+
+        if self._fans_out():
+            from django_attribution.sharding import fan_out, merge_path_stats
+
+            # Shards report a longer list so that the merged ranking is
+            # close to the one a single database would give
+            shard_limit = limit * 10
+            return merge_path_stats(
+                fan_out(
+                    lambda alias: self.using(alias).top_paths(
+                        limit=shard_limit,
+                        window_days=window_days,
+                        source_windows=source_windows,
+                        max_path_length=max_path_length,
+                        granularity=granularity,
+                    )
+                ),
+                limit,
+                shard_limit,
+            )
+
+        return top_conversion_paths(
+            self._for_reporting(),
+            limit=limit,
+            window_days=window_days,
+            source_windows=source_windows,
+            max_path_length=max_path_length,
+            granularity=granularity,
+        )
+
+    def lag_histogram(self, bucket_edges=None, group_by="utm_campaign", **kwargs):
+        from django_attribution.distributions import DEFAULT_LAG_EDGES, lag_histogram
+
+        if self._fans_out():
+            return self._merged_histogram(
+                "lag_histogram", bucket_edges, group_by, **kwargs
+            )
+
+        return lag_histogram(
+            self._for_reporting(),
+            bucket_edges or DEFAULT_LAG_EDGES,
+            group_by=group_by,
+            **kwargs,
+        )
+
+    def touches_histogram(self, bucket_edges=None, group_by="utm_campaign", **kwargs):
+        from django_attribution.distributions import (
+            DEFAULT_TOUCHES_EDGES,
+            touches_histogram,
+        )
+
+        if self._fans_out():
+            return self._merged_histogram(
+                "touches_histogram", bucket_edges, group_by, **kwargs
+            )
+
+        return touches_histogram(
+            self._for_reporting(),
+            bucket_edges or DEFAULT_TOUCHES_EDGES,
+            group_by=group_by,
+            **kwargs,
+        )
+
+    def _merged_histogram(self, method, bucket_edges, group_by, **kwargs):
+        from django_attribution.sharding import fan_out, merge_histograms
+
+        return merge_histograms(
+            fan_out(
+                lambda alias: getattr(self.using(alias), method)(
+                    bucket_edges, group_by=group_by, **kwargs
+                )
+            )
+        )
@@ -1,10 +1,14 @@
 import logging
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Optional
 
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import Q
 
-from django_attribution.models import Identity
+from django_attribution.metrics import IDENTITIES_CREATED, IDENTITY_MERGES
+from django_attribution.models import AttributionChange, Identity
+from django_attribution.routers import get_identity_database, get_write_database
+from django_attribution.sharding import fan_out, get_shards, is_sharded
 from django_attribution.trackers import CookieIdentityTracker
 from django_attribution.types import AttributionHttpRequest
 
@@ -18,8 +22,13 @@ User = get_user_model()
 
 __all__ = ["reconcile_user_identity"]
 
+# Default of reconcile_user_identity(): look the cookie identity up
+_FROM_COOKIE: Any = object()
 
-def reconcile_user_identity(request: AttributionHttpRequest) -> Identity:
+
+def reconcile_user_identity(
+    request: AttributionHttpRequest, current_identity: Any = _FROM_COOKIE
+) -> Identity:
     """
     Reconciles identity state when a user authenticates.
 
@@ -31,6 +40,8 @@ def reconcile_user_identity(request: AttributionHttpRequest) -> Identity:
 
     Args:
         request: AttributionHttpRequest with authenticated user
+        current_identity: Identity of the tracking cookie (None if there is
+            none) when the caller already loaded it, saving a query
 
     Returns:
         The canonical Identity for the authenticated user
@@ -39,19 +50,22 @@ def reconcile_user_identity(request: AttributionHttpRequest) -> Identity:
         Updates the identity tracker cookie to reference the canonical identity.
     """
 
-    canonical_identity = _resolve_user_identity(request)
+    canonical_identity = _resolve_user_identity(request, current_identity)
     request.identity_tracker.set_identity(canonical_identity)
 
     return canonical_identity
 
 
-def _resolve_user_identity(request: AttributionHttpRequest) -> Identity:
+def _resolve_user_identity(
+    request: AttributionHttpRequest, current_identity: Any
+) -> Identity:
     user = request.user
     assert user.is_authenticated
 
-    tracker = request.identity_tracker
-
-    current_identity = _get_current_identity_from_request(request, tracker)
+    if current_identity is _FROM_COOKIE:
+        current_identity = _get_current_identity_from_request(
+            request, request.identity_tracker
+        )
     user_canonical_identity = _find_user_canonical_identity(user)
 
     if not current_identity:
@@ -62,10 +76,10 @@ def _resolve_user_identity(request: AttributionHttpRequest) -> Identity:
             user, request
         )
 
-    if current_identity.linked_user == user:
+    if current_identity.linked_user_id == user.pk:
         return current_identity.get_canonical_identity()
 
-    if not current_identity.linked_user:
+    if not current_identity.linked_user_id:
         if user_canonical_identity:
             logger.info(
                 f"Merging anonymous identity {current_identity.uuid} "
@@ -86,34 +100,192 @@ def _resolve_user_identity(request: AttributionHttpRequest) -> Identity:
     return user_canonical_identity
 
 
-@transaction.atomic
 def _merge_identity_to_canonical(source: Identity, canonical: Identity) -> None:
-    if source == canonical:
+    # Primary keys are only unique within a shard
+    if source == canonical and source._state.db == canonical._state.db:
         return
 
     if source.is_merged():
         logger.warning(f"Source identity {source.uuid} is already merged")
         return
 
-    source.touchpoints.update(identity=canonical)
-    source.conversions.update(identity=canonical)
+    if source._state.db != canonical._state.db:
+        _move_identity_to_shard(source, canonical)
+        IDENTITY_MERGES.inc(kind="cross_shard")
+        return
+
+    with transaction.atomic(using=source._state.db or get_write_database()):
+        moved_touchpoints = source.touchpoints.update(identity=canonical)
+        moved_conversions = source.conversions.update(identity=canonical)
+
+        source.merged_into = canonical
+        source.linked_user_id = canonical.linked_user_id
+        source.save(update_fields=["merged_into", "linked_user"])
+
+        source.merged_identities.update(merged_into=canonical)
+
+        if moved_touchpoints or moved_conversions:
+            AttributionChange.objects.log(
+                AttributionChange.Kind.IDENTITY_MERGED, identity=canonical
+            )
+
+    IDENTITY_MERGES.inc(kind="local")
+
+
+def _move_identity_to_shard(source: Identity, canonical: Identity) -> None:
+    """
+    Merges an identity living on another shard than its canonical identity.
+
+    Foreign keys cannot span databases, so instead of pointing source at
+    canonical, its touchpoints (with their click identifiers) and
+    conversions are copied to the canonical identity's shard and source is
+    deleted from its own. Source and the identities merged into it are
+    copied too, merged into canonical, so that their cookies still resolve
+    (see get_identity_by_reference()). The copy is committed before the
+    originals are deleted: a failure in between leaves duplicates, never
+    lost rows.
+    """
+
+    from django_attribution.dimensions import (
+        UTM_PARAMETERS,
+        intern_campaign_dimension,
+    )
+    from django_attribution.models import ClickIdentifier, Conversion, Touchpoint
+
+    source_db, target_db = source._state.db, canonical._state.db
+    touchpoints = list(
+        source.touchpoints.select_related("campaign_dimension").prefetch_related(
+            "click_identifiers"
+        )
+    )
+    conversions = list(source.conversions.all())
+    identities = list(
+        Identity.objects.using(source_db).filter(
+            Q(pk=source.pk) | Q(merged_into=source)
+        )
+    )
+
+    with transaction.atomic(using=target_db):
+        for identity in identities:
+            identity.pk = None
+            identity._state.adding = True
+            identity._state.db = None
+            identity.merged_into = canonical
+            identity.linked_user_id = canonical.linked_user_id
+        Identity.objects.using(target_db).bulk_create(identities)
+
+        click_identifiers = []
+        for touchpoint in touchpoints:
+            original_click_identifiers = list(touchpoint.click_identifiers.all())
+            if touchpoint.campaign_dimension_id is not None:
+                dimension = touchpoint.campaign_dimension
+                touchpoint.campaign_dimension_id = intern_campaign_dimension(
+                    {param: getattr(dimension, param) for param in UTM_PARAMETERS},
+                    using=target_db,
+                )
+            _copy_to(touchpoint, canonical)
+            click_identifiers += [
+                ClickIdentifier(
+                    touchpoint=touchpoint,
+                    platform=click_identifier.platform,
+                    value=click_identifier.value,
+                )
+                for click_identifier in original_click_identifiers
+            ]
+        Touchpoint.objects.using(target_db).bulk_create(touchpoints)
+        if any(touchpoint.pk is None for touchpoint in touchpoints):
+            # Backends like MySQL do not return the primary keys of bulk inserts
+            pks = dict(
+                Touchpoint.objects.using(target_db)
+                .filter(uuid__in=[touchpoint.uuid for touchpoint in touchpoints])
+                .values_list("uuid", "pk")
+            )
+            for touchpoint in touchpoints:
+                touchpoint.pk = pks[touchpoint.uuid]
+        ClickIdentifier.objects.using(target_db).bulk_create(click_identifiers)
+
+        for conversion in conversions:
+            _copy_to(conversion, canonical)
+        Conversion.objects.using(target_db).bulk_create(conversions)
+
+        if touchpoints or conversions:
+            AttributionChange.objects.log(
+                AttributionChange.Kind.IDENTITY_MERGED, identity=canonical
+            )
 
-    source.merged_into = canonical
-    source.linked_user = canonical.linked_user
-    source.save(update_fields=["merged_into", "linked_user"])
+    with transaction.atomic(using=source_db):
+        Touchpoint.objects.using(source_db).filter(identity=source).delete()
+        Conversion.objects.using(source_db).filter(identity=source).delete()
+        source.delete()
 
-    source.merged_identities.update(merged_into=canonical)
+    logger.info(
+        f"Moved {len(touchpoints)} touchpoints and {len(conversions)} conversions "
+        f"of identity {source.uuid} from {source_db} to {target_db}"
+    )
+
+
+def get_identity_by_reference(identity_ref) -> Optional[Identity]:
+    """
+    Identity with the given UUID, looked up on its shard.
+
+    With sharding, identities moved by a cross-shard merge live on the shard
+    of their canonical identity, so an identity missing from its own shard
+    is looked for on the others. Callers replace the cookie with the
+    canonical identity, so this only happens once per visitor.
+    """
+
+    home = get_identity_database(identity_ref)
+    try:
+        return Identity.objects.using(home).get(uuid=identity_ref)
+    except Identity.DoesNotExist:
+        if not is_sharded():
+            return None
+
+    moved = fan_out(
+        lambda alias: (
+            Identity.objects.using(alias)
+            .filter(uuid=identity_ref, merged_into__isnull=False)
+            .first()
+        ),
+        shards=[alias for alias in get_shards() if alias != home],
+    )
+    return next((identity for identity in moved if identity is not None), None)
+
+
+def _copy_to(instance, identity: Identity) -> None:
+    instance.pk = None
+    instance._state.adding = True
+    instance._state.db = None
+    instance.identity = identity
 
 
 def _find_user_canonical_identity(user: "AbstractUser") -> Optional[Identity]:
-    user_identities = Identity.objects.filter(
-        linked_user=user,  # type: ignore
-        merged_into__isnull=True,
-    ).oldest_first()
+    if is_sharded():
+        # A user's identities may live on any shard: the oldest one wins
+        candidates = [
+            identity
+            for identity in fan_out(
+                lambda alias: _oldest_user_identity(user, alias),
+            )
+            if identity is not None
+        ]
+        return min(candidates, key=lambda identity: identity.created_at, default=None)
+
+    return _oldest_user_identity(user)
+
 
-    if user_identities.exists():
-        return user_identities.first()
-    return None
+def _oldest_user_identity(
+    user: "AbstractUser", using: Optional[str] = None
+) -> Optional[Identity]:
+    return (
+        Identity.objects.using(using)
+        .filter(
+            linked_user=user,
+            merged_into__isnull=True,
+        )
+        .oldest_first()
+        .first()
+    )
 
 
 def _get_current_identity_from_request(
@@ -124,10 +296,7 @@ def _get_current_identity_from_request(
     if not identity_ref:
         return None
 
-    try:
-        return Identity.objects.get(uuid=identity_ref)
-    except Identity.DoesNotExist:
-        return None
+    return get_identity_by_reference(identity_ref)
 
 
 def _create_canonical_identity_for_user(
@@ -136,9 +305,11 @@ def _create_canonical_identity_for_user(
 ) -> Identity:
     user_agent = request.META.get("HTTP_USER_AGENT", "")
 
-    identity = Identity.objects.create(
+    identity = Identity(
         linked_user=user,  # type: ignore
         first_visit_user_agent=user_agent,
     )
+    identity.save()
+    IDENTITIES_CREATED.inc(kind="user")
     logger.info(f"Created new canonical identity {identity.uuid} for user {user.pk}")
     return identity
@@ -0,0 +1,99 @@
+import logging
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .conf import attribution_settings
+from .models import AttributionChange, AttributionCredit, Conversion
+from .routers import get_write_database
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "get_materialized_models",
+    "refresh_attribution",
+]
+
+
+def get_materialized_models() -> list:
+    return [import_string(path) for path in attribution_settings.MATERIALIZED_MODELS]
+
+
+def refresh_attribution(
+    models: Optional[Iterable] = None,
+    window_days: int = 30,
+    source_windows: Optional[Dict[str, int]] = None,
+    batch_size: int = 500,
+) -> int:
+    """
+    Re-attributes only the conversions affected by pending changes.
+
+    Consumes AttributionChange entries in batches. For each batch the
+    affected conversions are resolved, their credits are rewritten by every
+    materialized model (or deleted if the conversion is no longer valid),
+    and the consumed entries are deleted, all in one transaction. Entries
+    locked by a concurrent refresh are skipped.
+
+    Args:
+        models: Attribution models to refresh (defaults to MATERIALIZED_MODELS)
+        window_days: Default attribution window in days
+        source_windows: Per-utm_source window overrides in days
+        batch_size: Change-log entries consumed per transaction
+
+    Returns:
+        Number of change-log entries consumed
+    """
+
+    models = list(models) if models is not None else get_materialized_models()
+    model_names = [model.name for model in models]
+    consumed = 0
+
+    while True:
+        with transaction.atomic(using=get_write_database()):
+            changes = list(
+                AttributionChange.objects.select_for_update(skip_locked=True).order_by(
+                    "pk"
+                )[:batch_size]
+            )
+            if not changes:
+                break
+
+            affected = Conversion.objects.filter(_affected_conversions(changes))
+
+            AttributionCredit.objects.filter(
+                model__in=model_names,
+                conversion__in=affected.exclude(is_active=True, is_confirmed=True),
+            ).delete()
+            for model in models:
+                model.materialize(affected.valid(), window_days, source_windows)
+
+            AttributionChange.objects.filter(
+                pk__in=[change.pk for change in changes]
+            ).delete()
+
+        consumed += len(changes)
+        logger.info(f"Refreshed attribution for {len(changes)} change(s)")
+
+        if len(changes) < batch_size:
+            break
+
+    return consumed
+
+
+def _affected_conversions(changes: List[AttributionChange]) -> Q:
+    conditions = []
+
+    for change in changes:
+        if change.conversion_id is not None:
+            conditions.append(Q(pk=change.conversion_id))
+        elif change.identity_id is not None:
+            condition = Q(identity_id=change.identity_id)
+            if change.since is not None:
+                condition &= Q(created_at__gt=change.since)
+            conditions.append(condition)
+
+    return reduce(or_, conditions, Q(pk__in=[]))
@@ -0,0 +1,135 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .conf import attribution_settings
+from .models import Conversion, Identity, Touchpoint
+from .routers import get_write_database
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "expired_querysets",
+    "orphaned_identities",
+    "purge_expired",
+]
+
+
+def expired_querysets(now: Optional[datetime] = None) -> Dict[str, models.QuerySet]:
+    """
+    Rows past their retention period, keyed by kind.
+
+    Touchpoints and conversions expire TOUCHPOINT_RETENTION_DAYS and
+    CONVERSION_RETENTION_DAYS after they were recorded. Anonymous identities
+    expire IDENTITY_RETENTION_DAYS after they were created, once no
+    touchpoint, conversion or merged identity references them anymore. Kinds
+    whose setting is None are kept forever and left out.
+    """
+
+    now = now or timezone.now()
+    expired = {}
+
+    if attribution_settings.CONVERSION_RETENTION_DAYS is not None:
+        expired["conversions"] = Conversion.objects.filter(
+            created_at__lt=now
+            - timedelta(days=attribution_settings.CONVERSION_RETENTION_DAYS)
+        )
+
+    if attribution_settings.TOUCHPOINT_RETENTION_DAYS is not None:
+        expired["touchpoints"] = Touchpoint.objects.filter(
+            created_at__lt=now
+            - timedelta(days=attribution_settings.TOUCHPOINT_RETENTION_DAYS)
+        )
+
+    if attribution_settings.IDENTITY_RETENTION_DAYS is not None:
+        expired["identities"] = orphaned_identities(
+            Identity.objects.filter(
+                created_at__lt=now
+                - timedelta(days=attribution_settings.IDENTITY_RETENTION_DAYS)
+            )
+        )
+
+    return expired
+
+
+def orphaned_identities(identities_qs: models.QuerySet) -> models.QuerySet:
+    """
+    Anonymous identities no touchpoint, conversion or identity refers to.
+    """
+
+    return identities_qs.filter(linked_user__isnull=True).filter(
+        ~Exists(Touchpoint.objects.filter(identity=OuterRef("pk"))),
+        ~Exists(Conversion.objects.filter(identity=OuterRef("pk"))),
+        ~Exists(Identity.objects.filter(merged_into=OuterRef("pk"))),
+    )
+
+
+def purge_expired(
+    now: Optional[datetime] = None,
+    batch_size: int = 1000,
+    sleep: float = 0,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    Deletes rows past their retention period in small primary-key batches.
+
+    Each batch is locked with SELECT ... FOR UPDATE SKIP LOCKED, re-checked
+    and deleted in its own short transaction, so live traffic only ever waits
+    on a single batch and rows being written concurrently (e.g. an identity
+    receiving a touchpoint) are skipped rather than blocked on. Conversions
+    go first, then touchpoints, then the identities they leave orphaned.
+
+    Args:
+        now: Reference time for the retention periods (defaults to now)
+        batch_size: Rows deleted per transaction
+        sleep: Seconds to pause between batches
+        dry_run: Only count the expired rows
+
+    Returns:
+        Number of rows deleted (or expired, for a dry run) per kind
+    """
+
+    counts = {}
+
+    for kind, queryset in expired_querysets(now).items():
+        if dry_run:
+            counts[kind] = queryset.count()
+            continue
+
+        counts[kind] = _delete_in_batches(queryset, batch_size, sleep)
+        logger.info(f"Purged {counts[kind]} expired {kind}")
+
+    return counts
+
+
+def _delete_in_batches(queryset: models.QuerySet, batch_size: int, sleep: float) -> int:
+    deleted = 0
+    last_pk = 0
+
+    while True:
+        with transaction.atomic(using=get_write_database()):
+            pks = list(
+                queryset.filter(pk__gt=last_pk)
+                .select_for_update(skip_locked=True, of=("self",))
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+
+            _, per_model = queryset.filter(pk__in=pks).delete()
+
+        deleted += per_model.get(queryset.model._meta.label, 0)
+        last_pk = pks[-1]
+
+        if len(pks) < batch_size:
+            break
+        if sleep:
+            time.sleep(sleep)
+
+    return deleted
@@ -0,0 +1,208 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .conf import attribution_settings
+from .dimensions import utm_lookup
+from .models import AttributionCredit, Conversion, DailyRollup, Touchpoint
+from .refresh import get_materialized_models
+from .routers import get_read_database, get_write_database
+from .sharding import fan_out, is_sharded
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "DASHBOARD_GROUPS",
+    "dashboard_report",
+    "rebuild_rollups",
+]
+
+ROLLUP_DIMENSIONS = ("utm_source", "utm_medium", "utm_campaign")
+
+DASHBOARD_GROUPS = {
+    "source": "utm_source",
+    "medium": "utm_medium",
+    "campaign": "utm_campaign",
+}
+
+METRICS = ("touchpoints", "conversions", "revenue", "attributed_revenue")
+
+CACHE_KEY_PREFIX = "django_attribution:dashboard:"
+
+
+def rebuild_rollups(
+    start: date,
+    end: date,
+    window_days: int = 30,
+    source_windows: Optional[Dict[str, int]] = None,
+) -> int:
+    """
+    Recomputes the DailyRollup rows of every day from start to end inclusive.
+
+    For each day and combination of UTM values, counts touchpoints, the
+    valid conversions attributed to the combination by ROLLUP_MODEL with
+    their value (revenue), and the value credited to it by the materialized
+    ROLLUP_CREDIT_MODEL (attributed_revenue). Credits are assigned to the
+    UTM values of their latest credited touchpoint; with a data-driven
+    ROLLUP_MODEL, conversions go to those of their largest credit. Each day
+    is replaced in its own transaction.
+
+    Returns:
+        Number of rollup rows written
+    """
+
+    written = 0
+    day = start
+    while day <= end:
+        rows = _rollup_day(day, window_days, source_windows)
+        with transaction.atomic(using=get_write_database()):
+            DailyRollup.objects.filter(day=day).delete()
+            DailyRollup.objects.bulk_create(
+                DailyRollup(day=day, **dict(zip(ROLLUP_DIMENSIONS, key)), **metrics)
+                for key, metrics in rows.items()
+            )
+        written += len(rows)
+        logger.info(f"Rolled up {len(rows)} row(s) for {day}")
+        day += timedelta(days=1)
+
+    return written
+
+
+def dashboard_report(start: date, end: date, group: str) -> Dict[str, Any]:
+    """
+    Rollup totals of the days from start to end, overall and per group.
+
+    group is one of DASHBOARD_GROUPS. Only the rollup table is read, and
+    the report is cached in DASHBOARD_CACHE for DASHBOARD_CACHE_TIMEOUT
+    seconds. With sharding, the rollups of every shard are added up.
+
+    Returns:
+        A dict with 'totals' (metric sums) and 'rows' (one dict per group
+        value with 'value' and the metric sums, by revenue descending)
+    """
+
+    field = DASHBOARD_GROUPS[group]
+    cache = caches[attribution_settings.DASHBOARD_CACHE]
+    key = f"{CACHE_KEY_PREFIX}{get_read_database()}:{start}:{end}:{group}"
+
+    report = cache.get(key)
+    if report is None:
+        if is_sharded():
+            report = _merge_reports(
+                fan_out(lambda alias: _report(start, end, field, alias))
+            )
+        else:
+            report = _report(start, end, field, get_read_database())
+        cache.set(key, report, attribution_settings.DASHBOARD_CACHE_TIMEOUT)
+    return report
+
+
+def _report(start: date, end: date, field: str, using: str) -> Dict[str, Any]:
+    rollups = DailyRollup.objects.using(using).filter(day__range=(start, end))
+    sums = {metric: Sum(metric) for metric in METRICS}
+
+    rows = [
+        {"value": row.pop(field), **_zero_missing(row)}
+        for row in rollups.order_by().values(field).annotate(**sums)
+    ]
+    rows.sort(key=lambda row: (-row["revenue"], -row["touchpoints"], row["value"]))
+    return {"totals": _zero_missing(rollups.aggregate(**sums)), "rows": rows}
+
+
+def _merge_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    totals = dict.fromkeys(METRICS, 0)
+    merged: Dict[str, Dict[str, Any]] = {}
+    for report in reports:
+        for metric in METRICS:
+            totals[metric] += report["totals"][metric]
+        for row in report["rows"]:
+            total = merged.setdefault(
+                row["value"], {"value": row["value"], **dict.fromkeys(METRICS, 0)}
+            )
+            for metric in METRICS:
+                total[metric] += row[metric]
+
+    rows = sorted(
+        merged.values(),
+        key=lambda row: (-row["revenue"], -row["touchpoints"], row["value"]),
+    )
+    return {"totals": totals, "rows": rows}
+
+
+def _zero_missing(sums: Dict[str, Any]) -> Dict[str, Any]:
+    return {metric: sums[metric] or 0 for metric in METRICS}
+
+
+def _rollup_day(
+    day: date, window_days: int, source_windows: Optional[Dict[str, int]]
+) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+    day_start = timezone.make_aware(datetime.combine(day, time.min))
+    day_end = day_start + timedelta(days=1)
+    in_day = {"created_at__gte": day_start, "created_at__lt": day_end}
+
+    rows: Dict[Tuple[str, str, str], Dict[str, Any]] = defaultdict(
+        lambda: {
+            "touchpoints": 0,
+            "conversions": 0,
+            "revenue": Decimal(0),
+            "attributed_revenue": Decimal(0),
+        }
+    )
+
+    lookups = {f"rollup_{param}": utm_lookup(param) for param in ROLLUP_DIMENSIONS}
+    for *key, count in (
+        Touchpoint.objects.filter(**in_day)
+        .order_by()
+        .values_list(*lookups.values())
+        .annotate(count=Count("pk"))
+    ):
+        rows[_dimensions(key)]["touchpoints"] += count
+
+    model = import_string(attribution_settings.ROLLUP_MODEL)
+    attributed = (
+        model.apply(
+            Conversion.objects.valid().filter(**in_day), window_days, source_windows
+        )
+        .order_by()
+        .values_list("conversion_value", "attribution_data")
+    )
+    for value, data in attributed.iterator():
+        key = _dimensions((data or {}).get(param) for param in ROLLUP_DIMENSIONS)
+        rows[key]["conversions"] += 1
+        rows[key]["revenue"] += value or 0
+
+    credits = (
+        AttributionCredit.objects.filter(
+            model=_credit_model_name(),
+            conversion__is_active=True,
+            conversion__is_confirmed=True,
+            **{f"conversion__{lookup}": bound for lookup, bound in in_day.items()},
+        )
+        .order_by()
+        .values_list(*ROLLUP_DIMENSIONS)
+        .annotate(value=Sum("attributed_value"))
+    )
+    for *key, value in credits:
+        rows[_dimensions(key)]["attributed_revenue"] += value or 0
+
+    return rows
+
+
+def _dimensions(values: Iterable[Optional[str]]) -> Tuple[str, str, str]:
+    source, medium, campaign = (value or "" for value in values)
+    return source, medium, campaign
+
+
+def _credit_model_name() -> str:
+    if attribution_settings.ROLLUP_CREDIT_MODEL:
+        return attribution_settings.ROLLUP_CREDIT_MODEL
+    models = get_materialized_models()
+    return models[0].name if models else ""
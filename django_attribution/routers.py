@@ -0,0 +1,123 @@
+from typing import Optional
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .conf import attribution_settings
+from .sharding import current_shard, get_shards, is_sharded, shard_for_uuid
+
+__all__ = [
+    "AttributionRouter",
+    "get_identity_database",
+    "get_read_database",
+    "get_write_database",
+]
+
+ATTRIBUTION_APP_LABELS = {"django_attribution", "attribution_postgres_indexes"}
+
+
+def get_write_database() -> str:
+    """
+    Alias of the database attribution rows are written to.
+
+    Inside sharding.use_shard(), this is the selected shard.
+    """
+
+    return current_shard() or attribution_settings.DATABASE_ALIAS or DEFAULT_DB_ALIAS
+
+
+def get_read_database() -> str:
+    """
+    Alias analytic reads (attribution reports, admin listings) are sent to.
+
+    Falls back to the write database when no READ_DATABASE_ALIAS is set.
+    """
+
+    return (
+        current_shard()
+        or attribution_settings.READ_DATABASE_ALIAS
+        or get_write_database()
+    )
+
+
+def get_identity_database(identity_uuid) -> str:
+    """
+    Alias of the database holding the identity with the given UUID.
+    """
+
+    if is_sharded():
+        return shard_for_uuid(identity_uuid)
+    return get_write_database()
+
+
+class AttributionRouter:
+    """
+    Routes django_attribution models to the DATABASE_ALIAS database.
+
+    Regular reads and writes go to DATABASE_ALIAS, so request handling always
+    sees its own writes. Analytic reads opt in to READ_DATABASE_ALIAS
+    explicitly (see get_read_database()) since a replica may lag behind.
+
+    With SHARD_DATABASES set, an identity lives on the shard picked by a hash
+    of its UUID, and its touchpoints, conversions and derived rows live
+    next to it. Saving or reading through an instance (identity.touchpoints,
+    Touchpoint(identity=...).save()) follows that instance's shard; other
+    queries go to the shard selected with sharding.use_shard(), or to
+    DATABASE_ALIAS.
+
+    The attribution database (every shard, when sharded) must also contain
+    the tables of the user model and of contenttypes, which Identity and
+    Conversion have foreign keys to.
+
+    Usage:
+        DATABASE_ROUTERS = ["django_attribution.routers.AttributionRouter"]
+    """
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_model(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_model(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if (
+            obj1._meta.app_label in ATTRIBUTION_APP_LABELS
+            or obj2._meta.app_label in ATTRIBUTION_APP_LABELS
+        ):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label in ATTRIBUTION_APP_LABELS:
+            if is_sharded():
+                return db in get_shards()
+            return db == get_write_database()
+        return None
+
+    def _db_for_model(self, model, hints) -> Optional[str]:
+        if model._meta.app_label not in ATTRIBUTION_APP_LABELS:
+            return None
+
+        if is_sharded():
+            shard = self._shard_for_instance(hints.get("instance"))
+            if shard is not None:
+                return shard
+        return get_write_database()
+
+    def _shard_for_instance(self, instance) -> Optional[str]:
+        if instance is None:
+            return None
+        if instance._state.db is not None:
+            return instance._state.db
+
+        from .models import Identity
+
+        if isinstance(instance, Identity):
+            return shard_for_uuid(instance.uuid)
+
+        # Unsaved rows follow the identity, touchpoint or conversion they
+        # belong to
+        for field_name in ("identity", "touchpoint", "conversion"):
+            related = instance._state.fields_cache.get(field_name)
+            if related is not None:
+                return self._shard_for_instance(related)
+        return None
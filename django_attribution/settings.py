@@ -1,9 +1,4 @@
-TRACKING_PARAMETERS = [
-    "utm_source",
-    "utm_medium",
-    "utm_campaign",
-    "utm_term",
-    "utm_content",
+CLICK_ID_PARAMETERS = [
     "fbclid",
     "gclid",
     "msclkid",
@@ -13,6 +8,52 @@ TRACKING_PARAMETERS = [
     "igshid",
 ]
 
+TRACKING_PARAMETERS = [
+    "utm_source",
+    "utm_medium",
+    "utm_campaign",
+    "utm_term",
+    "utm_content",
+    *CLICK_ID_PARAMETERS,
+]
+
+SOCIAL_NETWORKS = (
+    "facebook|fb|instagram|ig|tiktok|linkedin|twitter|x|t|pinterest|reddit|"
+    "snapchat|youtube"
+)
+SEARCH_ENGINES = "google|bing|duckduckgo|yahoo|yandex|baidu|ecosia"
+
+# Evaluated in order, the first rule whose conditions all match wins. See
+# channels.py for the available conditions.
+CHANNEL_RULES = [
+    {
+        "channel": "paid_social",
+        "utm_medium": r"^(cpc|ppc|paid|paid[-_ ]?social|social[-_ ]?paid)$",
+        "utm_source": rf"^({SOCIAL_NETWORKS})(\.com)?$",
+    },
+    {"channel": "paid_social", "click_ids": ["ttclid", "li_fat_id", "twclid"]},
+    {"channel": "paid_search", "utm_medium": r"^(cpc|ppc|paid[-_ ]?search|sem)$"},
+    {"channel": "paid_search", "click_ids": ["gclid", "msclkid"]},
+    {"channel": "display", "utm_medium": r"^(display|banner|cpm|programmatic)$"},
+    {"channel": "affiliate", "utm_medium": r"^affiliates?$"},
+    {"channel": "email", "utm_medium": r"^(e[-_ ]?mail|newsletter)$"},
+    {"channel": "email", "utm_source": r"^(e[-_ ]?mail|newsletter)$"},
+    {"channel": "organic_social", "utm_medium": r"^social$"},
+    {"channel": "organic_social", "utm_source": rf"^({SOCIAL_NETWORKS})(\.com)?$"},
+    {"channel": "organic_social", "referrer_host": rf"(^|\.)({SOCIAL_NETWORKS})\.co"},
+    {"channel": "organic_social", "click_ids": ["fbclid", "igshid"]},
+    {"channel": "organic_search", "utm_medium": r"^organic$"},
+    {"channel": "organic_search", "referrer_host": rf"(^|\.)({SEARCH_ENGINES})\."},
+    {"channel": "referral", "utm_medium": r"^referral$"},
+    {
+        "channel": "direct",
+        "utm_source": r"^$",
+        "utm_medium": r"^$",
+        "referrer_host": r"^$",
+    },
+    {"channel": "referral", "referrer_host": r"."},
+]
+
 DEFAULTS = {
     "MAX_UTM_LENGTH": 200,
     # Bot Filtering Configuration
@@ -56,6 +97,56 @@ DEFAULTS = {
         "/admin/",
         "/api/",
     ],
+    # Store UTM values in the CampaignDimension table. Run the
+    # normalize_touchpoints command before enabling it: reports then ignore
+    # the UTM columns of touchpoints without a dimension
+    "NORMALIZE_UTM": False,
+    "DIMENSION_CACHE": "default",
+    # Store landing paths instead of full URLs, see landing_pages.py
+    "COMPACT_URLS": False,
+    # Channel grouping of touchpoints, see channels.py
+    "CHANNEL_RULES": CHANNEL_RULES,
+    "DEFAULT_CHANNEL": "other",
+    # Admin changelists use planner estimates above this many rows
+    "ESTIMATED_COUNT_THRESHOLD": 100_000,
+    # Admin list filter options, see facets.py
+    "FACET_CACHE": "default",
+    "FACET_CACHE_TIMEOUT": 60 * 10,
+    "FACET_MAX_OPTIONS": 50,
+    "FACET_WINDOW_DAYS": 30,
+    # Rows fetched per round trip by admin CSV exports, see exports.py
+    "EXPORT_CHUNK_SIZE": 2000,
+    # Admin dashboard over DailyRollup rows, see rollups.py
+    "ROLLUP_MODEL": "django_attribution.attribution_models.last_touch",
+    "ROLLUP_CREDIT_MODEL": None,
+    "DASHBOARD_CACHE": "default",
+    "DASHBOARD_CACHE_TIMEOUT": 60,
+    # Per-phase middleware timings, see instrumentation.py
+    "INSTRUMENTATION_SAMPLE_RATE": 0,
+    "INSTRUMENTATION_SINKS": [
+        "django_attribution.instrumentation.log_sink",
+        "django_attribution.metrics.metrics_sink",
+    ],
+    "INSTRUMENTATION_COUNT_QUERIES": True,
+    # Operational metrics, see metrics.py
+    "METRICS_MULTIPROCESS_DIR": None,
+    "METRICS_FLUSH_INTERVAL": 5,
+    "METRICS_TOKEN": None,
+    # Database aliases (None uses the default database), see routers.py
+    "DATABASE_ALIAS": None,
+    "READ_DATABASE_ALIAS": None,
+    # Hash-shard identities and their data across these aliases
+    "SHARD_DATABASES": [],
+    "SHARD_QUERY_WORKERS": None,
+    # Incremental re-attribution
+    "TRACK_CHANGES": False,
+    "MATERIALIZED_MODELS": [
+        "django_attribution.attribution_models.last_touch",
+    ],
+    # Data retention in days (None keeps rows forever)
+    "TOUCHPOINT_RETENTION_DAYS": None,
+    "CONVERSION_RETENTION_DAYS": None,
+    "IDENTITY_RETENTION_DAYS": None,
     # Attribution Cookie Configuration
     "COOKIE_NAME": "_dj_attr_id",
     "COOKIE_MAX_AGE": 60 * 60 * 24 * 90,  # 90 days
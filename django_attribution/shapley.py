@@ -0,0 +1,157 @@
+"""
+Monte Carlo estimation of Shapley values over bitmask-indexed coalitions.
+
+This module only depends on NumPy so that process pool workers can import
+it without configuring Django.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Optional, Tuple
+
+import numpy as np
+
+__all__ = [
+    "coalition_values",
+    "sample_marginals",
+    "estimate_shapley_values",
+]
+
+_worker_values: Optional[np.ndarray] = None
+
+
+def coalition_values(masks: np.ndarray, weights: np.ndarray, n_players: int):
+    """
+    Builds the characteristic function v(S) for every coalition S.
+
+    v(S) is the total weight of the observations whose player set is a subset
+    of S. Observations are given as bitmasks; the result is a flat array of
+    length 2 ** n_players indexed by coalition bitmask, computed with one
+    cumulative sum per player (a subset-sum / zeta transform).
+    """
+
+    values = np.bincount(masks, weights=weights, minlength=1 << n_players)
+    values = values.reshape((2,) * n_players)
+    for axis in range(n_players):
+        values = np.cumsum(values, axis=axis)
+    return values.reshape(-1)
+
+
+def sample_marginals(
+    values: np.ndarray, n_players: int, permutations: int, seed
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Samples random player orderings and sums the marginal contributions.
+
+    Returns:
+        Per-player sums and sums of squares of the sampled marginals
+    """
+
+    rng = np.random.default_rng(seed)
+    order = rng.permuted(
+        np.tile(np.arange(n_players, dtype=np.int64), (permutations, 1)), axis=1
+    )
+    bits = np.left_shift(np.int64(1), order)
+    joined = np.cumsum(bits, axis=1)
+    marginals = values[joined] - values[joined - bits]
+
+    contributions = np.empty_like(marginals)
+    np.put_along_axis(contributions, order, marginals, axis=1)
+    return contributions.sum(axis=0), np.square(contributions).sum(axis=0)
+
+
+def estimate_shapley_values(
+    values: np.ndarray,
+    n_players: int,
+    error_bound: float = 0.01,
+    confidence: float = 0.95,
+    batch_size: int = 2000,
+    max_permutations: int = 200_000,
+    processes: int = 1,
+    seed=None,
+) -> Tuple[np.ndarray, float]:
+    """
+    Estimates Shapley values by permutation sampling.
+
+    Sampling proceeds in rounds of `processes` batches (run in a process
+    pool when processes > 1) until the confidence interval half-width of
+    every estimate is within error_bound * v(all players), or
+    max_permutations orderings have been sampled.
+
+    Returns:
+        The estimates and the achieved half-width relative to v(all players)
+    """
+
+    total = values[-1]
+    if total <= 0:
+        return np.zeros(n_players), 0.0
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    seeds = np.random.SeedSequence(seed)
+    sums = np.zeros(n_players)
+    squares = np.zeros(n_players)
+    sampled = 0
+    relative_error = float("inf")
+
+    executor = (
+        ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(values,),
+        )
+        if processes > 1
+        else None
+    )
+
+    try:
+        while sampled < max_permutations:
+            sizes = []
+            remaining = max_permutations - sampled
+            for _ in range(max(processes, 1)):
+                size = min(batch_size, remaining)
+                if size <= 0:
+                    break
+                sizes.append(size)
+                remaining -= size
+
+            batch_seeds = seeds.spawn(len(sizes))
+            if executor is None:
+                results = [
+                    sample_marginals(values, n_players, size, batch_seed)
+                    for size, batch_seed in zip(sizes, batch_seeds)
+                ]
+            else:
+                results = list(
+                    executor.map(
+                        _sample_in_worker,
+                        [n_players] * len(sizes),
+                        sizes,
+                        batch_seeds,
+                    )
+                )
+
+            for batch_sums, batch_squares in results:
+                sums += batch_sums
+                squares += batch_squares
+            sampled += sum(sizes)
+
+            means = sums / sampled
+            variances = np.maximum(squares / sampled - np.square(means), 0)
+            relative_error = float(z * np.sqrt(variances / sampled).max() / total)
+            if relative_error <= error_bound:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return sums / sampled, relative_error
+
+
+def _init_worker(values: np.ndarray) -> None:
+    global _worker_values
+    _worker_values = values
+
+
+def _sample_in_worker(n_players: int, permutations: int, seed):
+    assert _worker_values is not None
+    return sample_marginals(_worker_values, n_players, permutations, seed)
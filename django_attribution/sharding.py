@@ -0,0 +1,214 @@
+import hashlib
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+from django.db import connections
+
+from .conf import attribution_settings
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "attribute_across_shards",
+    "current_shard",
+    "each_shard",
+    "fan_out",
+    "get_shards",
+    "is_sharded",
+    "merge_histograms",
+    "merge_path_stats",
+    "shard_for_uuid",
+    "use_shard",
+]
+
+_current_shard: ContextVar[Optional[str]] = ContextVar(
+    "django_attribution_shard", default=None
+)
+
+
+def get_shards() -> List[str]:
+    return list(attribution_settings.SHARD_DATABASES)
+
+
+def is_sharded() -> bool:
+    return bool(attribution_settings.SHARD_DATABASES)
+
+
+def shard_for_uuid(value: Union[str, uuid.UUID]) -> str:
+    """
+    Shard alias an identity UUID (e.g. the attribution cookie) lives on.
+
+    Uses a stable hash of the UUID bytes, so the mapping does not depend on
+    the process or on how the UUID was generated. Changing SHARD_DATABASES
+    moves identities to other shards and requires rebalancing existing data.
+    """
+
+    shards = get_shards()
+    if not isinstance(value, uuid.UUID):
+        value = uuid.UUID(str(value))
+    digest = hashlib.blake2b(value.bytes, digest_size=8).digest()
+    return shards[int.from_bytes(digest, "big") % len(shards)]
+
+
+def current_shard() -> Optional[str]:
+    return _current_shard.get()
+
+
+@contextmanager
+def use_shard(alias: str) -> Iterator[None]:
+    """
+    Routes queries that cannot be tied to an identity to the given shard.
+
+    Inside the block, attribution querysets without an explicit using() and
+    transactions opened by the package run against alias, e.g. to run a
+    maintenance task on every shard in turn.
+    """
+
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def each_shard() -> Iterator[Optional[str]]:
+    """
+    Yields every shard alias with use_shard() active for the loop body, or
+    None once when sharding is disabled.
+    """
+
+    if not is_sharded():
+        yield None
+        return
+
+    for alias in get_shards():
+        with use_shard(alias):
+            yield alias
+
+
+def fan_out(
+    func: Callable[[str], Any], shards: Optional[Sequence[str]] = None
+) -> List[Any]:
+    """
+    Calls func(alias) for every shard in parallel threads.
+
+    Each call runs inside use_shard(alias) on its own connection, which is
+    closed when the call returns. SHARD_QUERY_WORKERS caps the number of
+    threads; with 1, shards are queried one after the other in the calling
+    thread.
+
+    Returns:
+        The results, in shard order
+    """
+
+    shards = list(shards if shards is not None else get_shards())
+    workers = attribution_settings.SHARD_QUERY_WORKERS or len(shards)
+
+    if workers <= 1 or len(shards) <= 1:
+        results = []
+        for alias in shards:
+            with use_shard(alias):
+                results.append(func(alias))
+        return results
+
+    def call(alias: str) -> Any:
+        try:
+            with use_shard(alias):
+                return func(alias)
+        finally:
+            connections[alias].close()
+
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="attribution-shard"
+    ) as executor:
+        return list(executor.map(call, shards))
+
+
+def merge_path_stats(results: List[list], limit: int, shard_limit: int) -> list:
+    """
+    Combines the top_paths() results of several shards.
+
+    Counts and values of the same path are summed. When a shard returned a
+    full list of shard_limit paths, a path missing from it may still have
+    happened there up to the shard's smallest reported count, which is added
+    to the path's error bound.
+    """
+
+    from .paths import PathStat
+
+    totals: Dict[tuple, tuple] = {}
+    reported_by: Dict[tuple, set] = {}
+    for index, stats in enumerate(results):
+        for stat in stats:
+            conversions, value, error = totals.get(stat.path, (0, Decimal(0), 0))
+            totals[stat.path] = (
+                conversions + stat.conversions,
+                value + stat.value,
+                error + stat.error,
+            )
+            reported_by.setdefault(stat.path, set()).add(index)
+
+    merged = []
+    for path, (conversions, value, error) in totals.items():
+        for index, stats in enumerate(results):
+            if index not in reported_by[path] and len(stats) >= shard_limit:
+                error += stats[-1].conversions
+        merged.append(PathStat(path, conversions, value, error))
+
+    merged.sort(key=lambda stat: stat.conversions, reverse=True)
+    return merged[:limit]
+
+
+def merge_histograms(results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Combines the lag_histogram() / touches_histogram() rows of several shards.
+    """
+
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for rows in results:
+        for row in rows:
+            key = (row["group"], row["bucket"])
+            if key not in merged:
+                merged[key] = dict(row)
+                continue
+            total = merged[key]
+            total["conversions"] += row["conversions"]
+            if row["value"] is not None:
+                total["value"] = (total["value"] or 0) + row["value"]
+
+    return [
+        merged[key] for key in sorted(merged, key=lambda key: (key[0] or "", key[1]))
+    ]
+
+
+def attribute_across_shards(
+    conversions_qs,
+    model=None,
+    window_days: int = 30,
+    source_windows: Optional[Dict[str, int]] = None,
+) -> list:
+    """
+    Evaluates conversions_qs.with_attribution() on every shard.
+
+    Returns:
+        The attributed conversions of all shards, newest first
+    """
+
+    conversions = [
+        conversion
+        for shard_conversions in fan_out(
+            lambda alias: list(
+                conversions_qs.using(alias).with_attribution(
+                    model, window_days=window_days, source_windows=source_windows
+                )
+            )
+        )
+        for conversion in shard_conversions
+    ]
+    conversions.sort(key=lambda conversion: conversion.created_at, reverse=True)
+    return conversions
@@ -0,0 +1,280 @@
+import logging
+import math
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.utils import timezone
+
+from .channels import classify_channel
+from .conf import attribution_settings
+from .dimensions import UTM_PARAMETERS, intern_campaign_dimension
+from .landing_pages import url_fields
+from .models import Conversion, Identity, Touchpoint
+from .routers import get_write_database
+from .sharding import is_sharded, shard_for_uuid
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "DEFAULT_SOURCE_MIX",
+    "SyntheticDataGenerator",
+]
+
+# Relative weights of "source/medium" pairs drawn for touchpoints
+DEFAULT_SOURCE_MIX = {
+    "google/cpc": 30,
+    "google/organic": 20,
+    "facebook/paid_social": 15,
+    "newsletter/email": 10,
+    "bing/cpc": 5,
+    "instagram/social": 10,
+    "partner/referral": 10,
+}
+
+CAMPAIGNS_PER_SOURCE = 5
+LANDING_PAGES = 50
+CONVERSION_DELAY = timedelta(days=7)
+VALUE_SIGMA = 0.8
+
+
+class SyntheticDataGenerator:
+    """
+    Bulk-generates realistic identities, touchpoints and conversions.
+
+    Every random draw comes from one generator seeded with seed, and all
+    timestamps are offsets from until, so the same arguments produce the
+    same rows (uuids included) on any database.
+
+    - Touches per identity follow a geometric distribution with mean
+      touches_per_identity, spread between the identity creation and until.
+    - Sources and mediums are drawn from source_mix ("source/medium" to
+      weight). Each pair has CAMPAIGNS_PER_SOURCE campaigns.
+    - conversion_rate of the canonical identities convert once, within
+      CONVERSION_DELAY of their last touch, with log-normal values averaging
+      mean_value.
+    - merge_rate of the identities are created merged into the previous
+      canonical identity, as after a login. Their touches, between their
+      creation and a merge moment drawn before until, belong to the
+      canonical identity, as reconciliation moves them there; merged
+      identities hold no rows of their own. The canonical identity is
+      linked to a new user, as are the identities merged into it.
+    - Identities are created uniformly over the days before until.
+
+    Rows are written with bulk_create, batch_size identities (and their
+    touchpoints and conversions) per transaction. With sharding, each
+    identity lands on the shard of its uuid and merged identities on the
+    shard of their canonical identity. Touchpoints follow NORMALIZE_UTM and
+    COMPACT_URLS and get a channel, as with the middleware.
+    """
+
+    def __init__(
+        self,
+        touches_per_identity: float = 3.0,
+        source_mix: Optional[Mapping[str, float]] = None,
+        conversion_rate: float = 0.05,
+        merge_rate: float = 0.1,
+        days: int = 90,
+        until: Optional[datetime] = None,
+        mean_value: float = 50.0,
+        seed: int = 0,
+        batch_size: int = 1000,
+    ):
+        if touches_per_identity < 1:
+            raise ValueError("touches_per_identity must be at least 1")
+        if not 0 <= conversion_rate <= 1 or not 0 <= merge_rate < 1:
+            raise ValueError("conversion_rate and merge_rate must be rates")
+
+        mix = dict(source_mix or DEFAULT_SOURCE_MIX)
+        self.sources = [tuple(pair.partition("/")[::2]) for pair in mix]
+        self.weights = list(mix.values())
+        self.touches_per_identity = touches_per_identity
+        self.conversion_rate = conversion_rate
+        self.merge_rate = merge_rate
+        self.span = timedelta(days=days)
+        self.until = until or timezone.now().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        # Log-normal with the requested mean
+        self.value_mu = math.log(mean_value) - VALUE_SIGMA**2 / 2
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+
+    def generate(self, identities: int) -> Dict[str, int]:
+        """
+        Writes identities identities and their activity.
+
+        Returns:
+            Number of rows written per model
+        """
+
+        totals = {"identities": 0, "users": 0, "touchpoints": 0, "conversions": 0}
+        remaining = identities
+        while remaining > 0:
+            size = min(self.batch_size, remaining)
+            for key, count in self._generate_batch(size).items():
+                totals[key] += count
+            remaining -= size
+            logger.info(f"Generated {identities - remaining}/{identities} identities")
+        return totals
+
+    def _generate_batch(self, size: int) -> Dict[str, int]:
+        rng = self.rng
+        # Canonical identities with the identities merged into them
+        families: List[Tuple[Identity, List[Identity]]] = []
+        for _ in range(size):
+            identity = Identity(
+                uuid=uuid.UUID(int=rng.getrandbits(128), version=4),
+                created_at=self.until - self.span * rng.random(),
+            )
+            if families and rng.random() < self.merge_rate:
+                families[-1][1].append(identity)
+            else:
+                families.append((identity, []))
+
+        users = self._link_users(families)
+
+        by_alias: Dict[str, List[Tuple[Identity, List[Identity]]]] = defaultdict(list)
+        for family in families:
+            by_alias[self._alias(family[0])].append(family)
+
+        counts = {
+            "identities": size,
+            "users": users,
+            "touchpoints": 0,
+            "conversions": 0,
+        }
+        for alias, group in by_alias.items():
+            with transaction.atomic(using=alias):
+                Identity.objects.using(alias).bulk_create(
+                    [identity for identity, _ in group]
+                )
+                merged = []
+                for identity, merged_identities in group:
+                    for merged_identity in merged_identities:
+                        merged_identity.merged_into = identity
+                        merged_identity.linked_user_id = identity.linked_user_id
+                        merged.append(merged_identity)
+                Identity.objects.using(alias).bulk_create(merged)
+
+                touchpoints, conversions = [], []
+                for identity, merged_identities in group:
+                    touches = self._touchpoints(identity, alias)
+                    for merged_identity in merged_identities:
+                        # Touches made before the login, moved on merge
+                        since = merged_identity.created_at
+                        merged_at = since + (self.until - since) * rng.random()
+                        touches += self._touchpoints(
+                            identity, alias, since=since, until=merged_at
+                        )
+                    touchpoints.extend(touches)
+                    if rng.random() < self.conversion_rate:
+                        last_touch = max(touches, key=lambda touch: touch.created_at)
+                        conversions.append(self._conversion(identity, last_touch))
+
+                Touchpoint.objects.using(alias).bulk_create(
+                    touchpoints, batch_size=self.batch_size
+                )
+                Conversion.objects.using(alias).bulk_create(
+                    conversions, batch_size=self.batch_size
+                )
+            counts["touchpoints"] += len(touchpoints)
+            counts["conversions"] += len(conversions)
+        return counts
+
+    def _link_users(self, families: List[Tuple[Identity, List[Identity]]]) -> int:
+        # Merges happen on login: the canonical identity belongs to a user
+        User = get_user_model()
+        linked = [identity for identity, merged in families if merged]
+        users = [
+            User(**{User.USERNAME_FIELD: f"synthetic-{identity.uuid.hex}"})
+            for identity in linked
+        ]
+        with transaction.atomic(using=router.db_for_write(User)):
+            User.objects.bulk_create(users, batch_size=self.batch_size)
+        for identity, user in zip(linked, users):
+            identity.linked_user = user
+        return len(users)
+
+    def _alias(self, identity: Identity) -> str:
+        if is_sharded():
+            return shard_for_uuid(identity.uuid)
+        return get_write_database()
+
+    def _touch_count(self) -> int:
+        # Geometric on {1, 2, ...} with the requested mean
+        p = 1 / self.touches_per_identity
+        if p >= 1:
+            return 1
+        return 1 + int(math.log(1 - self.rng.random()) / math.log(1 - p))
+
+    def _touchpoints(
+        self,
+        identity: Identity,
+        alias: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Touchpoint]:
+        rng = self.rng
+        since = since or identity.created_at
+        window = (until or self.until) - since
+        moments = sorted(
+            [since]
+            + [since + window * rng.random() for _ in range(self._touch_count() - 1)]
+        )
+
+        touchpoints = []
+        for moment in moments:
+            source, medium = rng.choices(self.sources, self.weights)[0]
+            values = {
+                "utm_source": source,
+                "utm_medium": medium,
+                "utm_campaign": f"{source}_{rng.randrange(CAMPAIGNS_PER_SOURCE)}",
+            }
+            query = "&".join(f"{param}={value}" for param, value in values.items())
+            visit_fields = url_fields(
+                f"https://example.com/landing/{rng.randrange(LANDING_PAGES)}?{query}",
+                "",
+            )
+            utm_fields: Dict[str, Any]
+            if attribution_settings.NORMALIZE_UTM:
+                utm_fields = {
+                    "campaign_dimension_id": intern_campaign_dimension(
+                        values, using=alias
+                    )
+                }
+            else:
+                utm_fields = {param: values.get(param, "") for param in UTM_PARAMETERS}
+
+            touchpoints.append(
+                Touchpoint(
+                    uuid=uuid.UUID(int=rng.getrandbits(128), version=4),
+                    identity=identity,
+                    created_at=moment,
+                    channel=classify_channel(
+                        values, str(visit_fields["referrer_host"] or "")
+                    ),
+                    **visit_fields,
+                    **utm_fields,
+                )
+            )
+        return touchpoints
+
+    def _conversion(self, identity: Identity, last_touch: Touchpoint) -> Conversion:
+        rng = self.rng
+        delay = min(CONVERSION_DELAY, self.until - last_touch.created_at)
+        value = rng.lognormvariate(self.value_mu, VALUE_SIGMA)
+        return Conversion(
+            uuid=uuid.UUID(int=rng.getrandbits(128), version=4),
+            identity=identity,
+            event="purchase",
+            created_at=last_touch.created_at
+            + timedelta(seconds=1)
+            + delay * rng.random(),
+            conversion_value=Decimal(f"{value:.2f}"),
+        )
@@ -0,0 +1,76 @@
+import logging
+import re
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "QueryBudgetExceeded",
+    "assert_query_budget",
+    "query_budget",
+]
+
+SAVEPOINT_PATTERN = re.compile(r"\s*(RELEASE |ROLLBACK TO )?SAVEPOINT\b", re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block runs more queries than its budget."""
+
+    def __init__(self, budget: int, queries: List[str]):
+        self.budget = budget
+        self.queries = queries
+        listing = "\n".join(
+            f"{index}. {sql}" for index, sql in enumerate(queries, start=1)
+        )
+        super().__init__(
+            f"{len(queries)} queries executed, the budget is {budget}:\n{listing}"
+        )
+
+
+@contextmanager
+def query_budget(
+    budget: int, using: Optional[Iterable[str]] = None
+) -> Iterator[List[str]]:
+    """
+    Fails when the block runs more than budget queries.
+
+    Queries are counted on every database alias (or only those in using),
+    so shard and replica traffic is included, and DEBUG does not need to be
+    on. Savepoint statements are not counted: tests run inside a
+    transaction where atomic() blocks issue them, while in production the
+    same blocks usually open a transaction without any query. The list
+    yielded collects the SQL of each counted query as it runs. If the block
+    raises, its exception is propagated unchanged.
+
+    Usage:
+        with query_budget(1):
+            middleware(request)
+
+    Raises:
+        QueryBudgetExceeded: With the SQL of every query that ran
+    """
+
+    queries: List[str] = []
+
+    def record(execute, sql, params, many, context):
+        if not SAVEPOINT_PATTERN.match(sql):
+            queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for alias in using if using is not None else connections:
+            stack.enter_context(connections[alias].execute_wrapper(record))
+        yield queries
+
+    if len(queries) > budget:
+        raise QueryBudgetExceeded(budget, queries)
+
+
+def assert_query_budget(budget: int, func: Callable, *args, **kwargs):
+    """Calls func(*args, **kwargs) within query_budget(budget), returns its result."""
+
+    with query_budget(budget):
+        return func(*args, **kwargs)
@@ -8,6 +8,7 @@ __all__ = [
 ]
 
 if TYPE_CHECKING:
+    from .instrumentation import RequestProfile
     from .models import Identity
     from .trackers import CookieIdentityTracker
 
@@ -15,4 +16,5 @@ if TYPE_CHECKING:
 class AttributionHttpRequest(HttpRequest):
     identity_tracker: "CookieIdentityTracker"
     identity: Optional["Identity"]
+    attribution_profile: Optional["RequestProfile"]
     _allowed_conversion_events: Optional[Set[str]]
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import metrics_view
+
+urlpatterns = [
+    path("metrics/", metrics_view, name="attribution-metrics"),
+]
@@ -0,0 +1,44 @@
+import hmac
+import logging
+
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from .conf import attribution_settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "metrics_view",
+]
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@require_GET
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Renders the package metrics in Prometheus text format.
+
+    Only staff users, or a scraper sending METRICS_TOKEN as a bearer token
+    ("Authorization: Bearer <token>"), are allowed.
+    """
+
+    if not _has_metrics_token(request) and not _is_staff(request):
+        return HttpResponseForbidden()
+
+    return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def _has_metrics_token(request: HttpRequest) -> bool:
+    token = attribution_settings.METRICS_TOKEN
+    if not token:
+        return False
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    return hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
+
+
+def _is_staff(request: HttpRequest) -> bool:
+    user = getattr(request, "user", None)
+    return bool(user and user.is_active and user.is_staff)
@@ -0,0 +1,330 @@
+import csv
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.contrib import admin
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch
+from django.utils import timezone
+
+from django_attribution.admin import (
+    ConversionAdmin,
+    IdentityAdmin,
+    TouchpointAdmin,
+    TouchpointInline,
+)
+from django_attribution.conf import attribution_settings
+from django_attribution.dimensions import (
+    clear_dimension_cache,
+    intern_campaign_dimension,
+)
+from django_attribution.facets import _cache_key, get_facet_values
+from django_attribution.models import Conversion, Identity, Touchpoint
+from django_attribution.paginators import EstimatedCountPaginator
+
+
+def _changelist_instance(admin_class, model, **params):
+    name = model._meta.model_name
+    request = RequestFactory().get(f"/admin/django_attribution/{name}/", params)
+    request.user, _ = get_user_model().objects.get_or_create(
+        username="admin", is_staff=True, is_superuser=True
+    )
+    request.resolver_match = ResolverMatch(
+        lambda: None, (), {}, url_name=f"django_attribution_{name}_changelist"
+    )
+    return admin_class(model, admin.site).get_changelist_instance(request)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    clear_dimension_cache()
+    yield
+    cache.clear()
+    clear_dimension_cache()
+
+
+@pytest.fixture
+def changelist(identity):
+    def _changelist(**params):
+        return _changelist_instance(ConversionAdmin, Conversion, **params)
+
+    Conversion.objects.create(identity=identity, event="purchase")
+    return _changelist
+
+
+@pytest.mark.django_db
+def test_paginator_counts_small_tables_exactly(identity):
+    Conversion.objects.create(identity=identity, event="purchase")
+
+    paginator = EstimatedCountPaginator(Conversion.objects.all(), 10)
+
+    assert paginator.count == 1
+    assert not paginator.is_estimated
+
+
+@pytest.mark.django_db
+def test_paginator_uses_estimate_above_threshold():
+    with patch(
+        "django_attribution.paginators.estimate_count", return_value=2_000_000
+    ), CaptureQueriesContext(connection) as queries:
+        paginator = EstimatedCountPaginator(Conversion.objects.all(), 100)
+
+        assert paginator.count == 2_000_000
+        assert paginator.num_pages == 20_000
+        assert paginator.is_estimated
+
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_paginator_clamps_pages_past_an_overestimate(identity):
+    Conversion.objects.create(identity=identity, event="purchase")
+
+    with patch("django_attribution.paginators.estimate_count", return_value=2_000_000):
+        paginator = EstimatedCountPaginator(Conversion.objects.all(), 100)
+        page = paginator.page(5)
+
+    assert page.number == 1
+    assert len(page.object_list) == 1
+    assert paginator.count == 1
+    assert paginator.num_pages == 1
+    assert not paginator.is_estimated
+
+
+@pytest.mark.django_db
+def test_changelist_skips_full_count(changelist):
+    cl = changelist(event="purchase")
+
+    assert cl.result_count == 1
+    assert cl.full_result_count is None
+
+
+@pytest.mark.django_db
+def test_date_hierarchy_offers_calendar_without_queries(changelist):
+    today = timezone.localdate()
+    cl = changelist()
+
+    with CaptureQueriesContext(connection) as queries:
+        hierarchy = date_hierarchy(cl)
+    assert hierarchy is not None
+    years = hierarchy["choices"]
+    assert [choice["title"] for choice in years][-1] == str(today.year)
+    assert len(years) == 5
+
+    cl = changelist(created_at__year=today.year, created_at__month=today.month)
+    with CaptureQueriesContext(connection) as more_queries:
+        hierarchy = date_hierarchy(cl)
+    assert hierarchy is not None
+    days = hierarchy["choices"]
+    assert len(days) == today.day
+
+    assert len(queries) + len(more_queries) == 0
+
+
+@pytest.mark.django_db
+def test_activity_summary_is_a_single_query(identity):
+    for _ in range(3):
+        Touchpoint.objects.create(identity=identity, url="https://site.com/")
+    Conversion.objects.create(identity=identity, event="signup", conversion_value=5)
+    Conversion.objects.create(
+        identity=identity, event="purchase", conversion_value=7, is_confirmed=False
+    )
+    model_admin = IdentityAdmin(Identity, admin.site)
+
+    with CaptureQueriesContext(connection) as queries:
+        summary = str(model_admin.activity_summary(identity))
+
+    assert len(queries) == 1
+    assert "3 touchpoints" in summary
+    assert "2 conversions, valid value 5" in summary
+    assert (
+        f"/admin/django_attribution/touchpoint/?identity__id__exact={identity.pk}"
+        in summary
+    )
+
+
+@pytest.mark.django_db
+def test_inline_shows_most_recent_rows_only(identity):
+    touchpoints = [
+        Touchpoint.objects.create(identity=identity, url=f"https://site.com/{i}")
+        for i in range(5)
+    ]
+    inline = TouchpointInline(Identity, admin.site)
+    inline.max_rows = 2
+    request = RequestFactory().get("/")
+    request.user = get_user_model().objects.create_superuser(username="admin")
+
+    formset = inline.get_formset(request, identity)(instance=identity)
+
+    assert [form.instance for form in formset.forms] == touchpoints[:-3:-1]
+
+
+@pytest.mark.django_db
+def test_facet_values_are_recent_capped_and_cached(identity):
+    now = timezone.now()
+    for event, times in (("purchase", 3), ("signup", 2), ("refund", 1)):
+        for _ in range(times):
+            Conversion.objects.create(identity=identity, event=event)
+    for _ in range(5):
+        Conversion.objects.create(
+            identity=identity, event="legacy", created_at=now - timedelta(days=60)
+        )
+
+    with patch.object(attribution_settings, "FACET_MAX_OPTIONS", 2):
+        assert get_facet_values(Conversion, "event") == ["purchase", "signup"]
+
+    Conversion.objects.create(identity=identity, event="trial")
+    with CaptureQueriesContext(connection) as queries:
+        assert get_facet_values(Conversion, "event") == ["purchase", "signup"]
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_stale_facet_values_are_served_while_another_request_refreshes(identity):
+    Conversion.objects.create(identity=identity, event="purchase")
+    assert get_facet_values(Conversion, "event") == ["purchase"]
+    Conversion.objects.create(identity=identity, event="signup")
+    key = _cache_key(Conversion, "event", "default")
+    cache.add(f"{key}:lock", True)
+
+    with patch.object(attribution_settings, "FACET_CACHE_TIMEOUT", 0):
+        with CaptureQueriesContext(connection) as queries:
+            assert get_facet_values(Conversion, "event") == ["purchase"]
+        assert len(queries) == 0
+
+        cache.delete(f"{key}:lock")
+        assert get_facet_values(Conversion, "event") == ["purchase", "signup"]
+
+
+@pytest.mark.django_db
+def test_refresh_facets_command_caches_every_admin_filter(identity):
+    Conversion.objects.create(identity=identity, event="purchase", currency="EUR")
+    out = StringIO()
+
+    call_command("refresh_facets", stdout=out)
+
+    assert "Cached 1 django_attribution.conversion.event options." in out.getvalue()
+    with CaptureQueriesContext(connection) as queries:
+        assert get_facet_values(Conversion, "currency") == ["EUR"]
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_cached_filter_follows_normalized_utm_values(identity):
+    with patch.object(attribution_settings, "NORMALIZE_UTM", True):
+        for source in ("google", "bing"):
+            Touchpoint.objects.create(
+                identity=identity,
+                url="https://site.com/",
+                campaign_dimension_id=intern_campaign_dimension({"utm_source": source}),
+            )
+
+        cl = _changelist_instance(TouchpointAdmin, Touchpoint, utm_source="google")
+        source_filter = cl.filter_specs[0]
+        choices = list(source_filter.choices(cl))
+
+    assert list(source_filter.lookup_choices) == ["bing", "google"]
+    assert [(choice["display"], choice["selected"]) for choice in choices] == [
+        ("All", False),
+        ("bing", False),
+        ("google", True),
+    ]
+    assert [touchpoint.get_utm("utm_source") for touchpoint in cl.result_list] == [
+        "google"
+    ]
+
+
+def _export(admin_class, model, **params):
+    request = RequestFactory().get(f"/admin/django_attribution/{model}/export/", params)
+    request.user, _ = get_user_model().objects.get_or_create(
+        username="admin", is_staff=True, is_superuser=True
+    )
+    model_class = Conversion if model == "conversion" else Touchpoint
+    response = admin_class(model_class, admin.site).export_view(request)
+    return list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+
+
+@pytest.mark.django_db
+def test_export_streams_filtered_conversions_with_attribution(identity):
+    Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        utm_source="google",
+        utm_medium="cpc",
+        created_at=timezone.now() - timedelta(hours=1),
+    )
+    Conversion.objects.create(identity=identity, event="purchase", conversion_value=9)
+    Conversion.objects.create(identity=identity, event="signup")
+
+    rows = _export(ConversionAdmin, "conversion", event="purchase", _attribution="1")
+
+    header, row = rows
+    assert header[:3] == ["uuid", "identity__uuid", "event"]
+    record = dict(zip(header, row))
+    assert record["event"] == "purchase"
+    assert record["conversion_value"] == "9.00"
+    assert record["attributed_utm_source"] == "google"
+    assert record["attributed_utm_medium"] == "cpc"
+
+
+@pytest.mark.django_db
+def test_export_view_runs_only_the_export_query(identity):
+    Conversion.objects.create(identity=identity, event="purchase")
+    request = RequestFactory().get(
+        "/admin/django_attribution/conversion/export/", {"event": "purchase"}
+    )
+    request.user = get_user_model().objects.create_superuser(username="admin")
+
+    with CaptureQueriesContext(connection) as queries:
+        response = ConversionAdmin(Conversion, admin.site).export_view(request)
+        content = b"".join(response.streaming_content).decode()
+
+    assert len(content.splitlines()) == 2
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_export_escapes_spreadsheet_formulas(identity):
+    Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        utm_source='=HYPERLINK("https://evil.example","click")',
+        utm_medium="-cpc",
+    )
+
+    header, row = _export(TouchpointAdmin, "touchpoint")
+
+    record = dict(zip(header, row))
+    assert record["utm_source"] == '\'=HYPERLINK("https://evil.example","click")'
+    assert record["utm_medium"] == "'-cpc"
+    assert record["url"] == "https://site.com/"
+
+
+@pytest.mark.django_db
+def test_export_action_streams_selected_touchpoints(identity):
+    with patch.object(attribution_settings, "NORMALIZE_UTM", True):
+        touchpoint = Touchpoint.objects.create(
+            identity=identity,
+            url="https://site.com/",
+            campaign_dimension_id=intern_campaign_dimension({"utm_source": "bing"}),
+        )
+        model_admin = TouchpointAdmin(Touchpoint, admin.site)
+
+        response = model_admin.export_csv(None, Touchpoint.objects.all())
+        content = b"".join(response.streaming_content).decode()
+
+    assert isinstance(response, StreamingHttpResponse)
+    assert "touchpoints-" in response["Content-Disposition"]
+    header, row = csv.reader(content.splitlines())
+    assert dict(zip(header, row))["utm_source"] == "bing"
+    assert dict(zip(header, row))["uuid"] == str(touchpoint.uuid)
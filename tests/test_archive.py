@@ -0,0 +1,132 @@
+import gzip
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from django_attribution.archive import ArchiveError, archive_before, restore_archive
+from django_attribution.conf import attribution_settings
+from django_attribution.models import (
+    AttributionChange,
+    ClickIdentifier,
+    Conversion,
+    Identity,
+    Touchpoint,
+)
+
+
+@pytest.fixture
+def now():
+    return timezone.now()
+
+
+@pytest.fixture
+def old_data(now):
+    identity = Identity.objects.create()
+    Identity.objects.filter(pk=identity.pk).update(created_at=now - timedelta(days=40))
+    for days in (40, 39):
+        touchpoint = Touchpoint.objects.create(
+            identity=identity,
+            url="https://site.com/",
+            utm_source="google",
+            created_at=now - timedelta(days=days),
+        )
+    ClickIdentifier.objects.create(
+        touchpoint=touchpoint, platform=ClickIdentifier.Platform.GCLID, value="g1"
+    )
+    Conversion.objects.create(
+        identity=identity,
+        event="purchase",
+        conversion_value="12.50",
+        custom_data={"order": 7},
+        created_at=now - timedelta(days=38),
+    )
+    return identity
+
+
+@pytest.mark.django_db
+def test_archive_writes_sharded_files_and_deletes_archived_rows(
+    tmp_path, now, old_data
+):
+    recent = Touchpoint.objects.create(identity=old_data, url="https://site.com/")
+
+    manifest = archive_before(now - timedelta(days=30), tmp_path)
+
+    assert manifest["counts"] == {
+        "identities": 1,
+        "touchpoints": 2,
+        "click_identifiers": 1,
+        "conversions": 1,
+    }
+    touchpoint_files = sorted(
+        entry["path"] for entry in manifest["files"] if entry["kind"] == "touchpoints"
+    )
+    assert len(touchpoint_files) == 2
+    with gzip.open(tmp_path / touchpoint_files[0], "rt") as handle:
+        assert json.loads(handle.readline())["utm_source"] == "google"
+    assert json.loads((tmp_path / "manifest.json").read_text()) == manifest
+
+    assert list(Touchpoint.objects.all()) == [recent]
+    assert not Conversion.objects.exists()
+    assert not ClickIdentifier.objects.exists()
+    # Still referenced by the recent touchpoint
+    assert Identity.objects.filter(pk=old_data.pk).exists()
+
+
+@pytest.mark.django_db
+def test_archive_refuses_existing_archive(tmp_path, now):
+    archive_before(now, tmp_path, delete=False)
+
+    with pytest.raises(ArchiveError):
+        archive_before(now, tmp_path)
+
+
+@pytest.mark.django_db
+def test_restore_loads_archive_and_logs_changes(tmp_path, now, old_data):
+    archive_before(now - timedelta(days=30), tmp_path)
+    Identity.objects.all().delete()
+
+    with patch.object(attribution_settings, "TRACK_CHANGES", True):
+        counts = restore_archive(tmp_path)
+
+    assert counts["touchpoints"] == 2
+    conversion = Conversion.objects.get()
+    assert conversion.identity_id == old_data.pk
+    assert str(conversion.conversion_value) == "12.50"
+    assert conversion.custom_data == {"order": 7}
+    assert Touchpoint.objects.with_click_id("g1").count() == 1
+    assert set(AttributionChange.objects.values_list("kind", flat=True)) == {
+        AttributionChange.Kind.TOUCHPOINTS_ADDED,
+        AttributionChange.Kind.CONVERSION_RECORDED,
+    }
+
+
+@pytest.mark.django_db
+def test_restore_rejects_tampered_archive(tmp_path, now, old_data):
+    manifest = archive_before(now - timedelta(days=30), tmp_path, delete=False)
+    path = tmp_path / manifest["files"][0]["path"]
+    path.write_bytes(gzip.compress(b"{}\n"))
+
+    with pytest.raises(ArchiveError, match="Checksum mismatch"):
+        restore_archive(tmp_path)
+
+
+@pytest.mark.django_db
+def test_archive_command_keep_leaves_rows(tmp_path, now, old_data):
+    out = StringIO()
+    call_command(
+        "archive_attribution_data",
+        "--before",
+        (now - timedelta(days=30)).date().isoformat(),
+        "--output",
+        str(tmp_path),
+        "--keep",
+        stdout=out,
+    )
+
+    assert "Archived 2 touchpoints." in out.getvalue()
+    assert Touchpoint.objects.count() == 2
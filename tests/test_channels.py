@@ -0,0 +1,104 @@
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+
+from django_attribution.channels import ChannelClassifier, classify_channel
+from django_attribution.conf import attribution_settings
+from django_attribution.models import ClickIdentifier, Conversion, Touchpoint
+
+
+@pytest.mark.parametrize(
+    "values, referrer_host, click_ids, channel",
+    [
+        ({"utm_source": "google", "utm_medium": "cpc"}, "", [], "paid_search"),
+        ({"utm_source": "facebook", "utm_medium": "cpc"}, "", [], "paid_social"),
+        ({"utm_source": "facebook"}, "", [], "organic_social"),
+        ({"utm_source": "newsletter", "utm_medium": "Email"}, "", [], "email"),
+        ({"utm_campaign": "spring"}, "www.google.com", [], "organic_search"),
+        ({"utm_campaign": "spring"}, "l.facebook.com", [], "organic_social"),
+        ({"utm_campaign": "spring"}, "blog.example.com", [], "referral"),
+        ({"utm_campaign": "spring"}, "", ["gclid"], "paid_search"),
+        ({}, "", [], "direct"),
+        ({"utm_source": "partner", "utm_medium": "podcast"}, "", [], "other"),
+    ],
+)
+def test_default_rules(values, referrer_host, click_ids, channel):
+    assert classify_channel(values, referrer_host, click_ids) == channel
+
+
+def test_custom_rules_are_compiled_from_settings():
+    rules = [{"channel": "podcast", "utm_medium": "^podcast$"}]
+
+    with patch.object(attribution_settings, "CHANNEL_RULES", rules):
+        assert classify_channel({"utm_medium": "Podcast"}) == "podcast"
+        assert classify_channel({"utm_medium": "cpc"}) == "other"
+
+
+def test_rules_changed_in_place_are_recompiled():
+    rules = [{"channel": "podcast", "utm_medium": "^podcast$"}]
+
+    with patch.object(attribution_settings, "CHANNEL_RULES", rules):
+        assert classify_channel({"utm_medium": "audio"}) == "other"
+        rules[0]["utm_medium"] = "^(podcast|audio)$"
+        assert classify_channel({"utm_medium": "audio"}) == "podcast"
+
+
+def test_invalid_rule_is_rejected():
+    with pytest.raises(ImproperlyConfigured):
+        ChannelClassifier([{"channel": "paid", "utm_mediums": "cpc"}], "other")
+
+
+@pytest.mark.django_db
+def test_middleware_stores_channel(attribution_middleware_with_utm, make_request):
+    request = make_request(
+        "/landing/", tracking_params={"utm_source": "google", "utm_medium": "cpc"}
+    )
+    request.user = AnonymousUser()
+
+    attribution_middleware_with_utm(request)
+
+    assert Touchpoint.objects.get().channel == "paid_search"
+
+
+@pytest.mark.django_db
+def test_classify_command_backfills_channels(identity):
+    pending = Touchpoint.objects.create(
+        identity=identity, url="https://site.com/", referrer="https://bing.com/"
+    )
+    clicked = Touchpoint.objects.create(identity=identity, url="https://site.com/")
+    ClickIdentifier.objects.create(
+        touchpoint=clicked, platform=ClickIdentifier.Platform.MSCLKID, value="ms1"
+    )
+    classified = Touchpoint.objects.create(
+        identity=identity, url="https://site.com/", channel="email"
+    )
+
+    call_command("classify_touchpoints", stdout=StringIO())
+
+    pending.refresh_from_db()
+    clicked.refresh_from_db()
+    classified.refresh_from_db()
+    assert pending.channel == "organic_search"
+    assert clicked.channel == "paid_search"
+    assert classified.channel == "email"
+
+    call_command("classify_touchpoints", "--all", stdout=StringIO())
+
+    classified.refresh_from_db()
+    assert classified.channel == "direct"
+
+
+@pytest.mark.django_db
+def test_histograms_group_by_channel(identity):
+    Touchpoint.objects.create(
+        identity=identity, url="https://site.com/", channel="paid_search"
+    )
+    Conversion.objects.create(identity=identity, event="purchase")
+
+    rows = Conversion.objects.touches_histogram(group_by="channel")
+
+    assert [(row["group"], row["conversions"]) for row in rows] == [("paid_search", 1)]
@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+from django_attribution.attribution_models import last_touch
+from django_attribution.models import (
+    ClickIdentifier,
+    Conversion,
+    Identity,
+    Touchpoint,
+)
+
+
+@pytest.mark.django_db
+def test_middleware_stores_only_present_click_ids(
+    attribution_middleware_with_utm, make_request
+):
+    request = make_request(
+        "/landing/",
+        tracking_params={"utm_source": "google", "gclid": "abc123"},
+    )
+    request.user = AnonymousUser()
+
+    attribution_middleware_with_utm(request)
+
+    touchpoint = Touchpoint.objects.get()
+    assert touchpoint.click_ids == {"gclid": "abc123"}
+    assert ClickIdentifier.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_middleware_skips_click_id_table_without_click_ids(
+    attribution_middleware_with_utm, make_request
+):
+    request = make_request("/landing/", tracking_params={"utm_source": "google"})
+    request.user = AnonymousUser()
+
+    attribution_middleware_with_utm(request)
+
+    assert Touchpoint.objects.count() == 1
+    assert not ClickIdentifier.objects.exists()
+
+
+@pytest.mark.django_db
+def test_with_click_id_finds_touchpoint(identity):
+    touchpoint = Touchpoint.objects.create(identity=identity, url="https://site.com/")
+    Touchpoint.objects.create(identity=identity, url="https://site.com/other")
+    ClickIdentifier.objects.create(
+        touchpoint=touchpoint, platform=ClickIdentifier.Platform.FBCLID, value="fb1"
+    )
+
+    assert list(Touchpoint.objects.with_click_id("fb1")) == [touchpoint]
+    assert list(Touchpoint.objects.with_click_id("fb1", platform="fbclid")) == [
+        touchpoint
+    ]
+    assert not Touchpoint.objects.with_click_id("fb1", platform="gclid").exists()
+
+
+@pytest.mark.django_db
+def test_attribution_data_keeps_every_click_id_key():
+    now = timezone.now()
+    identity = Identity.objects.create()
+    touchpoint = Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        utm_source="tiktok",
+        created_at=now - timedelta(days=1),
+    )
+    ClickIdentifier.objects.create(
+        touchpoint=touchpoint, platform=ClickIdentifier.Platform.TTCLID, value="tt9"
+    )
+    Conversion.objects.create(identity=identity, event="purchase", created_at=now)
+
+    conversion = Conversion.objects.with_attribution(last_touch).get()
+
+    assert conversion.attribution_data["ttclid"] == "tt9"
+    for param in ("fbclid", "gclid", "msclkid", "li_fat_id", "twclid", "igshid"):
+        assert conversion.attribution_data[param] == ""
+
+
+@pytest.mark.django_db(transaction=True)
+def test_click_identifier_migration_round_trip():
+    before = [("django_attribution", "0004_campaigndimension")]
+    after = [("django_attribution", "0005_clickidentifier")]
+    executor = MigrationExecutor(connection)
+    executor.migrate(before)
+
+    try:
+        apps = executor.loader.project_state(before).apps
+        OldIdentity = apps.get_model("django_attribution", "Identity")
+        OldTouchpoint = apps.get_model("django_attribution", "Touchpoint")
+        identity = OldIdentity.objects.create()
+        clicked = OldTouchpoint.objects.create(
+            identity=identity, url="https://site.com/", gclid="g1", fbclid="f1"
+        )
+        OldTouchpoint.objects.create(identity=identity, url="https://site.com/")
+
+        executor.loader.build_graph()
+        executor.migrate(after)
+        apps = executor.loader.project_state(after).apps
+        NewClickIdentifier = apps.get_model("django_attribution", "ClickIdentifier")
+        assert sorted(
+            NewClickIdentifier.objects.values_list("touchpoint_id", "value")
+        ) == [(clicked.pk, "f1"), (clicked.pk, "g1")]
+
+        executor.loader.build_graph()
+        executor.migrate(before)
+        restored = OldTouchpoint.objects.get(pk=clicked.pk)
+        assert (restored.gclid, restored.fbclid, restored.msclkid) == ("g1", "f1", "")
+    finally:
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes("django_attribution"))
@@ -0,0 +1,308 @@
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from django_attribution.attribution_models import (
+    MarkovAttributionModel,
+    ShapleyAttributionModel,
+    markov,
+)
+from django_attribution.models import (
+    AttributionCredit,
+    AttributionWeights,
+    Conversion,
+    Identity,
+    Touchpoint,
+)
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def now():
+    return timezone.now()
+
+
+def _journey(now, sources, value=None, converted=True):
+    identity = Identity.objects.create()
+    for days_ago, source in zip(range(len(sources), 0, -1), sources):
+        Touchpoint.objects.create(
+            identity=identity,
+            url="https://site.com/",
+            utm_source=source,
+            created_at=now - timedelta(days=days_ago),
+        )
+    if converted:
+        Conversion.objects.create(
+            identity=identity,
+            event="purchase",
+            conversion_value=value,
+            created_at=now,
+        )
+    return identity
+
+
+def _brute_force_removal_effects(path_counts):
+    channels = sorted({channel for path, _ in path_counts for channel in path})
+    states = ["start", *channels, "conversion", "null"]
+
+    def conversion_probability(removed=None):
+        size = len(states)
+        transitions = np.zeros((size, size))
+        for (path, converted), count in path_counts.items():
+            walk = ["start", *path, "conversion" if converted else "null"]
+            for source, target in zip(walk, walk[1:]):
+                if target == removed:
+                    target = "null"
+                transitions[states.index(source), states.index(target)] += count
+        totals = transitions.sum(axis=1, keepdims=True)
+        probabilities = np.divide(
+            transitions, totals, out=np.zeros_like(transitions), where=totals > 0
+        )
+        transient = len(channels) + 1
+        solved = np.linalg.solve(
+            np.eye(transient) - probabilities[:transient, :transient],
+            probabilities[:transient, transient],
+        )
+        return solved[0]
+
+    base = conversion_probability()
+    effects = {
+        channel: max(0.0, 1 - conversion_probability(channel) / base)
+        for channel in channels
+    }
+    total = sum(effects.values())
+    return {channel: effect / total for channel, effect in effects.items()}
+
+
+def test_markov_removal_effects_for_simple_chains():
+    model = MarkovAttributionModel()
+
+    assert model.removal_effects(
+        Counter({(("a",), True): 1, (("b",), False): 1})
+    ) == pytest.approx({"a": 1.0, "b": 0.0})
+    assert model.removal_effects(
+        Counter({(("a", "b"), True): 1, (("a",), False): 1})
+    ) == pytest.approx({"a": 0.5, "b": 0.5})
+
+
+def test_markov_removal_effects_match_brute_force():
+    path_counts = Counter(
+        {
+            (("a", "b", "c"), True): 5,
+            (("b", "a"), True): 3,
+            (("c",), False): 7,
+            (("a", "c", "a"), False): 2,
+            (("b",), True): 4,
+            (("d", "a"), False): 1,
+            ((), True): 2,
+        }
+    )
+
+    assert MarkovAttributionModel().removal_effects(path_counts) == pytest.approx(
+        _brute_force_removal_effects(path_counts)
+    )
+
+
+def test_markov_removal_effects_without_touchpoints_is_empty():
+    assert MarkovAttributionModel().removal_effects(Counter({((), True): 3})) == {}
+
+
+@pytest.mark.django_db
+def test_markov_fit_uses_converting_and_non_converting_paths(now):
+    _journey(now, ["google", "email"])
+    _journey(now, ["google"], converted=False)
+
+    weights = MarkovAttributionModel(granularity="source").fit(Conversion.objects.all())
+
+    assert weights == pytest.approx({"google": 0.5, "email": 0.5})
+
+
+@pytest.mark.django_db
+def test_markov_refit_writes_fractional_credits(now):
+    _journey(now, ["google", "email"], value=Decimal("100.00"))
+    _journey(now, ["google"], converted=False)
+    _journey(now, ["facebook"], value=Decimal("10.00"))
+
+    model = MarkovAttributionModel(granularity="source")
+    assert model.refit(Conversion.objects.valid()) == 3
+    conversions = list(
+        Conversion.objects.valid().with_attribution(model).order_by("created_at")
+    )
+
+    assert AttributionCredit.objects.filter(model="markov").count() == 3
+    for conversion in conversions:
+        assert conversion.attribution_metadata["model"] == "MarkovAttributionModel"
+        assert sum(credit.credit for credit in conversion.credits) == pytest.approx(1)
+
+    google_email = next(c for c in conversions if len(c.credits) == 2)
+    assert sum(credit.attributed_value for credit in google_email.credits) == Decimal(
+        "100.00"
+    )
+    facebook = next(c for c in conversions if len(c.credits) == 1)
+    assert facebook.attribution_data == {
+        "channel": "facebook",
+        "credit": 1.0,
+        "utm_source": "facebook",
+        "utm_medium": "",
+        "utm_campaign": "",
+    }
+
+
+@pytest.mark.django_db
+def test_markov_refit_replaces_previous_credits(now):
+    _journey(now, ["google"], value=Decimal("50.00"))
+
+    markov.refit(Conversion.objects.all())
+    markov.refit(Conversion.objects.all())
+
+    credit = AttributionCredit.objects.get()
+    assert credit.channel == "google"
+    assert credit.credit == pytest.approx(1)
+    assert credit.attributed_value == Decimal("50.00")
+
+
+@pytest.mark.django_db
+def test_apply_only_reads_stored_credits(now):
+    _journey(now, ["google"], value=Decimal("50.00"))
+
+    conversion = Conversion.objects.with_attribution(markov).get()
+
+    assert conversion.attribution_data == {}
+    assert conversion.credits == []
+    assert not AttributionCredit.objects.exists()
+
+
+@pytest.mark.django_db
+def test_fit_attribution_command_rewrites_credits(now):
+    _journey(now, ["google"], value=Decimal("100.00"))
+
+    out = StringIO()
+    call_command(
+        "fit_attribution", "django_attribution.attribution_models.markov", stdout=out
+    )
+
+    assert "Wrote 1 markov credit rows." in out.getvalue()
+    assert AttributionCredit.objects.get(model="markov").credit == pytest.approx(1)
+
+
+def test_fit_attribution_command_rejects_single_touch_models():
+    with pytest.raises(CommandError):
+        call_command(
+            "fit_attribution", "django_attribution.attribution_models.last_touch"
+        )
+
+
+@pytest.mark.django_db
+def test_materialize_reuses_saved_weights(now):
+    first = _journey(now, ["google", "email"], value=Decimal("100.00"))
+    MarkovAttributionModel(granularity="source").refit(Conversion.objects.valid())
+    assert AttributionWeights.objects.get(model="markov", window="30").weights
+
+    # A fresh instance, as in another process, reuses the saved weights
+    model = MarkovAttributionModel(granularity="source")
+    second = _journey(now, ["email"], value=Decimal("10.00"))
+    with patch.object(model, "fit", side_effect=AssertionError("refitted")):
+        assert model.materialize(Conversion.objects.filter(identity=second)) == 1
+
+    assert AttributionCredit.objects.filter(conversion__identity=first).count() == 2
+    assert AttributionCredit.objects.get(conversion__identity=second).credit == 1
+
+
+@pytest.mark.django_db
+def test_materialize_fits_and_saves_weights_once_per_window(now):
+    _journey(now, ["google"], value=Decimal("10.00"))
+    model = MarkovAttributionModel(granularity="source")
+
+    model.materialize(Conversion.objects.valid(), window_days=7)
+
+    assert model.load_weights(window_days=7) == pytest.approx({"google": 1.0})
+    assert model.load_weights() is None
+
+
+def test_coalition_values_sum_subsets():
+    from django_attribution.shapley import coalition_values
+
+    values = coalition_values(
+        np.array([0b01, 0b11, 0b10, 0b01]), np.array([1.0, 2.0, 4.0, 8.0]), 2
+    )
+
+    assert values.tolist() == [0.0, 9.0, 4.0, 15.0]
+
+
+def test_shapley_estimates_converge_to_exact_values():
+    from django_attribution.shapley import (
+        coalition_values,
+        estimate_shapley_values,
+    )
+
+    # v({a}) = 1, v({b}) = 0, v({a, b}) = 2, so phi(a) = 1.5 and phi(b) = 0.5
+    values = coalition_values(np.array([0b01, 0b11]), np.array([1.0, 1.0]), 2)
+    estimates, error = estimate_shapley_values(
+        values, 2, error_bound=0.005, max_permutations=50_000, seed=1
+    )
+
+    assert estimates == pytest.approx([1.5, 0.5], abs=0.05)
+    assert error <= 0.005
+
+
+def test_shapley_values_pool_rare_channels_and_normalize():
+    model = ShapleyAttributionModel(max_channels=2, seed=1)
+
+    weights = model.shapley_values(
+        Counter(
+            {
+                frozenset({"a"}): 6,
+                frozenset({"a", "b"}): 2,
+                frozenset({"c"}): 1,
+                frozenset({"d"}): 1,
+            }
+        )
+    )
+
+    assert set(weights) == {"a", ShapleyAttributionModel.OTHER_CHANNEL}
+    assert sum(weights.values()) == pytest.approx(1)
+    assert weights["a"] > weights[ShapleyAttributionModel.OTHER_CHANNEL]
+
+
+def test_shapley_model_rejects_too_many_channels():
+    with pytest.raises(ValueError):
+        ShapleyAttributionModel(max_channels=32)
+
+
+@pytest.mark.django_db
+def test_shapley_refit_writes_fractional_credits(now):
+    _journey(now, ["google", "email"], value=Decimal("100.00"))
+    _journey(now, ["google"], value=Decimal("20.00"))
+
+    model = ShapleyAttributionModel(granularity="source", seed=1)
+    model.refit(Conversion.objects.valid())
+    conversions = list(Conversion.objects.valid().with_attribution(model))
+
+    assert AttributionCredit.objects.filter(model="shapley").count() == 3
+    weights = model.load_weights()
+    assert weights is not None
+    assert weights["google"] > weights["email"]
+    for conversion in conversions:
+        assert sum(credit.credit for credit in conversion.credits) == pytest.approx(1)
+
+
+@pytest.mark.django_db
+def test_shapley_fit_with_process_pool_matches_serial_fit(now):
+    _journey(now, ["google", "email"])
+    _journey(now, ["google"])
+    _journey(now, ["facebook", "email"])
+
+    serial = ShapleyAttributionModel(granularity="source", seed=7)
+    parallel = ShapleyAttributionModel(granularity="source", seed=7, processes=2)
+
+    assert parallel.fit(Conversion.objects.all()) == pytest.approx(
+        serial.fit(Conversion.objects.all()), abs=0.02
+    )
@@ -0,0 +1,156 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from django_attribution.attribution_models import last_touch
+from django_attribution.conf import attribution_settings
+from django_attribution.dimensions import (
+    clear_dimension_cache,
+    intern_campaign_dimension,
+    utm_lookup,
+)
+from django_attribution.models import (
+    CampaignDimension,
+    ClickIdentifier,
+    Conversion,
+    Identity,
+    Touchpoint,
+)
+
+
+@pytest.fixture
+def normalized():
+    clear_dimension_cache()
+    cache.clear()
+    with patch.object(attribution_settings, "NORMALIZE_UTM", True):
+        yield
+    clear_dimension_cache()
+    cache.clear()
+
+
+def test_utm_lookup_follows_setting():
+    assert utm_lookup("utm_source") == "utm_source"
+    with patch.object(attribution_settings, "NORMALIZE_UTM", True):
+        assert utm_lookup("utm_source") == "campaign_dimension__utm_source"
+        assert utm_lookup("gclid") == "gclid"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_intern_campaign_dimension_reuses_rows_without_queries(normalized):
+    values = {"utm_source": "google", "utm_medium": "cpc"}
+
+    first = intern_campaign_dimension(values)
+    with CaptureQueriesContext(connection) as queries:
+        second = intern_campaign_dimension(dict(values))
+
+    assert first == second
+    assert len(queries) == 0
+    assert CampaignDimension.objects.count() == 1
+    assert intern_campaign_dimension({"utm_source": "bing"}) != first
+
+
+@pytest.mark.django_db(transaction=True)
+def test_intern_campaign_dimension_falls_back_to_shared_cache(normalized):
+    pk = intern_campaign_dimension({"utm_source": "google"})
+    clear_dimension_cache()
+
+    with CaptureQueriesContext(connection) as queries:
+        assert intern_campaign_dimension({"utm_source": "google"}) == pk
+
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_middleware_stores_utm_values_in_dimension(
+    normalized, attribution_middleware_with_utm, make_request
+):
+    request = make_request(
+        "/landing/",
+        tracking_params={"utm_source": "google", "utm_campaign": "summer"},
+    )
+    request.user = AnonymousUser()
+
+    attribution_middleware_with_utm(request)
+
+    touchpoint = Touchpoint.objects.select_related("campaign_dimension").get()
+    assert touchpoint.utm_source == ""
+    assert touchpoint.campaign_dimension.utm_source == "google"
+    assert touchpoint.get_utm("utm_campaign") == "summer"
+    assert str(touchpoint).startswith("google")
+
+
+@pytest.mark.django_db
+def test_attribution_reads_normalized_utm_values(normalized):
+    now = timezone.now()
+    identity = Identity.objects.create()
+    touchpoint = Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        campaign_dimension_id=intern_campaign_dimension(
+            {"utm_source": "google", "utm_campaign": "summer"}
+        ),
+        created_at=now - timedelta(days=3),
+    )
+    ClickIdentifier.objects.create(
+        touchpoint=touchpoint, platform=ClickIdentifier.Platform.GCLID, value="abc"
+    )
+    Conversion.objects.create(identity=identity, event="purchase", created_at=now)
+
+    conversion = Conversion.objects.with_attribution(
+        last_touch, source_windows={"google": 7}
+    ).get()
+
+    assert conversion.attribution_data["utm_source"] == "google"
+    assert conversion.attribution_data["utm_campaign"] == "summer"
+    assert conversion.attribution_data["utm_medium"] == ""
+    assert conversion.attribution_data["gclid"] == "abc"
+    assert Conversion.objects.top_paths()[0].path == ("google",)
+
+
+@pytest.mark.django_db
+def test_normalize_touchpoints_command_moves_existing_values(normalized):
+    identity = Identity.objects.create()
+    for source in ("google", "google", "bing"):
+        Touchpoint.objects.create(
+            identity=identity, url="https://site.com/", utm_source=source
+        )
+
+    call_command("normalize_touchpoints", "--batch-size", "2", stdout=StringIO())
+
+    assert CampaignDimension.objects.count() == 2
+    assert not Touchpoint.objects.filter(campaign_dimension__isnull=True).exists()
+    assert not Touchpoint.objects.exclude(utm_source="").exists()
+    assert sorted(
+        Touchpoint.objects.values_list("campaign_dimension__utm_source", flat=True)
+    ) == ["bing", "google", "google"]
+
+
+@pytest.mark.django_db
+def test_normalize_touchpoints_keeps_columns_until_normalize_utm_is_enabled():
+    clear_dimension_cache()
+    cache.clear()
+    identity = Identity.objects.create()
+    Touchpoint.objects.create(
+        identity=identity, url="https://site.com/", utm_source="google"
+    )
+
+    call_command("normalize_touchpoints", stdout=StringIO())
+
+    touchpoint = Touchpoint.objects.select_related("campaign_dimension").get()
+    assert touchpoint.utm_source == "google"
+    assert touchpoint.campaign_dimension.utm_source == "google"
+
+    with patch.object(attribution_settings, "NORMALIZE_UTM", True):
+        call_command("normalize_touchpoints", stdout=StringIO())
+
+    touchpoint.refresh_from_db()
+    assert touchpoint.utm_source == ""
+    assert CampaignDimension.objects.count() == 1
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from django_attribution.attribution_models import first_touch
+from django_attribution.models import Conversion, Identity, Touchpoint
+
+
+@pytest.fixture
+def now():
+    return timezone.now()
+
+
+def _conversion(now, touch_days_ago, campaign="", value=None, source="google"):
+    identity = Identity.objects.create()
+    for days_ago in touch_days_ago:
+        Touchpoint.objects.create(
+            identity=identity,
+            url="https://site.com/",
+            utm_source=source,
+            utm_campaign=campaign,
+            created_at=now - timedelta(days=days_ago),
+        )
+    return Conversion.objects.create(
+        identity=identity, event="purchase", conversion_value=value, created_at=now
+    )
+
+
+def _summary(rows):
+    return [
+        (row["group"], row["lower"], row["upper"], row["conversions"], row["value"])
+        for row in rows
+    ]
+
+
+@pytest.mark.django_db
+def test_lag_histogram_buckets_days_since_first_touch_per_campaign(now):
+    _conversion(now, [0.5], campaign="spring", value=Decimal("10"))
+    _conversion(now, [5, 2], campaign="spring", value=Decimal("20"))
+    _conversion(now, [20], campaign="summer", value=Decimal("5"))
+    _conversion(now, [], campaign="none")
+
+    with CaptureQueriesContext(connection) as queries:
+        rows = Conversion.objects.lag_histogram(bucket_edges=[1, 7])
+
+    assert len(queries) == 1
+    assert _summary(rows) == [
+        ("spring", 0, 1, 1, Decimal("10")),
+        ("spring", 1, 7, 1, Decimal("20")),
+        ("summer", 7, None, 1, Decimal("5")),
+    ]
+
+
+@pytest.mark.django_db
+def test_lag_histogram_respects_source_windows(now):
+    _conversion(now, [10], source="email")
+
+    assert Conversion.objects.lag_histogram(group_by=None) != []
+    assert (
+        Conversion.objects.lag_histogram(group_by=None, source_windows={"email": 7})
+        == []
+    )
+
+
+@pytest.mark.django_db
+def test_touches_histogram_counts_windowed_touchpoints(now):
+    _conversion(now, [], campaign="")
+    _conversion(now, [3], campaign="spring")
+    _conversion(now, [3, 2, 1], campaign="spring")
+    _conversion(now, [40, 3], campaign="spring")
+
+    rows = Conversion.objects.touches_histogram(bucket_edges=[1, 2, 3])
+
+    assert _summary(rows) == [
+        ("", 0, 1, 1, None),
+        ("spring", 1, 2, 2, None),
+        ("spring", 3, None, 1, None),
+    ]
+
+
+@pytest.mark.django_db
+def test_histogram_groups_by_attributed_touchpoint_of_model(now):
+    identity = Identity.objects.create()
+    for days_ago, campaign in ((3, "first"), (1, "last")):
+        Touchpoint.objects.create(
+            identity=identity,
+            url="https://site.com/",
+            utm_campaign=campaign,
+            created_at=now - timedelta(days=days_ago),
+        )
+    Conversion.objects.create(identity=identity, event="purchase", created_at=now)
+
+    last = Conversion.objects.touches_histogram()
+    first = Conversion.objects.touches_histogram(model=first_touch)
+
+    assert [row["group"] for row in last] == ["last"]
+    assert [row["group"] for row in first] == ["first"]
+
+
+@pytest.mark.django_db
+def test_histogram_rejects_invalid_arguments():
+    with pytest.raises(ValueError):
+        Conversion.objects.lag_histogram(bucket_edges=[7, 1])
+    with pytest.raises(ValueError):
+        Conversion.objects.touches_histogram(group_by="url")
@@ -0,0 +1,111 @@
+import logging
+from unittest.mock import Mock, patch
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+
+from django_attribution.conf import attribution_settings
+from django_attribution.instrumentation import (
+    RequestProfile,
+    finish_profile,
+    request_profiled,
+    start_profile,
+)
+
+SIGNAL_SINK = ["django_attribution.instrumentation.signal_sink"]
+
+
+@pytest.fixture
+def profiles():
+    received = []
+
+    def receiver(sender, profile, **kwargs):
+        received.append(profile)
+
+    request_profiled.connect(receiver)
+    with patch.object(attribution_settings, "INSTRUMENTATION_SINKS", SIGNAL_SINK):
+        yield received
+    request_profiled.disconnect(receiver)
+
+
+@pytest.mark.django_db
+def test_sampled_request_reports_phase_timings(
+    attribution_middleware_with_utm, make_request, profiles
+):
+    request = make_request("/landing/", tracking_params={"utm_source": "google"})
+    request.user = AnonymousUser()
+
+    with patch.object(attribution_settings, "INSTRUMENTATION_SAMPLE_RATE", 1):
+        attribution_middleware_with_utm(request)
+
+    (profile,) = profiles
+    timings = {timing.name: timing for timing in profile.phases}
+    assert list(timings) == [
+        "tracking_params",
+        "cookie_lookup",
+        "identity_resolution",
+        "touchpoint_insert",
+        "cookie_write",
+    ]
+    assert timings["identity_resolution"].queries == 1
+    assert timings["touchpoint_insert"].queries == 1
+    assert profile.queries == 2
+    assert profile.overhead == pytest.approx(
+        sum(timing.duration for timing in profile.phases)
+    )
+
+
+@pytest.mark.django_db
+def test_nested_phases_count_towards_their_parent(
+    attribution_middleware, make_request, authenticated_user, profiles
+):
+    request = make_request("/")
+    request.user = authenticated_user
+
+    with patch.object(attribution_settings, "INSTRUMENTATION_SAMPLE_RATE", 1), patch(
+        "django_attribution.middlewares.AttributionMiddleware._should_resolve_identity",
+        return_value=True,
+    ):
+        attribution_middleware(request)
+
+    (profile,) = profiles
+    timings = {timing.name: timing for timing in profile.phases}
+    reconciliation = timings["reconciliation"]
+    assert reconciliation.parent == "identity_resolution"
+    assert 0 < reconciliation.queries <= timings["identity_resolution"].queries
+    assert profile.queries == sum(
+        timing.queries for timing in profile.phases if timing.parent is None
+    )
+
+
+@pytest.mark.django_db
+def test_unsampled_requests_are_not_profiled(
+    attribution_middleware_with_utm, make_request, profiles
+):
+    request = make_request("/landing/", tracking_params={"utm_source": "google"})
+    request.user = AnonymousUser()
+
+    attribution_middleware_with_utm(request)
+
+    assert request.attribution_profile is None
+    assert profiles == []
+
+
+def test_sampling_rate_and_failing_sinks(rf, caplog):
+    with patch.object(attribution_settings, "INSTRUMENTATION_SAMPLE_RATE", 0.5), patch(
+        "django_attribution.instrumentation.random.random", side_effect=[0.7, 0.2]
+    ):
+        assert start_profile(rf.get("/")) is None
+        assert isinstance(start_profile(rf.get("/")), RequestProfile)
+
+    request = rf.get("/")
+    failing = Mock(side_effect=RuntimeError("sink down"))
+    with patch.object(attribution_settings, "INSTRUMENTATION_SAMPLE_RATE", 1), patch(
+        "django_attribution.instrumentation._get_sinks", return_value=[failing]
+    ), caplog.at_level(logging.ERROR):
+        start_profile(request)
+        finish_profile(request)
+        finish_profile(request)
+
+    failing.assert_called_once()
+    assert "sink down" in caplog.text
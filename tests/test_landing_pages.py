@@ -0,0 +1,105 @@
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+
+from django_attribution.conf import attribution_settings
+from django_attribution.landing_pages import (
+    landing_page_hash,
+    landing_path,
+    referrer_host,
+)
+from django_attribution.models import Touchpoint
+
+
+@pytest.fixture
+def compact_urls():
+    with patch.object(attribution_settings, "COMPACT_URLS", True):
+        yield
+
+
+def test_landing_path_drops_host_and_tracking_parameters():
+    assert (
+        landing_path("https://site.com/shoes/?utm_source=google&size=42&gclid=x#top")
+        == "/shoes/?size=42"
+    )
+    assert landing_path("https://site.com") == "/"
+    assert landing_page_hash("https://a.com/shoes/?utm_source=x") == landing_page_hash(
+        "/shoes/"
+    )
+    assert referrer_host("https://www.Google.com:443/search?q=shoes") == (
+        "www.google.com"
+    )
+    assert referrer_host("") == ""
+
+
+@pytest.mark.django_db
+def test_middleware_keeps_full_url_by_default(
+    attribution_middleware_with_utm, make_request
+):
+    request = make_request("/landing/", tracking_params={"utm_source": "google"})
+    request.META["HTTP_REFERER"] = "https://google.com/search?q=shoes"
+    request.user = AnonymousUser()
+
+    attribution_middleware_with_utm(request)
+
+    touchpoint = Touchpoint.objects.get()
+    assert touchpoint.url == "http://testserver/landing/?utm_source=google"
+    assert touchpoint.referrer == "https://google.com/search?q=shoes"
+    assert touchpoint.referrer_host == "google.com"
+    assert touchpoint.url_hash == landing_page_hash("/landing/")
+
+
+@pytest.mark.django_db
+def test_middleware_stores_compact_urls(
+    attribution_middleware_with_utm, make_request, compact_urls
+):
+    request = make_request(
+        "/landing/", tracking_params={"utm_source": "google"}, other_params={"a": "1"}
+    )
+    request.META["HTTP_REFERER"] = "https://google.com/search?q=shoes"
+    request.user = AnonymousUser()
+
+    attribution_middleware_with_utm(request)
+
+    touchpoint = Touchpoint.objects.get()
+    assert touchpoint.url == "/landing/?a=1"
+    assert touchpoint.referrer == "https://google.com/search"
+    assert touchpoint.referrer_host == "google.com"
+
+
+@pytest.mark.django_db
+def test_landing_page_queries_group_by_hash(identity):
+    for url in (
+        "https://site.com/shoes/?utm_source=google",
+        "https://site.com/shoes/?utm_source=newsletter",
+        "https://site.com/hats/",
+    ):
+        Touchpoint.objects.create(
+            identity=identity, url=url, url_hash=landing_page_hash(url)
+        )
+
+    assert Touchpoint.objects.for_landing_page("/shoes/").count() == 2
+    assert [
+        (row["url_hash"], row["touchpoints"])
+        for row in Touchpoint.objects.landing_page_counts()
+    ] == [(landing_page_hash("/shoes/"), 2), (landing_page_hash("/hats/"), 1)]
+
+
+@pytest.mark.django_db
+def test_compact_command_backfills_existing_touchpoints(identity, compact_urls):
+    touchpoint = Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/shoes/?utm_source=google",
+        referrer="https://news.site/article?id=3",
+    )
+
+    call_command("compact_touchpoint_urls", stdout=StringIO())
+
+    touchpoint.refresh_from_db()
+    assert touchpoint.url == "/shoes/"
+    assert touchpoint.referrer == "https://news.site/article"
+    assert touchpoint.referrer_host == "news.site"
+    assert touchpoint.url_hash == landing_page_hash("/shoes/")
@@ -0,0 +1,131 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import RequestFactory
+
+from django_attribution.conf import attribution_settings
+from django_attribution.metrics import (
+    IDENTITIES_CREATED,
+    TOUCHPOINTS_RECORDED,
+    MetricsRegistry,
+    mark_process_dead,
+)
+from django_attribution.views import metrics_view
+
+
+def _value(counter, **labels):
+    return counter._values.get(counter._key(labels), 0)
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("app_requests_total", "Requests.", ["path"])
+    latency = registry.histogram("app_seconds", "Latency.", buckets=[0.1, 1])
+    registry.counter("app_idle_total", "Never incremented.")
+
+    requests.inc(path='/a"b')
+    requests.inc(2, path='/a"b')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(3)
+
+    assert registry.render().splitlines() == [
+        "# HELP app_idle_total Never incremented.",
+        "# TYPE app_idle_total counter",
+        "app_idle_total 0",
+        "# HELP app_requests_total Requests.",
+        "# TYPE app_requests_total counter",
+        'app_requests_total{path="/a\\"b"} 3',
+        "# HELP app_seconds Latency.",
+        "# TYPE app_seconds histogram",
+        'app_seconds_bucket{le="0.1"} 1',
+        'app_seconds_bucket{le="1"} 2',
+        'app_seconds_bucket{le="+Inf"} 3',
+        "app_seconds_sum 3.55",
+        "app_seconds_count 3",
+    ]
+
+
+def test_multiprocess_files_are_added_up(tmp_path):
+    registry = MetricsRegistry()
+    other = MetricsRegistry()
+    for metrics in (registry, other):
+        metrics.counter("app_jobs_total", "Jobs.").inc(2)
+        metrics.histogram("app_seconds", "Latency.", buckets=[1]).observe(0.5)
+    (tmp_path / "99999.json").write_text(json.dumps(other.snapshot()))
+
+    with patch.object(attribution_settings, "METRICS_MULTIPROCESS_DIR", str(tmp_path)):
+        text = registry.render()
+
+    assert "app_jobs_total 4" in text
+    assert 'app_seconds_bucket{le="1"} 2' in text
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_dead_process_files_are_archived(tmp_path):
+    registry = MetricsRegistry()
+    dead = MetricsRegistry()
+    for metrics in (registry, dead):
+        metrics.counter("app_jobs_total", "Jobs.").inc(2)
+    # Two dead workers that had the same pid
+    for started in (1, 2):
+        (tmp_path / f"99999-{started}.json").write_text(json.dumps(dead.snapshot()))
+
+    with patch.object(attribution_settings, "METRICS_MULTIPROCESS_DIR", str(tmp_path)):
+        before = registry.render()
+        mark_process_dead(99999)
+        after = registry.render()
+
+    assert "app_jobs_total 6" in before
+    assert "app_jobs_total 6" in after
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == [
+        f"{os.getpid()}-{registry._process[1]}.json",
+        "archive.json",
+    ]
+
+
+@pytest.mark.django_db
+def test_middleware_counts_identities_and_touchpoints(
+    attribution_middleware_with_utm, make_request
+):
+    created = _value(IDENTITIES_CREATED, kind="anonymous")
+    recorded = _value(TOUCHPOINTS_RECORDED)
+    request = make_request("/landing/", tracking_params={"utm_source": "google"})
+    request.user = AnonymousUser()
+
+    attribution_middleware_with_utm(request)
+
+    assert _value(IDENTITIES_CREATED, kind="anonymous") == created + 1
+    assert _value(TOUCHPOINTS_RECORDED) == recorded + 1
+
+
+def test_metrics_view_requires_configured_token():
+    factory = RequestFactory()
+
+    with patch.object(attribution_settings, "METRICS_TOKEN", "s3cret"):
+        denied = metrics_view(factory.get("/metrics/"))
+        allowed = metrics_view(
+            factory.get("/metrics/", HTTP_AUTHORIZATION="Bearer s3cret")
+        )
+
+    assert denied.status_code == 403
+    assert allowed.status_code == 200
+    assert allowed["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert b"# TYPE attribution_touchpoints_recorded_total counter" in allowed.content
+
+
+@pytest.mark.django_db
+def test_metrics_view_is_staff_only_without_token():
+    factory = RequestFactory()
+    anonymous = factory.get("/metrics/")
+    anonymous.user = AnonymousUser()
+    staff = factory.get("/metrics/")
+    staff.user = User.objects.create(username="ops", is_staff=True)
+
+    with patch.object(attribution_settings, "METRICS_TOKEN", None):
+        assert metrics_view(factory.get("/metrics/")).status_code == 403
+        assert metrics_view(anonymous).status_code == 403
+        assert metrics_view(staff).status_code == 200
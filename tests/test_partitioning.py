@@ -0,0 +1,140 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import NotSupportedError, connection
+
+from django_attribution.models import Identity, Touchpoint
+from django_attribution.partitioning import (
+    add_months,
+    create_partitions,
+    default_partition_name,
+    detach_partitions,
+    get_partitioned_model,
+    is_partitioned,
+    list_partitions,
+    partition_name,
+    partition_table,
+)
+
+# Run with PGDATABASE set, see tests/test_settings.py
+requires_postgresql = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="Partitioning requires PostgreSQL"
+)
+TABLE = Touchpoint._meta.db_table
+
+
+def touch(identity, year, month):
+    return Touchpoint.objects.create(
+        identity=identity,
+        url="https://example.com/",
+        created_at=datetime(year, month, 15, tzinfo=timezone.utc),
+    )
+
+
+def row_count(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {connection.ops.quote_name(table)}")
+        return cursor.fetchone()[0]
+
+
+def test_add_months_rolls_over_years():
+    assert add_months(date(2024, 11, 15), 1) == date(2024, 12, 1)
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+
+
+def test_partition_name_is_monthly():
+    assert (
+        partition_name("django_attribution_touchpoint", date(2025, 3, 1))
+        == "django_attribution_touchpoint_p202503"
+    )
+
+
+def test_get_partitioned_model_rejects_other_models():
+    assert get_partitioned_model("touchpoint") is Touchpoint
+    with pytest.raises(ValueError):
+        get_partitioned_model("identity")
+
+
+@pytest.mark.django_db
+def test_partitioning_is_postgresql_only():
+    assert is_partitioned(Touchpoint) is False
+    with pytest.raises(CommandError, match="PostgreSQL"):
+        call_command("attribution_partitions", "create")
+
+
+@pytest.mark.django_db
+def test_partition_table_raises_not_supported_error():
+    if connection.vendor == "postgresql":
+        pytest.skip("Only raised on other databases")
+    with pytest.raises(NotSupportedError):
+        partition_table(Touchpoint)
+
+
+@requires_postgresql
+@pytest.mark.django_db
+def test_partition_table_keeps_rows_in_monthly_partitions():
+    identity = Identity.objects.create()
+    touch(identity, 2024, 1)
+    touch(identity, 2024, 3)
+
+    partition_table(Touchpoint, months_ahead=1)
+
+    assert is_partitioned(Touchpoint)
+    months = [month for _, month in list_partitions(Touchpoint)]
+    assert months[:3] == [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)]
+    assert Touchpoint.objects.count() == 2
+    assert row_count(partition_name(TABLE, date(2024, 1, 1))) == 1
+    assert row_count(partition_name(TABLE, date(2024, 3, 1))) == 1
+    assert row_count(default_partition_name(TABLE)) == 0
+
+
+@requires_postgresql
+@pytest.mark.django_db
+def test_queries_on_created_at_are_pruned_to_one_partition():
+    identity = Identity.objects.create()
+    touch(identity, 2024, 1)
+    touch(identity, 2024, 3)
+    partition_table(Touchpoint, months_ahead=1)
+
+    plan = Touchpoint.objects.filter(
+        created_at__gte=datetime(2024, 3, 1, tzinfo=timezone.utc),
+        created_at__lt=datetime(2024, 4, 1, tzinfo=timezone.utc),
+    ).explain()
+
+    assert partition_name(TABLE, date(2024, 3, 1)) in plan
+    assert partition_name(TABLE, date(2024, 1, 1)) not in plan
+    assert default_partition_name(TABLE) not in plan
+
+
+@requires_postgresql
+@pytest.mark.django_db
+def test_create_partitions_moves_rows_out_of_the_default_partition():
+    identity = Identity.objects.create()
+    touch(identity, 2024, 1)
+    partition_table(Touchpoint, months_ahead=0)
+    far = add_months(date.today(), 24)
+    touch(identity, far.year, far.month)
+    assert row_count(default_partition_name(TABLE)) == 1
+
+    created = create_partitions(Touchpoint, far, far)
+
+    assert created == [partition_name(TABLE, far)]
+    assert row_count(partition_name(TABLE, far)) == 1
+    assert row_count(default_partition_name(TABLE)) == 0
+    assert Touchpoint.objects.count() == 2
+
+
+@requires_postgresql
+@pytest.mark.django_db
+def test_detach_partitions_drops_old_months():
+    identity = Identity.objects.create()
+    touch(identity, 2024, 1)
+    touch(identity, 2024, 2)
+    partition_table(Touchpoint, months_ahead=0)
+
+    detached = detach_partitions(Touchpoint, before=date(2024, 2, 1), drop=True)
+
+    assert detached == [partition_name(TABLE, date(2024, 1, 1))]
+    assert Touchpoint.objects.count() == 1
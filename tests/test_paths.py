@@ -0,0 +1,200 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from django_attribution.journeys import iter_journeys
+from django_attribution.models import Conversion, Identity, Touchpoint
+from django_attribution.paths import TopK, top_conversion_paths
+
+
+@pytest.fixture
+def now():
+    return timezone.now()
+
+
+def _touch(identity, days_ago, now, source="", medium="", campaign=""):
+    return Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        utm_source=source,
+        utm_medium=medium,
+        utm_campaign=campaign,
+        created_at=now - timedelta(days=days_ago),
+    )
+
+
+@pytest.mark.django_db
+def test_journey_path_is_ordered_and_collapsed(identity, now):
+    _touch(identity, 20, now, "google", "cpc")
+    _touch(identity, 15, now, "google", "cpc")
+    _touch(identity, 10, now, "newsletter", "email")
+    _touch(identity, 5, now)
+    Conversion.objects.create(identity=identity, event="purchase", created_at=now)
+
+    journeys = list(iter_journeys(Conversion.objects.all()))
+
+    assert len(journeys) == 1
+    assert journeys[0].path == ("google/cpc", "newsletter/email", "direct")
+    assert journeys[0].converted
+
+
+@pytest.mark.django_db
+def test_journey_respects_default_and_source_windows(identity, now):
+    _touch(identity, 40, now, "old")
+    _touch(identity, 12, now, "google")
+    _touch(identity, 6, now, "email")
+    Conversion.objects.create(identity=identity, event="purchase", created_at=now)
+
+    default_only = list(iter_journeys(Conversion.objects.all(), granularity="source"))
+    with_override = list(
+        iter_journeys(
+            Conversion.objects.all(),
+            granularity="source",
+            source_windows={"google": 7, "old": 60},
+        )
+    )
+
+    assert default_only[0].path == ("google", "email")
+    assert with_override[0].path == ("old", "email")
+
+
+@pytest.mark.django_db
+def test_journey_only_uses_touchpoints_before_each_conversion(identity, now):
+    _touch(identity, 10, now, "google")
+    Conversion.objects.create(
+        identity=identity, event="signup", created_at=now - timedelta(days=8)
+    )
+    _touch(identity, 5, now, "facebook")
+    Conversion.objects.create(identity=identity, event="purchase", created_at=now)
+
+    journeys = list(iter_journeys(Conversion.objects.all(), granularity="source"))
+
+    assert [journey.path for journey in journeys] == [
+        ("google",),
+        ("google", "facebook"),
+    ]
+
+
+@pytest.mark.django_db
+def test_journey_caps_path_to_most_recent_steps(identity, now):
+    for days_ago, source in enumerate(["e", "d", "c", "b", "a"], start=1):
+        _touch(identity, days_ago, now, source)
+    Conversion.objects.create(identity=identity, event="purchase", created_at=now)
+
+    journeys = list(
+        iter_journeys(Conversion.objects.all(), granularity="source", max_path_length=3)
+    )
+
+    assert journeys[0].path == ("c", "d", "e")
+
+
+@pytest.mark.django_db
+def test_journey_can_include_non_converting_paths(now):
+    converter = Identity.objects.create()
+    browser = Identity.objects.create()
+    _touch(converter, 5, now, "google")
+    _touch(browser, 5, now, "facebook")
+    Conversion.objects.create(identity=converter, event="purchase", created_at=now)
+
+    journeys = list(
+        iter_journeys(
+            Conversion.objects.all(),
+            granularity="source",
+            include_non_converting=True,
+        )
+    )
+
+    assert {(journey.path, journey.converted) for journey in journeys} == {
+        (("google",), True),
+        (("facebook",), False),
+    }
+
+
+@pytest.mark.django_db
+def test_non_converting_paths_run_past_the_last_conversion(now):
+    converter = Identity.objects.create()
+    browser = Identity.objects.create()
+    _touch(converter, 5, now, "google")
+    Conversion.objects.create(
+        identity=converter, event="purchase", created_at=now - timedelta(days=3)
+    )
+    _touch(browser, 5, now, "facebook")
+    _touch(browser, 1, now, "bing")
+
+    def non_converting(**kwargs):
+        return [
+            journey.path
+            for journey in iter_journeys(
+                Conversion.objects.all(),
+                granularity="source",
+                include_non_converting=True,
+                **kwargs,
+            )
+            if not journey.converted
+        ]
+
+    assert non_converting() == [("facebook", "bing")]
+    assert non_converting(until=now - timedelta(days=2)) == [("facebook",)]
+
+
+@pytest.mark.django_db
+def test_journey_rejects_unknown_granularity():
+    with pytest.raises(ValueError):
+        list(iter_journeys(Conversion.objects.all(), granularity="unknown"))
+
+
+@pytest.mark.django_db
+def test_top_conversion_paths_aggregates_counts_and_values(now):
+    for value in (10, 20):
+        identity = Identity.objects.create()
+        _touch(identity, 3, now, "google", "cpc")
+        _touch(identity, 2, now, "newsletter", "email")
+        Conversion.objects.create(
+            identity=identity, event="purchase", conversion_value=value, created_at=now
+        )
+
+    identity = Identity.objects.create()
+    _touch(identity, 2, now, "facebook", "social")
+    Conversion.objects.create(
+        identity=identity, event="purchase", conversion_value=5, created_at=now
+    )
+
+    paths = top_conversion_paths(Conversion.objects.all(), limit=5)
+
+    assert [(stat.path, stat.conversions, stat.value) for stat in paths] == [
+        (("google/cpc", "newsletter/email"), 2, Decimal("30")),
+        (("facebook/social",), 1, Decimal("5")),
+    ]
+    assert str(paths[0]) == "google/cpc → newsletter/email"
+    assert Conversion.objects.all().top_paths(limit=1) == paths[:1]
+
+
+def test_top_k_keeps_heavy_hitters_within_bounded_memory():
+    counter = TopK(capacity=2)
+
+    for _ in range(50):
+        counter.add("frequent")
+    for key in range(100):
+        counter.add(key)
+    for _ in range(20):
+        counter.add("second")
+
+    assert len(counter) <= 4
+    top = counter.most_common(2)
+    assert [key for key, _ in top] == ["frequent", "second"]
+    assert top[0][1][0] == 50
+
+
+@pytest.mark.django_db
+def test_attribution_paths_command_prints_top_paths(identity, now):
+    _touch(identity, 2, now, "google", "cpc")
+    Conversion.objects.create(identity=identity, event="purchase", created_at=now)
+
+    out = StringIO()
+    call_command("attribution_paths", "--source-window", "google=7", stdout=out)
+
+    assert "google/cpc" in out.getvalue()
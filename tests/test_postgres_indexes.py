@@ -0,0 +1,51 @@
+import importlib
+
+import pytest
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+
+from django_attribution.models import Touchpoint
+
+index_pack = importlib.import_module(
+    "django_attribution.contrib.postgres_indexes.migrations.0001_index_pack"
+)
+
+
+def test_index_names_fit_postgresql_identifiers():
+    assert all(len(name) <= 63 for name, _, _ in index_pack.INDEXES)
+
+
+@pytest.mark.django_db
+def test_index_pack_is_a_noop_on_other_backends():
+    assert MigrationRecorder.Migration.objects.filter(
+        app="attribution_postgres_indexes", name="0001_index_pack"
+    ).exists()
+
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, Touchpoint._meta.db_table
+        )
+    assert any(info["columns"] == ["created_at"] for info in constraints.values())
+    assert not any(name.startswith("attribution_") for name in constraints)
+
+
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="PostgreSQL only")
+@pytest.mark.django_db
+def test_window_index_replaces_the_meta_index_under_its_name():
+    meta_index = index_pack._meta_index(Touchpoint, ["identity", "created_at"])
+
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, Touchpoint._meta.db_table
+        )
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE indexname = %s", [meta_index.name]
+        )
+        (definition,) = cursor.fetchone()
+
+    assert "INCLUDE (utm_source, campaign_dimension_id)" in definition
+    assert [
+        name
+        for name, info in constraints.items()
+        if info["columns"][:2] == ["identity_id", "created_at"]
+    ] == [meta_index.name]
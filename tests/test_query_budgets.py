@@ -0,0 +1,107 @@
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+
+from django_attribution.conf import attribution_settings
+from django_attribution.middlewares import (
+    AttributionMiddleware,
+    TrackingParameterMiddleware,
+)
+from django_attribution.models import Identity, Touchpoint
+from django_attribution.shortcuts import record_conversion
+from django_attribution.testing import (
+    QueryBudgetExceeded,
+    assert_query_budget,
+    query_budget,
+)
+
+UTM = {"utm_source": "google", "utm_medium": "cpc"}
+
+
+def _anonymous(user):
+    return None
+
+
+def _returning(user):
+    return Identity.objects.create()
+
+
+def _returning_merged(user):
+    return Identity.objects.create(merged_into=Identity.objects.create())
+
+
+def _returning_user(user):
+    return Identity.objects.create(linked_user=user)
+
+
+def _returning_user_merged(user):
+    canonical = Identity.objects.create(linked_user=user)
+    return Identity.objects.create(linked_user=user, merged_into=canonical)
+
+
+def _login_first_time(user):
+    return Identity.objects.create()
+
+
+def _login_with_history(user):
+    Identity.objects.create(linked_user=user)
+    anonymous = Identity.objects.create()
+    Touchpoint.objects.create(identity=anonymous, url="https://site.com/")
+    return anonymous
+
+
+# (cookie identity factory, logged in, tracking parameters, budget)
+MIDDLEWARE_BUDGETS = {
+    "untracked visitor": (_anonymous, False, {}, 0),
+    "new tracked visitor": (_anonymous, False, UTM, 2),
+    "returning visitor": (_returning, False, {}, 1),
+    "returning tracked visitor": (_returning, False, UTM, 2),
+    "returning merged visitor": (_returning_merged, False, {}, 2),
+    "returning user": (_returning_user, True, {}, 1),
+    "returning user with merged cookie": (_returning_user_merged, True, {}, 2),
+    "new tracked user": (_anonymous, True, UTM, 3),
+    "first login": (_login_first_time, True, {}, 3),
+    "login merging history": (_login_with_history, True, {}, 6),
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("scenario", list(MIDDLEWARE_BUDGETS))
+def test_middleware_query_budget(scenario, make_request, authenticated_user):
+    cookie_identity, logged_in, params, budget = MIDDLEWARE_BUDGETS[scenario]
+    identity = cookie_identity(authenticated_user)
+    request = make_request("/page/", tracking_params=params)
+    request.user = authenticated_user if logged_in else AnonymousUser()
+    if identity is not None:
+        request.COOKIES[attribution_settings.COOKIE_NAME] = str(identity.uuid)
+    middleware = TrackingParameterMiddleware(
+        AttributionMiddleware(lambda request: HttpResponse("OK"))
+    )
+
+    with query_budget(budget) as queries:
+        middleware(request)
+
+    assert len(queries) == budget, f"Budget can be lowered to {len(queries)}"
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("track_changes, budget", [(False, 1), (True, 2)])
+def test_record_conversion_query_budget(track_changes, budget, make_request, identity):
+    request = make_request("/checkout/")
+    request.identity = identity
+
+    with patch.object(attribution_settings, "TRACK_CHANGES", track_changes):
+        assert_query_budget(budget, record_conversion, request, "purchase", value=10)
+
+
+@pytest.mark.django_db
+def test_budget_failure_lists_the_queries(identity):
+    with pytest.raises(QueryBudgetExceeded) as excinfo, query_budget(1):
+        list(Identity.objects.all())
+        Identity.objects.filter(pk=identity.pk).exists()
+
+    assert len(excinfo.value.queries) == 2
+    assert "2 queries executed, the budget is 1" in str(excinfo.value)
+    assert "django_attribution_identity" in str(excinfo.value)
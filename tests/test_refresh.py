@@ -0,0 +1,206 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from django_attribution.attribution_models import first_touch, last_touch
+from django_attribution.conf import attribution_settings
+from django_attribution.models import (
+    AttributionChange,
+    AttributionCredit,
+    Conversion,
+    Identity,
+    Touchpoint,
+)
+from django_attribution.reconciliation import _merge_identity_to_canonical
+from django_attribution.refresh import refresh_attribution
+
+
+@pytest.fixture
+def track_changes():
+    with patch.object(attribution_settings, "TRACK_CHANGES", True):
+        yield
+
+
+@pytest.fixture
+def now():
+    return timezone.now()
+
+
+@pytest.mark.django_db
+def test_changes_are_not_logged_by_default(identity):
+    Conversion.objects.create(identity=identity, event="purchase")
+
+    assert AttributionChange.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_recording_and_updating_conversions_logs_changes(track_changes, identity):
+    conversion = Conversion.objects.create(identity=identity, event="purchase")
+
+    conversion = Conversion.objects.get(pk=conversion.pk)
+    conversion.event = "order"
+    conversion.save()
+    conversion.is_confirmed = False
+    conversion.save()
+
+    assert list(
+        AttributionChange.objects.order_by("pk").values_list("kind", "conversion")
+    ) == [
+        (AttributionChange.Kind.CONVERSION_RECORDED, conversion.pk),
+        (AttributionChange.Kind.CONVERSION_CHANGED, conversion.pk),
+    ]
+
+
+@pytest.mark.django_db
+def test_queryset_update_logs_validity_changes(track_changes, identity):
+    confirmed = Conversion.objects.create(identity=identity, event="purchase")
+    unconfirmed = Conversion.objects.create(
+        identity=identity, event="purchase", is_confirmed=False
+    )
+    AttributionChange.objects.all().delete()
+
+    assert Conversion.objects.update(is_confirmed=False) == 2
+    Conversion.objects.update(event="order")
+
+    change = AttributionChange.objects.get()
+    assert change.kind == AttributionChange.Kind.CONVERSION_CHANGED
+    assert change.conversion_id == confirmed.pk != unconfirmed.pk
+
+
+@pytest.mark.django_db
+def test_queryset_bulk_create_logs_recorded_conversions(track_changes, identity):
+    conversions = Conversion.objects.bulk_create(
+        [Conversion(identity=identity, event="purchase") for _ in range(2)]
+    )
+
+    assert sorted(
+        AttributionChange.objects.values_list("kind", "conversion")
+    ) == sorted(
+        (AttributionChange.Kind.CONVERSION_RECORDED, conversion.pk)
+        for conversion in conversions
+    )
+
+
+@pytest.mark.django_db
+def test_merge_logs_change_for_canonical_identity(track_changes):
+    canonical = Identity.objects.create()
+    source = Identity.objects.create()
+    empty = Identity.objects.create()
+    Touchpoint.objects.create(identity=source, url="https://site.com/")
+
+    _merge_identity_to_canonical(source, canonical)
+    _merge_identity_to_canonical(empty, canonical)
+
+    change = AttributionChange.objects.get()
+    assert change.kind == AttributionChange.Kind.IDENTITY_MERGED
+    assert change.identity == canonical
+
+
+@pytest.mark.django_db
+def test_refresh_recomputes_credits_after_merge(track_changes, now):
+    canonical = Identity.objects.create()
+    anonymous = Identity.objects.create()
+    Touchpoint.objects.create(
+        identity=canonical,
+        url="https://site.com/",
+        utm_source="google",
+        utm_medium="cpc",
+        created_at=now - timedelta(days=10),
+    )
+    Touchpoint.objects.create(
+        identity=anonymous,
+        url="https://site.com/",
+        utm_source="newsletter",
+        utm_medium="email",
+        created_at=now - timedelta(days=2),
+    )
+    conversion = Conversion.objects.create(
+        identity=canonical, event="purchase", conversion_value=10, created_at=now
+    )
+
+    assert refresh_attribution(models=[last_touch]) == 1
+    assert AttributionCredit.objects.get(conversion=conversion).channel == "google/cpc"
+
+    _merge_identity_to_canonical(anonymous, canonical)
+
+    assert refresh_attribution(models=[last_touch]) == 1
+    credit = AttributionCredit.objects.get(conversion=conversion)
+    assert credit.channel == "newsletter/email"
+    assert credit.credit == 1.0
+    assert AttributionChange.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_refresh_only_touches_conversions_after_late_touchpoints(track_changes, now):
+    identity = Identity.objects.create()
+    earlier = Conversion.objects.create(
+        identity=identity, event="signup", created_at=now - timedelta(days=5)
+    )
+    later = Conversion.objects.create(
+        identity=identity, event="purchase", created_at=now
+    )
+    refresh_attribution(models=[first_touch])
+    assert AttributionCredit.objects.count() == 0
+
+    touched_at = now - timedelta(days=3)
+    Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        utm_source="partner",
+        created_at=touched_at,
+    )
+    AttributionChange.objects.touchpoints_added(identity, since=touched_at)
+
+    with patch.object(
+        first_touch, "materialize", wraps=first_touch.materialize
+    ) as materialize:
+        refresh_attribution(models=[first_touch])
+
+    refreshed = materialize.call_args.args[0]
+    assert list(refreshed.values_list("pk", flat=True)) == [later.pk]
+    assert not AttributionCredit.objects.filter(conversion=earlier).exists()
+    assert AttributionCredit.objects.get(conversion=later).channel == "partner"
+
+
+@pytest.mark.django_db
+def test_refresh_removes_credits_of_invalidated_conversions(track_changes, now):
+    identity = Identity.objects.create()
+    Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        utm_source="google",
+        created_at=now - timedelta(days=1),
+    )
+    conversion = Conversion.objects.create(
+        identity=identity, event="purchase", created_at=now
+    )
+    refresh_attribution(models=[last_touch])
+    assert AttributionCredit.objects.filter(conversion=conversion).exists()
+
+    conversion.is_active = False
+    conversion.save()
+    refresh_attribution(models=[last_touch])
+
+    assert not AttributionCredit.objects.filter(conversion=conversion).exists()
+
+
+@pytest.mark.django_db
+def test_refresh_attribution_command_uses_materialized_models(track_changes, now):
+    identity = Identity.objects.create()
+    Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        utm_source="google",
+        created_at=now - timedelta(days=1),
+    )
+    Conversion.objects.create(identity=identity, event="purchase", created_at=now)
+
+    out = StringIO()
+    call_command("refresh_attribution", stdout=out)
+
+    assert "Consumed 1 change-log entries." in out.getvalue()
+    assert AttributionCredit.objects.get().model == "last_touch"
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from django_attribution.conf import attribution_settings
+from django_attribution.models import (
+    AttributionCredit,
+    ClickIdentifier,
+    Conversion,
+    Identity,
+    Touchpoint,
+)
+from django_attribution.retention import purge_expired
+
+
+@pytest.fixture
+def retention():
+    with patch.object(
+        attribution_settings, "TOUCHPOINT_RETENTION_DAYS", 90
+    ), patch.object(
+        attribution_settings, "CONVERSION_RETENTION_DAYS", 365
+    ), patch.object(attribution_settings, "IDENTITY_RETENTION_DAYS", 90):
+        yield
+
+
+def _backdate(model, obj, days):
+    model.objects.filter(pk=obj.pk).update(
+        created_at=timezone.now() - timedelta(days=days)
+    )
+
+
+@pytest.mark.django_db
+def test_purge_without_retention_settings_keeps_everything(identity):
+    Touchpoint.objects.create(identity=identity, url="https://site.com/")
+
+    assert purge_expired() == {}
+    assert Touchpoint.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_purge_deletes_expired_rows_in_batches(retention):
+    recent = Identity.objects.create()
+    for _ in range(5):
+        touchpoint = Touchpoint.objects.create(identity=recent, url="https://a.com/")
+        ClickIdentifier.objects.create(
+            touchpoint=touchpoint, platform=ClickIdentifier.Platform.GCLID, value="x"
+        )
+        _backdate(Touchpoint, touchpoint, 100)
+    kept = Touchpoint.objects.create(identity=recent, url="https://a.com/")
+    old_conversion = Conversion.objects.create(identity=recent, event="purchase")
+    _backdate(Conversion, old_conversion, 400)
+    AttributionCredit.objects.create(
+        conversion=old_conversion, model="last_touch", channel="google", credit=1.0
+    )
+    Conversion.objects.create(identity=recent, event="purchase")
+
+    counts = purge_expired(batch_size=2)
+
+    assert counts == {"conversions": 1, "touchpoints": 5, "identities": 0}
+    assert list(Touchpoint.objects.all()) == [kept]
+    assert Conversion.objects.count() == 1
+    assert not ClickIdentifier.objects.exists()
+    assert not AttributionCredit.objects.exists()
+
+
+@pytest.mark.django_db
+def test_purge_only_removes_orphaned_anonymous_identities(retention):
+    user = get_user_model().objects.create_user(username="kept")
+    orphan = Identity.objects.create()
+    with_data = Identity.objects.create()
+    Conversion.objects.create(identity=with_data, event="signup")
+    canonical = Identity.objects.create()
+    Identity.objects.create(merged_into=canonical)
+    linked = Identity.objects.create(linked_user=user)
+    recent_orphan = Identity.objects.create()
+    for identity in (orphan, with_data, canonical, linked):
+        _backdate(Identity, identity, 100)
+
+    purge_expired()
+
+    assert not Identity.objects.filter(pk=orphan.pk).exists()
+    assert set(Identity.objects.values_list("pk", flat=True)) >= {
+        with_data.pk,
+        canonical.pk,
+        linked.pk,
+        recent_orphan.pk,
+    }
+
+
+@pytest.mark.django_db
+def test_purge_command_dry_run_only_counts(retention, identity):
+    touchpoint = Touchpoint.objects.create(identity=identity, url="https://a.com/")
+    _backdate(Touchpoint, touchpoint, 100)
+
+    out = StringIO()
+    call_command("purge_attribution_data", "--dry-run", stdout=out)
+
+    assert "Would delete 1 touchpoints." in out.getvalue()
+    assert Touchpoint.objects.count() == 1
@@ -0,0 +1,145 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from django_attribution.admin import DailyRollupAdmin
+from django_attribution.attribution_models import MarkovAttributionModel, last_touch
+from django_attribution.conf import attribution_settings
+from django_attribution.models import Conversion, DailyRollup, Touchpoint
+from django_attribution.rollups import dashboard_report, rebuild_rollups
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def activity(identity):
+    now = timezone.now()
+    Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        utm_source="google",
+        utm_medium="cpc",
+        utm_campaign="spring",
+        created_at=now - timedelta(minutes=10),
+    )
+    Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        utm_source="newsletter",
+        utm_medium="email",
+        created_at=now - timedelta(minutes=5),
+    )
+    conversion = Conversion.objects.create(
+        identity=identity, event="purchase", conversion_value=Decimal("40.00")
+    )
+    Conversion.objects.create(
+        identity=identity,
+        event="purchase",
+        conversion_value=Decimal("99.00"),
+        is_confirmed=False,
+    )
+    last_touch.materialize(Conversion.objects.filter(pk=conversion.pk))
+
+
+@pytest.mark.django_db
+def test_rollups_aggregate_touchpoints_revenue_and_credits(activity):
+    today = timezone.localdate()
+
+    written = rebuild_rollups(today, today)
+
+    rows = {
+        (row.utm_source, row.utm_medium, row.utm_campaign): row
+        for row in DailyRollup.objects.all()
+    }
+    assert written == 2
+    assert rows[("google", "cpc", "spring")].touchpoints == 1
+    assert rows[("google", "cpc", "spring")].conversions == 0
+    newsletter = rows[("newsletter", "email", "")]
+    assert (newsletter.touchpoints, newsletter.conversions) == (1, 1)
+    assert newsletter.revenue == Decimal("40.00")
+    assert newsletter.attributed_revenue == Decimal("40.00")
+
+    rebuild_rollups(today, today)
+    assert DailyRollup.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_credits_are_rolled_up_with_their_utm_values(identity):
+    today = timezone.localdate()
+    Touchpoint.objects.create(
+        identity=identity,
+        url="https://site.com/",
+        utm_source="partner/blog",
+        utm_medium="referral",
+        utm_campaign="spring",
+        created_at=timezone.now() - timedelta(minutes=10),
+    )
+    Conversion.objects.create(
+        identity=identity, event="purchase", conversion_value=Decimal("50.00")
+    )
+    model = MarkovAttributionModel()
+    model.refit(Conversion.objects.valid())
+
+    with patch.object(attribution_settings, "ROLLUP_CREDIT_MODEL", model.name):
+        rebuild_rollups(today, today)
+
+    row = DailyRollup.objects.get()
+    assert (row.utm_source, row.utm_medium, row.utm_campaign) == (
+        "partner/blog",
+        "referral",
+        "spring",
+    )
+    assert row.attributed_revenue == Decimal("50.00")
+
+
+@pytest.mark.django_db
+def test_dashboard_report_groups_and_is_cached(activity):
+    today = timezone.localdate()
+    call_command("rollup_attribution", "--days", "1", stdout=StringIO())
+
+    report = dashboard_report(today, today, "medium")
+
+    assert [row["value"] for row in report["rows"]] == ["email", "cpc"]
+    assert report["totals"]["touchpoints"] == 2
+    assert report["totals"]["revenue"] == Decimal("40.00")
+
+    DailyRollup.objects.all().delete()
+    with CaptureQueriesContext(connection) as queries:
+        assert dashboard_report(today, today, "medium") == report
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_dashboard_page_reads_rollups_only(activity):
+    call_command("rollup_attribution", stdout=StringIO())
+    request = RequestFactory().get(
+        "/admin/django_attribution/dailyrollup/", {"days": "7", "group": "campaign"}
+    )
+    request.user = get_user_model().objects.create_superuser(username="admin")
+    model_admin = DailyRollupAdmin(DailyRollup, admin.site)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = model_admin.changelist_view(request).render()
+
+    assert response.status_code == 200
+    assert response.context_data["report"]["totals"]["conversions"] == 1
+    assert b"spring" in response.content
+    tables = " ".join(query["sql"] for query in queries.captured_queries)
+    assert "django_attribution_touchpoint" not in tables
+    assert "django_attribution_conversion" not in tables
@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+import pytest
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory
+from django.urls import ResolverMatch
+
+from django_attribution.admin import ConversionAdmin
+from django_attribution.conf import attribution_settings
+from django_attribution.models import Conversion, Touchpoint
+from django_attribution.routers import (
+    AttributionRouter,
+    get_read_database,
+    get_write_database,
+)
+
+
+@pytest.fixture
+def replica_reads():
+    with patch.object(attribution_settings, "READ_DATABASE_ALIAS", "replica"):
+        yield
+
+
+def test_aliases_default_to_default_database():
+    assert get_write_database() == "default"
+    assert get_read_database() == "default"
+
+
+def test_router_sends_attribution_models_to_attribution_database():
+    router = AttributionRouter()
+    user_model = get_user_model()
+
+    with patch.object(attribution_settings, "DATABASE_ALIAS", "attribution"):
+        assert router.db_for_write(Touchpoint) == "attribution"
+        assert router.db_for_read(Touchpoint) == "attribution"
+        assert router.db_for_write(user_model) is None
+        assert router.allow_migrate("attribution", "django_attribution") is True
+        assert router.allow_migrate("default", "django_attribution") is False
+        assert router.allow_migrate("default", "auth") is None
+        assert router.allow_relation(Touchpoint(), user_model()) is True
+
+
+def test_reports_read_from_replica(replica_reads):
+    assert Conversion.objects.with_attribution().db == "replica"
+    assert Conversion.objects.using("default").with_attribution().db == "default"
+    assert Conversion.objects.all().db == "default"
+
+
+def test_admin_changelist_reads_from_replica(replica_reads):
+    model_admin = ConversionAdmin(Conversion, admin.site)
+    request = RequestFactory().get("/admin/django_attribution/conversion/")
+    request.resolver_match = ResolverMatch(
+        lambda: None, (), {}, url_name="django_attribution_conversion_changelist"
+    )
+
+    assert model_admin.get_queryset(request).db == "replica"
+
+    request = RequestFactory().post("/admin/django_attribution/conversion/")
+    request.resolver_match = ResolverMatch(
+        lambda: None, (), {}, url_name="django_attribution_conversion_changelist"
+    )
+    assert model_admin.get_queryset(request).db == "default"
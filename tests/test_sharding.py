@@ -0,0 +1,205 @@
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from django_attribution.conf import attribution_settings
+from django_attribution.models import (
+    AttributionChange,
+    ClickIdentifier,
+    Conversion,
+    Identity,
+    Touchpoint,
+)
+from django_attribution.paths import PathStat
+from django_attribution.reconciliation import (
+    _merge_identity_to_canonical,
+    get_identity_by_reference,
+)
+from django_attribution.routers import AttributionRouter, get_identity_database
+from django_attribution.sharding import (
+    current_shard,
+    fan_out,
+    merge_histograms,
+    merge_path_stats,
+    shard_for_uuid,
+)
+
+SHARDS = ["default", "shard"]
+
+sharded_db = pytest.mark.django_db(databases=SHARDS)
+
+
+@pytest.fixture
+def sharded(settings):
+    # One worker keeps every query in the test thread, where the in-memory
+    # test databases live
+    settings.DATABASE_ROUTERS = ["django_attribution.routers.AttributionRouter"]
+    with patch.object(attribution_settings, "SHARD_DATABASES", SHARDS), patch.object(
+        attribution_settings, "SHARD_QUERY_WORKERS", 1
+    ):
+        yield
+
+
+def _uuid_on(alias):
+    while True:
+        value = uuid.uuid4()
+        if shard_for_uuid(value) == alias:
+            return value
+
+
+def _identity_on(alias, **kwargs):
+    identity = Identity(uuid=_uuid_on(alias), **kwargs)
+    identity.save()
+    return identity
+
+
+def _converted_identity(alias, source="google"):
+    identity = _identity_on(alias)
+    identity.touchpoints.create(url="https://site.com/", utm_source=source)
+    conversion = Conversion(identity=identity, event="purchase", conversion_value=10)
+    conversion.save()
+    return identity
+
+
+def test_shard_for_uuid_is_stable_and_spreads(sharded):
+    value = uuid.uuid4()
+
+    assert shard_for_uuid(value) == shard_for_uuid(str(value))
+    assert get_identity_database(value) == shard_for_uuid(value)
+    assert {shard_for_uuid(uuid.uuid4()) for _ in range(100)} == set(SHARDS)
+
+
+def test_router_keeps_rows_next_to_their_identity(sharded):
+    router = AttributionRouter()
+    identity = Identity(uuid=_uuid_on("shard"))
+    touchpoint = Touchpoint(identity=identity)
+
+    assert router.db_for_write(Identity, instance=identity) == "shard"
+    assert router.db_for_write(Touchpoint, instance=touchpoint) == "shard"
+    assert (
+        router.db_for_write(
+            ClickIdentifier, instance=ClickIdentifier(touchpoint=touchpoint)
+        )
+        == "shard"
+    )
+    assert router.allow_migrate("shard", "django_attribution") is True
+    assert router.allow_migrate("replica", "django_attribution") is False
+
+
+def test_fan_out_runs_on_every_shard(sharded):
+    assert fan_out(lambda alias: (alias, current_shard())) == [
+        ("default", "default"),
+        ("shard", "shard"),
+    ]
+    assert current_shard() is None
+
+
+@sharded_db
+@patch.object(attribution_settings, "TRACK_CHANGES", True)
+def test_identity_and_its_rows_are_written_to_its_shard(sharded):
+    identity = _converted_identity("shard")
+
+    assert Identity.objects.using("default").filter(uuid=identity.uuid).count() == 0
+    assert Touchpoint.objects.using("shard").filter(identity=identity).count() == 1
+    assert Conversion.objects.using("shard").filter(identity=identity).count() == 1
+    assert AttributionChange.objects.using("shard").count() == 1
+
+
+@sharded_db
+def test_reports_merge_every_shard(sharded):
+    _converted_identity("default")
+    _converted_identity("shard")
+    _converted_identity("shard", source="newsletter")
+
+    paths = Conversion.objects.top_paths()
+    assert [(stat.path, stat.conversions) for stat in paths] == [
+        (("google",), 2),
+        (("newsletter",), 1),
+    ]
+
+    rows = Conversion.objects.lag_histogram(group_by=None)
+    assert sum(row["conversions"] for row in rows) == 3
+    assert sum(row["value"] for row in rows) == Decimal("30")
+
+    assert len(Conversion.objects.using("shard").top_paths()) == 2
+
+
+@sharded_db
+@patch.object(attribution_settings, "TRACK_CHANGES", True)
+def test_cross_shard_merge_moves_rows_to_canonical_shard(sharded):
+    # Users are a reference table present on every shard
+    user = get_user_model().objects.create_user(username="shopper")
+    get_user_model().objects.using("shard").create(pk=user.pk, username="shopper")
+
+    canonical = _identity_on("default", linked_user=user)
+    source = _converted_identity("shard")
+    ClickIdentifier.objects.using("shard").create(
+        touchpoint=source.touchpoints.get(),
+        platform=ClickIdentifier.Platform.GCLID,
+        value="abc",
+    )
+
+    _merge_identity_to_canonical(source, canonical)
+
+    touchpoint = canonical.touchpoints.get()
+    assert touchpoint.utm_source == "google"
+    assert touchpoint.click_ids == {"gclid": "abc"}
+    assert canonical.conversions.count() == 1
+    assert AttributionChange.objects.filter(
+        kind=AttributionChange.Kind.IDENTITY_MERGED, identity=canonical
+    ).exists()
+
+    assert not Identity.objects.using("shard").filter(pk=source.pk).exists()
+    assert Touchpoint.objects.using("shard").count() == 0
+    assert Conversion.objects.using("shard").count() == 0
+
+
+@sharded_db
+def test_cross_shard_merge_keeps_identities_merged_into_the_source(sharded):
+    user = get_user_model().objects.create_user(username="shopper")
+    get_user_model().objects.using("shard").create(pk=user.pk, username="shopper")
+
+    canonical = _identity_on("default", linked_user=user)
+    source = _identity_on("shard")
+    earlier = _identity_on("shard", merged_into=source)
+
+    _merge_identity_to_canonical(source, canonical)
+
+    assert not Identity.objects.using("shard").exists()
+    for moved in (source, earlier):
+        identity = get_identity_by_reference(moved.uuid)
+        assert identity is not None
+        assert identity.linked_user_id == user.pk
+        assert identity.get_canonical_identity() == canonical
+    assert get_identity_by_reference(_uuid_on("shard")) is None
+
+
+def test_merge_path_stats_sums_counts_and_bounds_missed_paths():
+    full = [
+        PathStat(("google",), 5, Decimal(50), 0),
+        PathStat(("bing",), 2, Decimal(0), 0),
+    ]
+    partial = [PathStat(("email",), 4, Decimal(4), 0)]
+
+    merged = merge_path_stats([full, partial, full[:1]], limit=2, shard_limit=2)
+
+    assert merged == [
+        PathStat(("google",), 10, Decimal(100), 0),
+        PathStat(("email",), 4, Decimal(4), 2),
+    ]
+
+
+def test_merge_histograms_sums_matching_buckets():
+    row = {"group": "spring", "bucket": 0, "lower": 0, "upper": 1}
+
+    merged = merge_histograms(
+        [
+            [{**row, "conversions": 1, "value": None}],
+            [{**row, "conversions": 2, "value": Decimal(5)}],
+        ]
+    )
+
+    assert merged == [{**row, "conversions": 3, "value": Decimal(5)}]
@@ -0,0 +1,101 @@
+from datetime import datetime, timezone
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db.models import Avg, Count, F
+
+from django_attribution.models import Conversion, Identity, Touchpoint
+from django_attribution.synthetic import SyntheticDataGenerator
+
+UNTIL = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def _snapshot():
+    return (
+        sorted(
+            Identity.objects.values_list("uuid", "created_at", "linked_user__username")
+        ),
+        sorted(
+            Touchpoint.objects.values_list(
+                "uuid", "identity__uuid", "utm_source", "utm_campaign", "created_at"
+            )
+        ),
+        sorted(Conversion.objects.values_list("uuid", "conversion_value")),
+    )
+
+
+@pytest.mark.django_db
+def test_generator_is_reproducible_and_follows_distributions():
+    generator = SyntheticDataGenerator(
+        touches_per_identity=4,
+        source_mix={"google/cpc": 1},
+        conversion_rate=0.5,
+        merge_rate=0.2,
+        until=UNTIL,
+        seed=42,
+        batch_size=64,
+    )
+
+    totals = generator.generate(500)
+
+    canonical = Identity.objects.filter(merged_into__isnull=True)
+    merged = Identity.objects.filter(merged_into__isnull=False)
+    assert totals["identities"] == Identity.objects.count() == 500
+    assert 60 < merged.count() < 140
+    assert totals["touchpoints"] == Touchpoint.objects.count()
+    assert 3 < Touchpoint.objects.count() / Identity.objects.count() < 5
+    assert 0.4 < Conversion.objects.count() / canonical.count() < 0.6
+    assert set(Touchpoint.objects.values_list("utm_source", "channel")) == {
+        ("google", "paid_search")
+    }
+    # Touches made before a login belong to the canonical identity
+    assert not Touchpoint.objects.filter(identity__in=merged).exists()
+    assert Conversion.objects.filter(identity__in=merged).count() == 0
+    touches = canonical.annotate(touches=Count("touchpoints"))
+    logged_in = touches.filter(linked_user__isnull=False).aggregate(avg=Avg("touches"))
+    anonymous = touches.filter(linked_user__isnull=True).aggregate(avg=Avg("touches"))
+    assert logged_in["avg"] > anonymous["avg"]
+    assert totals["users"] == User.objects.count()
+    assert not merged.filter(linked_user__isnull=True).exists()
+    assert not merged.exclude(linked_user=F("merged_into__linked_user")).exists()
+    assert set(canonical.filter(linked_user__isnull=False)) == {
+        identity.merged_into for identity in merged
+    }
+    assert Touchpoint.objects.filter(created_at__gt=UNTIL).count() == 0
+
+    first = _snapshot()
+    for model in (Conversion, Touchpoint, Identity, User):
+        model.objects.all().delete()
+    SyntheticDataGenerator(
+        touches_per_identity=4,
+        source_mix={"google/cpc": 1},
+        conversion_rate=0.5,
+        merge_rate=0.2,
+        until=UNTIL,
+        seed=42,
+        batch_size=64,
+    ).generate(500)
+    assert _snapshot() == first
+
+
+@pytest.mark.django_db
+def test_command_generates_rows_attribution_can_use():
+    out = StringIO()
+
+    call_command(
+        "generate_attribution_data",
+        "--identities=50",
+        "--conversion-rate=1",
+        "--merge-rate=0",
+        "--source=newsletter/email=1",
+        stdout=out,
+    )
+
+    assert "Generated 50 identities" in out.getvalue()
+    attributed = Conversion.objects.with_attribution()
+    assert {row.attribution_data["utm_medium"] for row in attributed} == {"email"}
+
+    with pytest.raises(CommandError):
+        call_command("generate_attribution_data", "--source=google", stdout=out)